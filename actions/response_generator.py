@@ -1,7 +1,12 @@
+import aiohttp
+import asyncio
+import logging
 import os
-import requests
 import sys
-from typing import Any, Text, Dict, List
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Text, Dict, List, Optional
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from dotenv import load_dotenv
@@ -14,13 +19,42 @@ from intelligence.symptom_triage import SymptomTriage
 from intelligence.knowledge_base import detect_knowledge_level
 
 # Import marketing modules
-from marketing.lead_tracker import LeadTracker
+from marketing.async_database import AsyncLeadTracker
 from marketing.conversion_optimizer import ConversionOptimizer
 from marketing.psychology_engine import PsychologyEngine
 from marketing.database import init_marketing_database
+from observability.log_setup import setup_logging
+from observability.tracing import start_trace, span
+from observability import metrics
+from circuit_breaker import CircuitBreaker
+from intelligence.fallback import build_fallback_reply, faq_cache
+from intelligence.llm_router import llm_router, Route, TEMPLATE
+from intelligence.knowledge_store import knowledge_store
 
 load_dotenv()
 
+# Route action server logs through the background queue listener
+setup_logging("action_server")
+logger = logging.getLogger(__name__)
+
+# Metrics exporter (the Rasa SDK server has no route of its own for this)
+ACTION_METRICS_PORT = int(os.getenv("ACTION_METRICS_PORT", "9105"))
+LLM_SECONDS = metrics.histogram(
+    'llm_request_seconds', 'Latency of OpenAI chat completion calls', ('model', 'status'))
+LLM_TOKENS = metrics.counter(
+    'llm_tokens_total', 'Tokens used by OpenAI chat completions', ('model', 'type'))
+LEAD_DB_SECONDS = metrics.histogram(
+    'lead_tracker_db_seconds', 'Time spent in lead tracker database calls', ('operation',))
+metrics.register_process_gauges()
+metrics.start_metrics_server(ACTION_METRICS_PORT)
+
+# Skip the OpenAI call entirely while it is failing or slow
+OPENAI_SLOW_CALL_SECONDS = float(os.getenv("OPENAI_SLOW_CALL_SECONDS", "12"))
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "25"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+openai_breaker = CircuitBreaker("openai", slow_call_seconds=OPENAI_SLOW_CALL_SECONDS)
+
 # Initialize intelligence systems
 user_profiler = UserProfiler()
 symptom_triage = SymptomTriage()
@@ -28,16 +62,98 @@ symptom_triage = SymptomTriage()
 # Initialize marketing systems
 try:
     init_marketing_database()
-    lead_tracker = LeadTracker()
+    lead_tracker = AsyncLeadTracker()  # asyncpg: no database call blocks the event loop
     conversion_optimizer = ConversionOptimizer()
     psychology_engine = PsychologyEngine()
-    print("✅ Marketing systems initialized")
+    logger.info("✅ Marketing systems initialized")
 except Exception as e:
-    print(f"⚠️ Marketing systems initialization error: {e}")
+    logger.warning("⚠️ Marketing systems initialization error: %s", e)
     lead_tracker = None
     conversion_optimizer = None
     psychology_engine = None
 
+# Pipelined mode: the lead upsert runs alongside the OpenAI call and the
+# bot response is saved after the reply is sent, so database time is not
+# added to the user-visible latency. ACTION_PIPELINE=false runs them in line.
+ACTION_PIPELINE = os.getenv("ACTION_PIPELINE", "true").lower() == "true"
+LEAD_UPSERT_WAIT_SECONDS = float(os.getenv("LEAD_UPSERT_WAIT_SECONDS", "3"))  # after the LLM reply
+LEAD_SNAPSHOT_CACHE_SIZE = 10000
+
+# One keep-alive session per event loop, shared by all conversations
+_http_session: Optional[aiohttp.ClientSession] = None
+_http_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Post-reply tasks are referenced until done so they are not garbage collected
+_background_tasks = set()
+
+# Last known (lead_status, lead_score) per user: the prompt is built before
+# this message's upsert has finished, so it uses the state after the previous one
+_lead_snapshots = OrderedDict()
+_lead_snapshots_lock = threading.Lock()
+
+
+def _remember_lead(user_id: str, lead_data: Dict[str, Any]):
+    with _lead_snapshots_lock:
+        _lead_snapshots[user_id] = (lead_data.get('lead_status', 'new'), lead_data.get('lead_score', 0))
+        _lead_snapshots.move_to_end(user_id)
+        if len(_lead_snapshots) > LEAD_SNAPSHOT_CACHE_SIZE:
+            _lead_snapshots.popitem(last=False)
+
+
+def _lead_snapshot(user_id: str) -> Dict[str, Any]:
+    with _lead_snapshots_lock:
+        lead_status, lead_score = _lead_snapshots.get(user_id, ('new', 0))
+    return {'lead_status': lead_status, 'lead_score': lead_score}
+
+
+def http_session() -> aiohttp.ClientSession:
+    """Shared aiohttp session (pooled connections to OpenAI) for the running loop"""
+    global _http_session, _http_session_loop
+    loop = asyncio.get_running_loop()
+    if _http_session is None or _http_session.closed or _http_session_loop is not loop:
+        _http_session_loop = loop
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=OPENAI_MAX_CONNECTIONS, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=OPENAI_TIMEOUT_SECONDS),
+        )
+    return _http_session
+
+
+def _run_in_background(coro) -> asyncio.Task:
+    """Schedule a coroutine on the loop; the task inherits the current trace"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _track_lead(user_id: str, message: str, detected_items: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # Errors are logged here: a reply that fails (LLM or prompt error) or stops
+    # waiting after LEAD_UPSERT_WAIT_SECONDS never retrieves this task's result
+    try:
+        with span("lead_tracking"), LEAD_DB_SECONDS.time(operation="create_or_update_lead"):
+            lead_data = await lead_tracker.create_or_update_lead(
+                user_id=user_id,
+                message=message,
+                detected_items=detected_items
+            )
+    except Exception as e:
+        logger.warning("⚠️ Error tracking lead: %s", e)
+        return None
+    if lead_data:
+        _remember_lead(user_id, lead_data)
+    return lead_data
+
+
+async def _save_bot_response(user_id: str, bot_message: str):
+    try:
+        with span("save_bot_response"), LEAD_DB_SECONDS.time(operation="save_bot_response"):
+            await lead_tracker.save_bot_response(user_id, bot_message)
+    except Exception as e:
+        logger.warning("⚠️ Error saving bot response: %s", e)
+
+
+# {doctors} / {surgeries} are filled from doctors.csv / surgeries.csv by the knowledge store
 SYSTEM_PROMPT = """
 Sən "Briz-L Göz Klinikası"nın AĞILLI süni intellekt köməkçisisən - tibbi köməkçi və MÜŞTƏRİ CƏLBEDİCİSİ.
 Adın: VERA (Virtual Eye-care Representative Assistant)
@@ -67,29 +183,13 @@ Məqsəd: Briz-L Göz Klinikasının müştərilərinə professional və empatik
 - **"GƏLMƏk istəyirəm" deyirsə → DƏRHAL əlaqə məlumatları ver**
 
 **KLİNİKA MƏLUMATLARI:**
-Ad: Briz-L Göz Klinikası
-Ünvan: Maqsud Alizade 46B, Bakı
-Telefon: +994 12 541 19 00, +994 12 541 24 00
-WhatsApp: https://wa.me/994555512400
-Xəritə: https://www.google.com/maps?q=40.401955867990424,49.83970805339595
+{clinic}
 
 **HƏKİMLƏR:**
-1. Dr. İltifat Şərif - Baş həkim, Oftalmoloq (010 710 74 65, https://wa.me/994107107465)
-2. Dr. Emil Qafarlı - Oftalmoloq (051 844 76 21, https://wa.me/994518447621)
-3. Dr. Səbinə Əbiyeva - Oftalmoloq (055 319 75 76, https://wa.me/994553197576)
-4. Dr. Seymur Bayramov - Oftalmoloq (070 505 00 01, https://wa.me/994705050001)
+{doctors}
 
 **ƏMƏLİYYATLAR (RƏSMİ ADLAR - DƏQİQ İSTİFADƏ ET):**
-1. Excimer laser - Gözlük/lenslərdən azadlıq, yaxın/uzaq görmə düzəlişi
-2. Katarakta (mirvari suyu) - Göz lensinin dəyişdirilməsi, dumanlı görmə
-3. Pteregium - Göz ağında toxuma təmizlənməsi
-4. Phacic - Gözə süni lens yerləşdirilməsi
-5. Çəplik - Göz əzələsi düzəlişi
-6. Cross linking - Buynuz qişası möhkəmləndirilməsi (keratokonus)
-7. Arqon laser - Göz dibi müalicəsi (retina, diabet)
-8. YAG laser - Katarakta sonrası kapsul təmizlənməsi
-9. Avastin - Göz dibinə iynə (makula, diabetik retinopatiya)
-10. Qlaukoma (qara su) - Qara su əməliyyatı
+{surgeries}
 
 **VACIB:** Əməliyyat qiymətləri YALNIZ müayinədən sonra müəyyən edilir!
 
@@ -111,10 +211,20 @@ class ActionGenerateResponse(Action):
     def name(self) -> Text:
         return "action_generate_response"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
+        # Continue the trace started by the webhook / Telegram poller
+        metadata = tracker.latest_message.get("metadata") or {}
+        platform = metadata.get("platform") or metadata.get("source") or "web"
+        with start_trace(metadata.get("trace_id"), platform=platform, root_span="action"):
+            return await self._generate(dispatcher, tracker, domain)
+
+    async def _generate(self, dispatcher: CollectingDispatcher,
+                  tracker: Tracker,
+                  domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             dispatcher.utter_message(text="⚠️ API açarı tapılmadı.")
@@ -129,7 +239,7 @@ class ActionGenerateResponse(Action):
         
         # Detect platform from metadata or user_id prefix
         platform = metadata.get("platform", "web")
-        print(f"📱 PLATFORM DETECTED: {platform} (user_id: {user_id})")
+        logger.info("📱 PLATFORM DETECTED: %s (user_id: %s)", platform, user_id)
         
         # Get conversation history (last 6 user-bot exchanges = 12 messages)
         history = []
@@ -153,70 +263,57 @@ class ActionGenerateResponse(Action):
         # ==================== INTELLIGENCE LAYER ====================
         
         # 1. USER PROFILING - Analyze user knowledge level and intent (with platform detection)
-        user_profile = user_profiler.analyze_user(user_id, user_message, history, metadata)
+        with span("profiling"):
+            user_profile = user_profiler.analyze_user(user_id, user_message, history, metadata)
         
-        print(f"🧠 USER PROFILE: {user_profile}")
-        print(f"📱 PLATFORM: {user_profile.get('platform', 'web')}")
+        logger.debug("🧠 USER PROFILE: %s", user_profile)
         
         # 2. SYMPTOM TRIAGE - Analyze if user is describing symptoms
         triage_result = None
         if user_profile.get('intent') == 'symptom_inquiry':
-            triage_result = symptom_triage.analyze_symptoms(
-                user_id, 
-                user_message, 
-                user_profile['knowledge_level']
-            )
-            print(f"🩺 TRIAGE RESULT: {triage_result}")
+            with span("triage"):
+                triage_result = symptom_triage.analyze_symptoms(
+                    user_id, 
+                    user_message, 
+                    user_profile['knowledge_level']
+                )
+            logger.debug("🩺 TRIAGE RESULT: %s", triage_result)
         
         # 3. GENERATE ADAPTIVE PROMPT - Based on user profile and triage
         adaptive_instructions = generate_adaptive_prompt(user_profile, triage_result)
         
+        # Reply route: local template, fast model or full model
+        route = llm_router.route(user_message, user_profile, triage_result, is_first_message)
+        logger.info("🧭 ROUTE: %s (%s)", route.name, route.reason)
+        
         # ==================== MARKETING LAYER ====================
         
         marketing_analysis = None
         lead_data = None
-        conversion_cta = ""
+        lead_future = None
         
         if conversion_optimizer and lead_tracker:
             try:
                 # 4. ANALYZE MESSAGE for buying signals
-                marketing_analysis = conversion_optimizer.analyze_message(user_message, history)
+                with span("marketing_analysis"):
+                    marketing_analysis = conversion_optimizer.analyze_message(user_message, history)
                 
-                print(f"💰 MARKETING ANALYSIS: {marketing_analysis.get('buying_signals', [])} | "
-                      f"Score: {marketing_analysis.get('signal_score', 0)} | "
-                      f"Action: {marketing_analysis.get('recommended_action', 'educate')}")
+                logger.info("💰 MARKETING ANALYSIS: %s | Score: %s | Action: %s",
+                            marketing_analysis.get('buying_signals', []),
+                            marketing_analysis.get('signal_score', 0),
+                            marketing_analysis.get('recommended_action', 'educate'))
                 
-                # 5. TRACK LEAD in database
-                lead_data = lead_tracker.create_or_update_lead(
-                    user_id=user_id,
-                    message=user_message,
-                    detected_items=marketing_analysis['detected_items']
+                # 5. TRACK LEAD in database (runs while the LLM request is in flight)
+                lead_future = _run_in_background(
+                    _track_lead(user_id, user_message, marketing_analysis['detected_items'])
                 )
-                
-                # 6. GENERATE CONVERSION CTA
-                conversion_cta = conversion_optimizer.generate_conversion_cta(
-                    marketing_analysis,
-                    lead_data.get('lead_score', 0)
-                )
-                
-                # 7. CHECK FOR URGENCY INJECTION
-                if conversion_optimizer.should_inject_urgency(
-                    lead_data.get('lead_score', 0), 
-                    message_count
-                ):
-                    urgency_msg = conversion_optimizer.get_urgency_message()
-                    conversion_cta += f"\n\n{urgency_msg}"
-                
-                # 8. DETECT AND HANDLE OBJECTIONS
-                objections = conversion_optimizer.detect_objections(user_message)
-                if objections['has_objection']:
-                    for objection_type in objections['objections']:
-                        objection_handler = conversion_optimizer.get_objection_handler(objection_type)
-                        if objection_handler:
-                            conversion_cta += f"\n\n{objection_handler}"
+                if ACTION_PIPELINE:
+                    lead_data = _lead_snapshot(user_id)
+                else:
+                    lead_data = await lead_future
                 
             except Exception as e:
-                print(f"⚠️ Marketing layer error: {e}")
+                logger.warning("⚠️ Marketing layer error: %s", e)
         
         # ===========================================================
 
@@ -273,52 +370,127 @@ Yuxarıdakı profil, triage VƏ marketinq məlumatlarına əsasən:
 AĞILLI cavabını yaz:"""
 
         try:
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "gpt-4o-mini",
-                    "messages": [
-                        {"role": "system", "content": SYSTEM_PROMPT},
-                        {"role": "user", "content": full_prompt}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 400,  # Increased for diagnostic questions
-                    "stream": False
-                },
-                timeout=25
-            )
-            response.raise_for_status()
-            data = response.json()
-            bot_message = data["choices"][0]["message"]["content"]
-            
-            # Clean up the response
-            bot_message = bot_message.strip()
+            reply_start = time.perf_counter()
+            usage = None
+            if route.name == TEMPLATE:
+                bot_message = route.reply
+            else:
+                bot_message, usage = await self._complete(api_key, route, full_prompt)
+                
+                # Menu answers are reused as fallbacks while OpenAI is unavailable
+                if is_button_click:
+                    faq_cache.remember(user_message, bot_message)
+            llm_router.record(route, time.perf_counter() - reply_start, usage)
             
-            # Append conversion CTA if available and conversion ready
-            if conversion_cta and marketing_analysis and marketing_analysis.get('signal_score', 0) >= 40:
-                bot_message += conversion_cta
+            # 6-8. CONVERSION CTA from this message's lead score, appended after the reply
+            if lead_future is not None:
+                lead_data = await self._await_lead(lead_future, lead_data)
+                conversion_cta = self._conversion_cta(user_message, marketing_analysis, lead_data, message_count)
+                if conversion_cta and marketing_analysis.get('signal_score', 0) >= 40:
+                    bot_message += conversion_cta
             
             # Log intelligence in action
-            print(f"✅ INTELLIGENT RESPONSE GENERATED for {user_profile['knowledge_level']} user")
-            print(f"💼 Lead Score: {lead_data.get('lead_score', 0) if lead_data else 0} | "
-                  f"Status: {lead_data.get('lead_status', 'new') if lead_data else 'new'}")
+            logger.info("✅ INTELLIGENT RESPONSE GENERATED for %s user | Lead Score: %s | Status: %s",
+                        user_profile['knowledge_level'],
+                        lead_data.get('lead_score', 0) if lead_data else 0,
+                        lead_data.get('lead_status', 'new') if lead_data else 'new')
             
             dispatcher.utter_message(text=bot_message)
             
             # Save bot response to conversation history
             if lead_tracker:
-                try:
-                    lead_tracker.save_bot_response(user_id, bot_message)
-                except Exception as e:
-                    print(f"⚠️ Error saving bot response: {e}")
+                if ACTION_PIPELINE:
+                    _run_in_background(_save_bot_response(user_id, bot_message))
+                else:
+                    await _save_bot_response(user_id, bot_message)
             
         except Exception as e:
-            print(f"❌ LLM Error: {e}")
-            # Fallback response
-            dispatcher.utter_message(text="Bağışlayın, texniki xəta baş verdi. Zəhmət olmasa bir az sonra yenidən cəhd edin və ya birbaşa bizimlə əlaqə saxlayın:\n\nWhatsApp: https://wa.me/994555512400\nTelefon: +994 12 541 19 00")
+            logger.error("❌ LLM Error: %s", e)
+            # Fallback response (cached answer, triage-only answer or contact card)
+            dispatcher.utter_message(text=build_fallback_reply(
+                user_message, user_profile['knowledge_level'], triage_result
+            ))
 
         return []
+
+    @staticmethod
+    async def _complete(api_key: str, route: Route, full_prompt: str):
+        """
+        Chat completion with the routed model
+
+        Returns:
+            (reply text, OpenAI usage block)
+        """
+        llm_status = "error"
+        llm_start = time.perf_counter()
+        try:
+            with span("llm", model=route.model, route=route.name) as llm_attrs, openai_breaker.call():
+                async with http_session().post(
+                    f"{OPENAI_BASE_URL}/chat/completions",
+                    headers={
+                        "Authorization": f"Bearer {api_key}",
+                        "Content-Type": "application/json"
+                    },
+                    json={
+                        "model": route.model,
+                        "messages": [
+                            {"role": "system", "content": knowledge_store.snapshot.render(SYSTEM_PROMPT)},
+                            {"role": "user", "content": full_prompt}
+                        ],
+                        "temperature": 0.7,
+                        "max_tokens": route.max_tokens,
+                        "stream": False
+                    }
+                ) as response:
+                    llm_attrs["status_code"] = llm_status = response.status
+                    response.raise_for_status()
+                    data = await response.json()
+                usage = data.get("usage", {})
+                llm_attrs["total_tokens"] = usage.get("total_tokens")
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - llm_start, model=route.model, status=llm_status)
+        LLM_TOKENS.inc(usage.get("prompt_tokens", 0), model=route.model, type="prompt")
+        LLM_TOKENS.inc(usage.get("completion_tokens", 0), model=route.model, type="completion")
+        return data["choices"][0]["message"]["content"].strip(), usage
+
+    @staticmethod
+    async def _await_lead(lead_future: asyncio.Task,
+                          fallback: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Result of the background lead upsert, or the snapshot if it is not done in time"""
+        try:
+            # shield: a slow upsert keeps running (and is still recorded) after the timeout
+            return await asyncio.wait_for(asyncio.shield(lead_future), LEAD_UPSERT_WAIT_SECONDS) or fallback
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Lead upsert still running after %.1fs, using last known lead state",
+                           LEAD_UPSERT_WAIT_SECONDS)
+        except Exception as e:
+            logger.warning("⚠️ Marketing layer error: %s", e)
+        return fallback
+
+    @staticmethod
+    def _conversion_cta(user_message: str, marketing_analysis: Dict[str, Any],
+                        lead_data: Optional[Dict[str, Any]], message_count: int) -> str:
+        """CTA, urgency and objection handling text appended to the reply"""
+        try:
+            lead_score = lead_data.get('lead_score', 0) if lead_data else 0
+            
+            # 6. GENERATE CONVERSION CTA
+            conversion_cta = conversion_optimizer.generate_conversion_cta(marketing_analysis, lead_score)
+            
+            # 7. CHECK FOR URGENCY INJECTION
+            if conversion_optimizer.should_inject_urgency(lead_score, message_count):
+                urgency_msg = conversion_optimizer.get_urgency_message()
+                conversion_cta += f"\n\n{urgency_msg}"
+            
+            # 8. DETECT AND HANDLE OBJECTIONS
+            objections = conversion_optimizer.detect_objections(user_message)
+            if objections['has_objection']:
+                for objection_type in objections['objections']:
+                    objection_handler = conversion_optimizer.get_objection_handler(objection_type)
+                    if objection_handler:
+                        conversion_cta += f"\n\n{objection_handler}"
+            
+            return conversion_cta
+        except Exception as e:
+            logger.warning("⚠️ Marketing layer error: %s", e)
+            return ""
@@ -196,7 +196,8 @@ def send_whatsapp_to_admin(message: str) -> bool:
             print("❌ WhatsApp credentials not configured")
             return False
         
-        url = f"https://graph.facebook.com/v18.0/{wa_phone_number_id}/messages"
+        graph_api_url = os.getenv("GRAPH_API_URL", "https://graph.facebook.com/v18.0").rstrip("/")
+        url = f"{graph_api_url}/{wa_phone_number_id}/messages"
         
         headers = {
             "Authorization": f"Bearer {wa_access_token}",
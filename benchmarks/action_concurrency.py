@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Action Concurrency Benchmark
+Runs many ActionGenerateResponse conversations at once in one process
+against a local stand-in for the OpenAI API with a fixed response latency,
+and reports throughput and reply latency per concurrency level. With the
+async action, throughput should grow with concurrency until the stub or
+the database (if configured) saturates, instead of staying at one reply
+per LLM round trip.
+
+Usage:
+    python benchmarks/action_concurrency.py --latency 800 --concurrency 1,10,50,200 --messages 400
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MESSAGES = [
+    "Salam",
+    "Gözlərim dumanlı görür, nə etməliyəm?",
+    "Katarakta əməliyyatının qiyməti nə qədərdir?",
+    "Excimer laser haqqında məlumat verin",
+    "Müayinəyə yazılmaq istəyirəm",
+]
+
+
+def make_stub(latency: float) -> web.Application:
+    """Minimal /v1/chat/completions that answers after a fixed delay"""
+    async def chat_completions(request: web.Request) -> web.Response:
+        await request.json()
+        await asyncio.sleep(latency)
+        return web.json_response({
+            "choices": [{"message": {"role": "assistant", "content": "Salam! Sizə necə kömək edə bilərəm?"}}],
+            "usage": {"prompt_tokens": 900, "completion_tokens": 60, "total_tokens": 960},
+        })
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    return app
+
+
+def make_tracker(user_id: str, text: str):
+    from rasa_sdk import Tracker
+
+    return Tracker.from_dict({
+        "sender_id": user_id,
+        "slots": {},
+        "latest_message": {"text": text, "metadata": {"platform": "benchmark"}},
+        "events": [{"event": "user", "text": text}],
+        "paused": False,
+        "followup_action": None,
+        "active_loop": {},
+        "latest_action_name": "action_listen",
+    })
+
+
+async def run_level(action, concurrency: int, messages: int) -> dict:
+    """Send `messages` replies through the action with `concurrency` in flight"""
+    from rasa_sdk.executor import CollectingDispatcher
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            tracker = make_tracker(f"bench_{concurrency}_{i % (concurrency * 2)}", MESSAGES[i % len(MESSAGES)])
+            start = time.perf_counter()
+            await action.run(CollectingDispatcher(), tracker, {})
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(messages)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'throughput': messages / elapsed,
+        'p50': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+async def main_async(args):
+    runner = web.AppRunner(make_stub(args.latency / 1000))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    # The action reads its configuration at import time
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    from actions import response_generator
+
+    action = response_generator.ActionGenerateResponse()
+    marketing = "on" if response_generator.lead_tracker else "off (no database)"
+    print(f"LLM stub latency {args.latency} ms, marketing layer {marketing}")
+
+    try:
+        for concurrency in args.concurrency:
+            await run_level(action, concurrency, min(concurrency, args.messages))  # warm up connections
+            result = await run_level(action, concurrency, args.messages)
+            print(f"  concurrency {concurrency:>4}   {result['throughput']:8.1f} replies/s"
+                  f"   p50 {result['p50']:8.1f} ms   p95 {result['p95']:8.1f} ms")
+    finally:
+        await response_generator.http_session().close()
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=800, help='stub LLM latency in ms')
+    parser.add_argument('--concurrency', type=lambda v: [int(c) for c in v.split(',')], default=[1, 10, 50, 200])
+    parser.add_argument('--messages', type=int, default=400, help='replies per concurrency level')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
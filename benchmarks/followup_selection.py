@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Follow-up Selection Benchmark
+Seeds a scratch schema with synthetic leads and compares the per-tier
+LEFT JOIN anti-join with the set-based due-follow-up query, checking the
+EXPLAIN plans use the follow-up indexes.
+
+Usage:
+    python benchmarks/followup_selection.py --leads 1000000 [--keep]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from marketing.database import DatabaseManager, DB_CONFIG
+from marketing.follow_up_scheduler import DUE_FOLLOWUPS_QUERY
+
+SCHEMA = 'followup_bench'
+
+# Previous selection: one anti-join query per tier
+LEGACY_QUERY = """
+    SELECT l.* FROM marketing_leads l
+    LEFT JOIN follow_ups f ON l.user_id = f.user_id
+        AND f.follow_up_type = %s
+    WHERE l.booking_intent_detected = FALSE
+        AND l.lead_status IN ('warm', 'hot', 'cold')
+        AND l.last_interaction < NOW() - INTERVAL %s
+        AND f.user_id IS NULL
+    ORDER BY l.lead_score DESC
+    LIMIT %s;
+"""
+LEGACY_TIERS = [('24h', '24 hours'), ('48h', '48 hours'), ('1week', '7 days')]
+
+
+def seed(db: DatabaseManager, leads: int):
+    """Create the tables in the scratch schema and fill them with synthetic data"""
+    db.execute_query(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};", fetch=False)
+    db.init_tables()
+
+    start = time.perf_counter()
+    db.execute_query("""
+        INSERT INTO marketing_leads (user_id, last_interaction, lead_score, lead_status,
+                                     booking_intent_detected, total_messages)
+        SELECT
+            CASE i %% 4
+                WHEN 0 THEN 'whatsapp_994' || (500000000 + i)
+                WHEN 1 THEN 'facebook_' || (1000000000 + i)
+                WHEN 2 THEN 'instagram_' || (2000000000 + i)
+                ELSE (3000000000 + i)::TEXT
+            END,
+            NOW() - (random() * INTERVAL '14 days'),
+            (random() * 100)::INT,
+            (ARRAY['new', 'cold', 'warm', 'hot', 'converted'])[1 + (i %% 5)],
+            random() < 0.1,
+            1 + (random() * 20)::INT
+        FROM generate_series(1, %s) AS i;
+    """, (leads,), fetch=False)
+
+    # Roughly a third of inactive leads already got the 24h follow-up,
+    # a sixth the 48h one
+    db.execute_query("""
+        INSERT INTO follow_ups (user_id, follow_up_type, sent_at)
+        SELECT user_id, '24h', last_interaction + INTERVAL '25 hours'
+        FROM marketing_leads
+        WHERE last_interaction < NOW() - INTERVAL '24 hours' AND random() < 0.33;
+
+        INSERT INTO follow_ups (user_id, follow_up_type, sent_at)
+        SELECT user_id, '48h', last_interaction + INTERVAL '49 hours'
+        FROM marketing_leads
+        WHERE last_interaction < NOW() - INTERVAL '48 hours' AND random() < 0.17;
+
+        ANALYZE marketing_leads;
+        ANALYZE follow_ups;
+    """, fetch=False)
+    print(f"Seeded {leads:,} leads in {time.perf_counter() - start:.1f}s")
+
+
+def explain(db: DatabaseManager, query: str, params: tuple) -> dict:
+    """Run EXPLAIN ANALYZE and return the top plan node"""
+    rows = db.execute_query("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+    plan = rows[0]['QUERY PLAN']
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def plan_nodes(node: dict):
+    """All nodes of a plan tree"""
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def describe(result: dict) -> str:
+    nodes = list(plan_nodes(result['Plan']))
+    scans = sorted({
+        f"{n['Node Type']} on {n.get('Relation Name')}" + (f" ({n['Index Name']})" if 'Index Name' in n else '')
+        for n in nodes if 'Relation Name' in n
+    })
+    return "\n      ".join(scans)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--leads', type=int, default=1_000_000)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--keep', action='store_true', help='keep the scratch schema')
+    parser.add_argument('--no-seed', action='store_true', help='reuse an existing scratch schema')
+    args = parser.parse_args()
+
+    db = DatabaseManager({**DB_CONFIG, 'options': f'-c search_path={SCHEMA}'})
+    try:
+        if not args.no_seed:
+            seed(db, args.leads)
+
+        print("\n📊 Legacy: one anti-join per tier")
+        legacy_ms = 0.0
+        for follow_up_type, interval in LEGACY_TIERS:
+            result = explain(db, LEGACY_QUERY, (follow_up_type, interval, args.page_size))
+            legacy_ms += result['Execution Time']
+            print(f"  {follow_up_type:<6} {result['Execution Time']:>9.1f} ms\n      {describe(result)}")
+        print(f"  total  {legacy_ms:>9.1f} ms")
+
+        print("\n📊 Set-based: all tiers in one query")
+        query = DUE_FOLLOWUPS_QUERY.format(conditions="")
+        result = explain(db, query, (args.page_size,))
+        print(f"  first page {result['Execution Time']:>9.1f} ms\n      {describe(result)}")
+
+        # A page deep into the keyset
+        rows = db.execute_query(query.replace("LIMIT %s", "OFFSET %s LIMIT 1"), (args.leads // 10,))
+        if rows:
+            cursor_query = DUE_FOLLOWUPS_QUERY.format(conditions="AND (l.lead_score, l.user_id) < (%s, %s)")
+            result = explain(db, cursor_query, (rows[0]['lead_score'], rows[0]['user_id'], args.page_size))
+            print(f"  deep page  {result['Execution Time']:>9.1f} ms\n      {describe(result)}")
+
+        nodes = list(plan_nodes(result['Plan']))
+        indexes = {n.get('Index Name') for n in nodes}
+        seq_scanned = {n.get('Relation Name') for n in nodes if n['Node Type'] == 'Seq Scan'}
+        print()
+        print(f"  uses idx_leads_followup_due:  {'idx_leads_followup_due' in indexes}")
+        print(f"  uses idx_follow_ups_user_type: {'idx_follow_ups_user_type' in indexes}")
+        print(f"  seq scan on follow_ups:        {'follow_ups' in seq_scanned}")
+    finally:
+        if not args.keep:
+            db.execute_query(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;", fetch=False)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
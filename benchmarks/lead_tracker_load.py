@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+LeadTracker Load Test
+Seeds a throwaway Postgres database with synthetic leads, conversation
+histories, interests, follow-ups and conversion events, then runs the
+production code paths concurrently (create_or_update_lead,
+save_bot_response, due follow-up selection, dashboard summary) for a fixed
+time and reports throughput, latency percentiles per operation, lock waits
+(sampled from pg_stat_activity / pg_locks) and table bloat (pg_stat_user_tables).
+
+Connects with the usual DB_* settings but to its own database (--database),
+which is created if missing and dropped afterwards unless --keep.
+
+Usage:
+    python benchmarks/lead_tracker_load.py --leads 100000 --history 20 --workers 16 --duration 60
+    python benchmarks/lead_tracker_load.py --leads 1000000 --mix upsert=50,save=40,followup=5,dashboard=5 --keep
+    python benchmarks/lead_tracker_load.py --no-seed --duration 300   # rerun on the kept data
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MESSAGES = [
+    "Salam, qiymət nə qədərdir?",
+    "Gözlərim dumanlı görür, katarakta ola bilər?",
+    "Excimer laser haqqında məlumat verin",
+    "Dr. Emil Qafarlı ilə görüş istəyirəm",
+    "Müayinəyə yazılmaq istəyirəm, sabah gələ bilərəm?",
+    "Gözüm qızarıb və ağrıyır",
+    "Uzağı görmürəm, gözlük taxıram",
+    "Çox bahadır, fikirləşərəm",
+    "Qara su əməliyyatı nə qədər çəkir?",
+    "Təşəkkür edirəm",
+]
+BOT_REPLY = ("Dəqiq diaqnoz üçün müayinə vacibdir. Müayinəyə yazılmaq üçün +994 12 541 19 00 "
+             "nömrəsi ilə əlaqə saxlaya bilərsiniz.")
+
+TABLES = ('marketing_leads', 'conversion_events', 'follow_ups', 'lead_interests', 'interest_counts')
+DEFAULT_MIX = 'upsert=60,save=30,followup=5,dashboard=5'
+
+
+def prepare_database(name: str, drop: bool):
+    """Create (or recreate) the load test database and point the DB_* settings at it"""
+    admin = psycopg2.connect(
+        host=os.getenv('DB_HOST', 'postgres'), port=os.getenv('DB_PORT', '5432'),
+        user=os.getenv('DB_USER', 'postgres'), password=os.getenv('DB_PASSWORD', 'herahera'),
+        dbname='postgres',
+    )
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        if drop:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{name}";')
+        cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s;", (name,))
+        if not cursor.fetchone():
+            cursor.execute(f'CREATE DATABASE "{name}";')
+    admin.close()
+    # marketing.database reads these at import time
+    os.environ['DB_NAME'] = name
+    os.environ['ANALYTICS_DB_NAME'] = name
+
+
+def drop_database(name: str):
+    admin = psycopg2.connect(
+        host=os.getenv('DB_HOST', 'postgres'), port=os.getenv('DB_PORT', '5432'),
+        user=os.getenv('DB_USER', 'postgres'), password=os.getenv('DB_PASSWORD', 'herahera'),
+        dbname='postgres',
+    )
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        cursor.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE);')
+    admin.close()
+
+
+def seed(db, leads: int, history: int, events_per_lead: int):
+    """Fill the tables with synthetic data at the requested scale"""
+    start = time.perf_counter()
+    db.execute_query("""
+        INSERT INTO marketing_leads (user_id, first_contact, last_interaction, lead_score, lead_status,
+                                     booking_intent_detected, total_messages, symptoms,
+                                     surgeries_interested, doctors_inquired, conversation_history)
+        SELECT
+            'load_' || i,
+            ts - INTERVAL '7 days',
+            ts,
+            (random() * 100)::INT,
+            (ARRAY['new', 'cold', 'warm', 'hot', 'converted'])[1 + (i %% 5)],
+            random() < 0.1,
+            %(history)s,
+            (ARRAY[ARRAY['dumanlı görmə'], ARRAY['qırmızı göz'], ARRAY['bulanıq görmə']])[1 + (i %% 3)],
+            (ARRAY[ARRAY['Katarakta'], ARRAY['Excimer laser'], ARRAY[]::TEXT[]])[1 + (i %% 3)],
+            CASE WHEN i %% 7 = 0 THEN ARRAY['Dr. Emil Qafarlı'] ELSE ARRAY[]::TEXT[] END,
+            (SELECT jsonb_agg(jsonb_build_object(
+                        'timestamp', ts - make_interval(mins => %(history)s - j),
+                        'message', CASE WHEN j %% 2 = 1 THEN 'Gözlərim dumanlı görür, qiymət nə qədərdir?'
+                                        ELSE 'Dəqiq diaqnoz üçün müayinə vacibdir.' END,
+                        'sender', CASE WHEN j %% 2 = 1 THEN 'user' ELSE 'bot' END))
+             FROM generate_series(1, %(history)s) AS j)
+        FROM (
+            SELECT i, NOW() - (random() * INTERVAL '60 days') AS ts
+            FROM generate_series(1, %(leads)s) AS i
+        ) s;
+    """, {'leads': leads, 'history': history}, fetch=False)
+    print(f"  leads:      {leads:,} with {history} history entries in {time.perf_counter() - start:.1f}s")
+
+    # Backfills lead_interests / interest_counts from the lead arrays
+    start = time.perf_counter()
+    db.init_tables()
+    print(f"  interests:  backfilled in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    db.execute_query("""
+        INSERT INTO follow_ups (user_id, follow_up_type, sent_at)
+        SELECT user_id, '24h', last_interaction + INTERVAL '25 hours'
+        FROM marketing_leads
+        WHERE last_interaction < NOW() - INTERVAL '24 hours' AND random() < 0.33;
+    """, fetch=False)
+    print(f"  follow-ups: {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    db.ensure_event_partitions(months_back=3)
+    db.execute_query("""
+        INSERT INTO conversion_events (user_id, event_type, event_data, created_at)
+        SELECT 'load_' || (1 + (random() * (%(leads)s - 1))::INT),
+            (ARRAY['price_inquiry', 'doctor_inquiry', 'booking_intent', 'new_lead',
+                   'became_hot'])[1 + (e %% 5)]::conversion_event_type,
+            '{}'::JSONB,
+            NOW() - (random() * INTERVAL '60 days')
+        FROM generate_series(1, %(events)s) AS e;
+        ANALYZE;
+    """, {'leads': leads, 'events': leads * events_per_lead}, fetch=False)
+    print(f"  events:     {leads * events_per_lead:,} in {time.perf_counter() - start:.1f}s")
+
+
+def table_stats(db) -> dict:
+    rows = db.execute_query("""
+        SELECT relname, n_live_tup, n_dead_tup, n_tup_upd, n_tup_hot_upd,
+            pg_total_relation_size(relid) AS total_bytes
+        FROM pg_stat_user_tables
+        WHERE relname = ANY(%s) OR relname LIKE 'conversion_events_%%';
+    """, (list(TABLES),))
+    stats = defaultdict(Counter)
+    for row in rows:
+        # Partitions are reported under their parent table
+        name = 'conversion_events' if row['relname'].startswith('conversion_events') else row['relname']
+        for key in ('n_live_tup', 'n_dead_tup', 'n_tup_upd', 'n_tup_hot_upd', 'total_bytes'):
+            stats[name][key] += row[key] or 0
+    return stats
+
+
+def database_stats(db) -> dict:
+    return db.execute_query("""
+        SELECT xact_commit, xact_rollback, deadlocks, blks_hit, blks_read
+        FROM pg_stat_database WHERE datname = current_database();
+    """)[0]
+
+
+class LockMonitor(threading.Thread):
+    """Samples sessions of the services waiting on locks while the load runs"""
+
+    def __init__(self, config: dict, interval: float = 0.25):
+        super().__init__(name='lock-monitor', daemon=True)
+        config = {k: v for k, v in config.items() if k not in ('maxconn', 'application_name')}
+        self.conn = psycopg2.connect(application_name='briz-loadtest-monitor', **config)
+        self.conn.autocommit = True
+        self.interval = interval
+        self.samples = []
+        self.waiting_on = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        with self.conn.cursor() as cursor:
+            while not self._stop_event.wait(self.interval):
+                cursor.execute("""
+                    SELECT COUNT(*) FILTER (WHERE wait_event_type = 'Lock'),
+                        COUNT(*) FILTER (WHERE state = 'active')
+                    FROM pg_stat_activity
+                    WHERE datname = current_database() AND application_name LIKE 'briz-%'
+                        AND application_name <> 'briz-loadtest-monitor';
+                """)
+                self.samples.append(cursor.fetchone())
+                cursor.execute("""
+                    SELECT l.locktype, COALESCE(l.relation::regclass::TEXT, '') AS relation, l.mode
+                    FROM pg_locks l
+                    JOIN pg_stat_activity a ON a.pid = l.pid
+                    WHERE NOT l.granted AND a.datname = current_database();
+                """)
+                for locktype, relation, mode in cursor.fetchall():
+                    self.waiting_on[f"{locktype} {relation} {mode}".replace("  ", " ")] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.conn.close()
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def run_load(args, tracker, scheduler, analytics, optimizer):
+    """Run the operation mix on worker threads; returns (records, elapsed seconds)"""
+    mix = parse_mix(args.mix)
+    ops, weights = list(mix), list(mix.values())
+    records = []
+    records_lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def pick_user() -> str:
+        if random.random() < args.new_lead_rate:
+            return f"load_new_{uuid.uuid4().hex[:12]}"
+        # Skewed towards a hot set of users, as in real traffic
+        if random.random() < 0.8:
+            return f"load_{random.randint(1, max(1, args.leads // 100))}"
+        return f"load_{random.randint(1, args.leads)}"
+
+    def operation(op: str):
+        if op == 'upsert':
+            message = random.choice(MESSAGES)
+            analysis = optimizer.analyze_message(message)
+            tracker.create_or_update_lead(pick_user(), message, analysis['detected_items'])
+        elif op == 'save':
+            tracker.save_bot_response(pick_user(), BOT_REPLY)
+        elif op == 'followup':
+            scheduler.get_leads_needing_followup(limit=50)
+        elif op == 'dashboard':
+            analytics.get_dashboard_summary()
+        else:
+            raise ValueError(f"unknown operation: {op}")
+
+    def worker():
+        local = []
+        while time.perf_counter() < deadline:
+            op = random.choices(ops, weights)[0]
+            start = time.perf_counter()
+            error = None
+            try:
+                operation(op)
+            except Exception as e:
+                error = type(e).__name__
+            local.append({'span': op, 'platform': 'db',
+                          'duration_ms': (time.perf_counter() - start) * 1000, 'error': error})
+        with records_lock:
+            records.extend(local)
+
+    threads = [threading.Thread(target=worker, name=f"load-{i}") for i in range(args.workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return records, time.perf_counter() - start
+
+
+def report(records, elapsed, monitor, before, after, db_before, db_after):
+    from observability.tracing import summarize_spans
+
+    print(f"\n📊 {len(records):,} operations in {elapsed:.1f}s = {len(records) / elapsed:,.0f} ops/s\n")
+    print(f"{'operation':<14} {'count':>8} {'ops/s':>8} {'err':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    for key, stats in summarize_spans(records).items():
+        op = key.split('/')[0]
+        print(f"{op:<14} {stats['count']:>8,} {stats['count'] / elapsed:>8.1f} {stats['errors']:>5} "
+              f"{stats['p50']:>9.2f} {stats['p95']:>9.2f} {stats['p99']:>9.2f} {stats['max']:>9.2f}")
+
+    print("\n🔒 Lock waits")
+    if monitor.samples:
+        waiting = [w for w, _ in monitor.samples]
+        active = [a for _, a in monitor.samples]
+        print(f"  sessions waiting on a lock: mean {sum(waiting) / len(waiting):.2f}, max {max(waiting)}"
+              f"   (active sessions: mean {sum(active) / len(active):.1f}, {len(monitor.samples)} samples)")
+    for lock, count in monitor.waiting_on.most_common(5):
+        print(f"  {count:>6} samples waiting for {lock}")
+    print(f"  deadlocks: {db_after['deadlocks'] - db_before['deadlocks']}"
+          f"   rollbacks: {db_after['xact_rollback'] - db_before['xact_rollback']}"
+          f"   commits: {db_after['xact_commit'] - db_before['xact_commit']:,}")
+
+    print("\n🧹 Table bloat")
+    print(f"{'table':<20} {'live':>11} {'dead':>10} {'dead %':>7} {'updates':>10} {'HOT %':>6} {'size MB':>9} {'growth':>8}")
+    for table in TABLES:
+        b, a = before.get(table, Counter()), after.get(table, Counter())
+        live, dead = a['n_live_tup'], a['n_dead_tup']
+        updates = a['n_tup_upd'] - b['n_tup_upd']
+        hot = a['n_tup_hot_upd'] - b['n_tup_hot_upd']
+        size = a['total_bytes'] / 1024 / 1024
+        growth = (a['total_bytes'] - b['total_bytes']) / 1024 / 1024
+        print(f"{table:<20} {live:>11,} {dead:>10,} {dead / max(live + dead, 1) * 100:>6.1f}% "
+              f"{updates:>10,} {hot / max(updates, 1) * 100:>5.0f}% {size:>9.1f} {growth:>+7.1f}M")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='briz_loadtest')
+    parser.add_argument('--leads', type=int, default=100_000)
+    parser.add_argument('--history', type=int, default=20, help='conversation history entries per lead')
+    parser.add_argument('--events-per-lead', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=60, help='seconds of load')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='operation weights')
+    parser.add_argument('--new-lead-rate', type=float, default=0.05, help='fraction of upserts for new users')
+    parser.add_argument('--keep', action='store_true', help='keep the load test database')
+    parser.add_argument('--no-seed', action='store_true', help='reuse the kept database')
+    args = parser.parse_args()
+
+    prepare_database(args.database, drop=not args.no_seed)
+    # One connection per worker, plus headroom for the event writer
+    os.environ.setdefault('DB_POOL_MAX', str(args.workers + 2))
+
+    from marketing.analytics import MarketingAnalytics
+    from marketing.conversion_optimizer import ConversionOptimizer
+    from marketing.database import db, POOL_CONFIGS, PRIMARY_POOL
+    from marketing.event_writer import event_writer
+    from marketing.follow_up_scheduler import FollowUpScheduler
+    from marketing.lead_tracker import LeadTracker
+
+    try:
+        db.init_tables()
+        if not args.no_seed:
+            print(f"🌱 Seeding {args.database}")
+            seed(db, args.leads, args.history, args.events_per_lead)
+
+        tracker, scheduler = LeadTracker(), FollowUpScheduler()
+        analytics, optimizer = MarketingAnalytics(), ConversionOptimizer()
+
+        before, db_before = table_stats(db), database_stats(db)
+        monitor = LockMonitor(POOL_CONFIGS[PRIMARY_POOL])
+        monitor.start()
+        print(f"🚀 {args.workers} workers for {args.duration:.0f}s, mix {args.mix}")
+        records, elapsed = run_load(args, tracker, scheduler, analytics, optimizer)
+        monitor.stop()
+        event_writer.shutdown()
+        time.sleep(1.5)  # backends flush their table statistics about once a second
+        after, db_after = table_stats(db), database_stats(db)
+
+        report(records, elapsed, monitor, before, after, db_before, db_after)
+    finally:
+        db.close()
+        if not args.keep:
+            drop_database(args.database)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Prepared Statement Benchmark
+Seeds a scratch schema with synthetic leads, checks that every dashboard
+statement of marketing.analytics PREPAREs and runs, then times the hot
+LeadTracker queries sent as plain SQL text (parsed and planned on every
+call) against the same queries run as server-side prepared statements.
+
+Usage:
+    python benchmarks/prepared_statements.py --leads 100000 --calls 2000 [--keep]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from marketing.database import DatabaseManager, DB_CONFIG, DB_PREPARED_STATEMENTS, db as shared_db
+import marketing.analytics  # noqa: F401  (registers the analytics_* statements)
+from marketing.follow_up_scheduler import SHOULD_SEND_QUERY
+from marketing.lead_tracker import GET_LEAD_QUERY, UPDATE_LEAD_QUERY
+
+SCHEMA = 'prepared_bench'
+
+# Sample parameters of the analytics dashboard statements
+ANALYTICS_PARAMS = {
+    'analytics_daily_stats': (None,),
+    'analytics_hourly_stats': (24,),
+    'analytics_top_interests': ('surgery', 10),
+    'analytics_recent_events': (10,),
+    'analytics_event_counts': (6,),
+}
+
+
+def seed(db: DatabaseManager, leads: int):
+    """Create the tables in the scratch schema and fill them with synthetic leads"""
+    db.execute_query(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};", fetch=False)
+    db.init_tables()
+
+    start = time.perf_counter()
+    db.execute_query("""
+        INSERT INTO marketing_leads (user_id, last_interaction, lead_score, lead_status,
+                                     total_messages, symptoms, conversation_history)
+        SELECT
+            'bench_' || i,
+            NOW() - (random() * INTERVAL '14 days'),
+            (random() * 60)::INT,
+            (ARRAY['new', 'cold', 'warm'])[1 + (i %% 3)],
+            1 + (random() * 5)::INT,
+            ARRAY['quru göz'],
+            '[]'::JSONB
+        FROM generate_series(1, %s) AS i;
+        ANALYZE marketing_leads;
+    """, (leads,), fetch=False)
+    print(f"Seeded {leads:,} leads in {time.perf_counter() - start:.1f}s")
+
+
+def check_analytics_statements(db: DatabaseManager) -> bool:
+    """PREPARE and run every analytics statement once; parameter type errors only show up here"""
+    names = sorted(name for name in shared_db._statements if name.startswith('analytics_'))
+    ok = True
+    print("\n🔎 Analytics statements")
+    for name in names:
+        db.prepare(name, shared_db._statements[name][0])
+        try:
+            db.execute_prepared(name, ANALYTICS_PARAMS[name])
+            print(f"  ✅ {name}")
+        except Exception as e:
+            print(f"  ❌ {name}: {e}")
+            ok = False
+    return ok
+
+
+def update_params(user_id: str) -> dict:
+    return {
+        'user_id': user_id,
+        'symptoms': ['bulanıq görmə'],
+        'surgeries': [],
+        'doctors': [],
+        'booking_intent': False,
+        'signals': ['price_inquiry', 'symptom_mentioned'],
+        'entry': json.dumps({'message': 'qiymət nə qədərdir?', 'sender': 'user'}),
+    }
+
+
+def timed(fn, calls: int, leads: int) -> list:
+    """Per-call latencies in milliseconds"""
+    latencies = []
+    for _ in range(calls):
+        user_id = f"bench_{random.randint(1, leads)}"
+        start = time.perf_counter()
+        fn(user_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label: str, latencies: list):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"  {label:<28} mean {statistics.mean(latencies):7.3f} ms"
+          f"   p50 {statistics.median(latencies):7.3f} ms   p95 {p95:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--leads', type=int, default=100_000)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--keep', action='store_true', help='keep the scratch schema')
+    parser.add_argument('--no-seed', action='store_true', help='reuse an existing scratch schema')
+    args = parser.parse_args()
+
+    db = DatabaseManager({**DB_CONFIG, 'options': f'-c search_path={SCHEMA}'})
+    db.prepare('bench_lead_update', UPDATE_LEAD_QUERY)
+    db.prepare('bench_lead_get', GET_LEAD_QUERY)
+    db.prepare('bench_should_send', SHOULD_SEND_QUERY)
+
+    cases = [
+        ('lead update', UPDATE_LEAD_QUERY, 'bench_lead_update', update_params),
+        ('lead lookup', GET_LEAD_QUERY, 'bench_lead_get', lambda user_id: (user_id,)),
+        ('follow-up check', SHOULD_SEND_QUERY, 'bench_should_send', lambda user_id: (user_id,)),
+    ]
+
+    try:
+        if not args.no_seed:
+            seed(db, args.leads)
+
+        if not DB_PREPARED_STATEMENTS:
+            print("⚠️ DB_PREPARED_STATEMENTS is off: statements run as plain SQL, nothing is PREPAREd")
+        if not check_analytics_statements(db):
+            sys.exit(1)
+
+        for label, query, name, make_params in cases:
+            # Warm up both paths (connection, catalog caches, first PREPARE)
+            for _ in range(20):
+                user_id = f"bench_{random.randint(1, args.leads)}"
+                db.execute_query(query, make_params(user_id))
+                db.execute_prepared(name, make_params(user_id))
+
+            plain = timed(lambda user_id: db.execute_query(query, make_params(user_id)), args.calls, args.leads)
+            prepared = timed(lambda user_id: db.execute_prepared(name, make_params(user_id)), args.calls, args.leads)
+
+            print(f"\n📊 {label} ({args.calls:,} calls)")
+            report("plain SQL text", plain)
+            report("prepared statement", prepared)
+            print(f"  speedup (mean)               {statistics.mean(plain) / statistics.mean(prepared):.2f}x")
+    finally:
+        if not args.keep:
+            db.execute_query(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;", fetch=False)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Text Analyzer Benchmark
+Times the per-message intelligence and marketing analyzers (profiling,
+triage, knowledge matching, buying signals, objections, adaptive prompt)
+on a corpus of short and long Azerbaijani messages, and stores the results
+as a JSON baseline so later runs show regressions as numbers.
+
+Usage:
+    python benchmarks/text_analyzers.py --save                 # write benchmarks/baselines/text_analyzers.json
+    python benchmarks/text_analyzers.py --compare              # compare against it
+    python benchmarks/text_analyzers.py --compare old.json --threshold 15
+
+Baselines are machine specific: compare runs from the same host.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intelligence.knowledge_base import detect_knowledge_level, match_symptom_to_conditions
+from intelligence.symptom_triage import SymptomTriage
+from intelligence.user_profiler import UserProfiler, generate_adaptive_prompt
+from marketing.conversion_optimizer import ConversionOptimizer
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, 'text_analyzers.json')
+
+SHORT_MESSAGES = [
+    "Salam",
+    "Qiymət nə qədərdir?",
+    "Gözüm ağrıyır",
+    "Dumanlı görürəm",
+    "Həkimlər kimdir?",
+    "Ünvanınız haradadır?",
+    "Müayinəyə yazılmaq istəyirəm",
+    "Katarakta nədir?",
+    "Çox bahadır",
+    "Gözümün ağında ət var",
+    "Uzağı görmürəm",
+    "Excimer laser",
+    "Təşəkkür edirəm",
+    "Sabah gələ bilərəm?",
+    "IOL seçimi",
+    "Bilmirəm nə edim",
+]
+
+LONG_MESSAGES = [
+    "Salam, 58 yaşım var, son bir ildə gözlərim tədricən dumanlı görməyə başlayıb, xüsusilə axşamlar "
+    "maşın sürəndə qarşıdan gələn işıqlar çox narahat edir. Həkim katarakta ola bilər dedi, amma "
+    "əməliyyatdan qorxuram. Katarakta əməliyyatı nə qədər çəkir, ağrılıdır, qiyməti nə qədərdir və "
+    "hansı həkimə yazılmaq daha yaxşıdır?",
+    "Uşağımın 6 yaşı var, son vaxtlar sol gözü içəri tərəfə çəp baxır, xüsusilə yorulanda daha çox "
+    "görünür. Məktəbdə lövhəni yaxşı görmədiyini deyir. Çəplik əməliyyatı bu yaşda edilir, yoxsa "
+    "əvvəlcə gözlük lazımdır? Nə vaxt müayinəyə gələ bilərik və şənbə günü açıqsınız?",
+    "Mən artıq 15 ildir gözlük taxıram, -4.5 və astiqmatizm var. Excimer laser haqqında oxumuşam, "
+    "LASIK və PRK fərqini bilmək istəyirəm. Keratokonus riski varsa cross linking tövsiyə edirsiniz? "
+    "Əməliyyatdan sonra neçə gün işə getməmək lazımdır və zəmanət varmı?",
+    "Şəkərli diabetim var, 10 ildir insulin vururam. Son aylar gözümün qabağında qara nöqtələr uçur "
+    "və oxuyanda hərflər əyri görünür. Diabetik retinopatiya ola bilərmi? Avastin iynəsi və ya arqon "
+    "laser lazımdırmı? Çox bahadır deyə narahatam, taksit imkanı varmı?",
+    "Dünən axşamdan sağ gözüm çox qızarıb, güclü ağrı var, işığa baxa bilmirəm və görmə birdən azalıb. "
+    "Başım da ağrıyır, ürəyim bulanır. Bu təcili vəziyyətdir? İndi gəlsəm qəbul edə bilərsinizmi, "
+    "yoxsa təcili yardım çağırım?",
+    "Gözümün ağında üçbucaq şəkilli ət əmələ gəlib, getdikcə böyüyür və buynuz qişaya doğru gedir. "
+    "Pteregium olduğunu dedilər. Əməliyyatdan sonra yenidən çıxa bilərmi? Həkim seçmək istəyirəm, "
+    "Dr. Emil Qafarlı bu əməliyyatı edir? Fikirləşib sonra yazaram.",
+]
+
+HISTORY = [
+    "İstifadəçi: Salam", "Bot: Salam! Sizə necə kömək edə bilərəm?",
+    "İstifadəçi: Gözlərim dumanlı görür", "Bot: Nə vaxtdan? Yaşınız neçədir?",
+    "İstifadəçi: 1 ildir, 58 yaşım var", "Bot: Katarakta ola bilər, müayinə vacibdir.",
+    "İstifadəçi: Qiyməti nə qədərdir?", "Bot: Qiymət müayinədən sonra müəyyən edilir.",
+]
+
+CORPORA = {'short': SHORT_MESSAGES, 'long': LONG_MESSAGES}
+
+
+def build_cases():
+    """name -> (setup, fn(message)); setup runs once per timing repeat"""
+    state = {}
+
+    def reset():
+        # Fresh instances so per-user history does not grow across repeats
+        state['profiler'] = UserProfiler()
+        state['triage'] = SymptomTriage()
+        state['optimizer'] = ConversionOptimizer()
+
+    reset()
+    profile = state['profiler'].analyze_user('bench', LONG_MESSAGES[0], HISTORY, {'platform': 'whatsapp'})
+    triage = state['triage'].analyze_symptoms('bench', LONG_MESSAGES[0], profile['knowledge_level'])
+
+    return {
+        'UserProfiler.analyze_user': (
+            reset, lambda m: state['profiler'].analyze_user('bench', m, HISTORY, {'platform': 'whatsapp'})),
+        'SymptomTriage.analyze_symptoms': (
+            reset, lambda m: state['triage'].analyze_symptoms('bench', m, 'beginner')),
+        'match_symptom_to_conditions': (None, match_symptom_to_conditions),
+        'detect_knowledge_level': (None, detect_knowledge_level),
+        'ConversionOptimizer.analyze_message': (
+            reset, lambda m: state['optimizer'].analyze_message(m, HISTORY)),
+        'ConversionOptimizer.detect_objections': (
+            reset, lambda m: state['optimizer'].detect_objections(m)),
+        'generate_adaptive_prompt': (None, lambda m: generate_adaptive_prompt(profile, triage)),
+    }
+
+
+def measure(setup, fn, messages, repeat: int) -> dict:
+    """Microseconds per message: best and median of `repeat` timing runs"""
+    def run_corpus():
+        for message in messages:
+            fn(message)
+
+    timer = timeit.Timer(run_corpus, setup=setup or 'pass')
+    number, _ = timer.autorange()
+    runs = [t / number / len(messages) * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    return {'best_us': round(min(runs), 3), 'median_us': round(statistics.median(runs), 3)}
+
+
+def run(repeat: int, only: str = None) -> dict:
+    results = {}
+    for name, (setup, fn) in build_cases().items():
+        if only and only not in name:
+            continue
+        results[name] = {corpus: measure(setup, fn, messages, repeat) for corpus, messages in CORPORA.items()}
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+    """Print the change against a baseline; returns the number of regressions"""
+    regressions = 0
+    print(f"\n{'case':<40} {'corpus':<6} {'baseline':>10} {'now':>10} {'change':>8}   (best µs per message)")
+    for name, corpora in results.items():
+        for corpus, now in corpora.items():
+            before = baseline.get('results', {}).get(name, {}).get(corpus)
+            if not before:
+                print(f"{name:<40} {corpus:<6} {'-':>10} {now['best_us']:>10.2f} {'new':>8}")
+                continue
+            change = (now['best_us'] - before['best_us']) / before['best_us'] * 100
+            flag = ""
+            if change > threshold:
+                regressions += 1
+                flag = "  ⚠️ regression"
+            print(f"{name:<40} {corpus:<6} {before['best_us']:>10.2f} {now['best_us']:>10.2f} {change:>+7.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', help='run cases whose name contains this text')
+    parser.add_argument('--save', nargs='?', const=DEFAULT_BASELINE, help='write results as a baseline')
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, help='baseline to compare against')
+    parser.add_argument('--threshold', type=float, default=20.0, help='%% slowdown reported as a regression')
+    args = parser.parse_args()
+    if args.compare and not os.path.exists(args.compare):
+        print(f"❌ No baseline at {args.compare}: run with --save first")
+        sys.exit(2)
+
+    start = time.perf_counter()
+    results = run(args.repeat, args.only)
+
+    print(f"{'case':<40} {'corpus':<6} {'best':>10} {'median':>10}   (µs per message)")
+    for name, corpora in results.items():
+        for corpus, stats in corpora.items():
+            print(f"{name:<40} {corpus:<6} {stats['best_us']:>10.2f} {stats['median_us']:>10.2f}")
+    print(f"\n⏱️ {time.perf_counter() - start:.1f}s")
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {regressions} case(s) slower than the baseline by more than {args.threshold:.0f}%")
+            exit_code = 1
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'machine': platform.platform(),
+                'corpus': {corpus: len(messages) for corpus, messages in CORPORA.items()},
+                'results': results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"💾 Baseline saved to {args.save}")
+
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
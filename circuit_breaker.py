@@ -0,0 +1,162 @@
+"""
+Circuit breaker for calls to Rasa and OpenAI
+
+Tracks the outcome and latency of recent calls to one dependency. When too
+many of them fail or are slow the circuit opens and callers are rejected
+immediately (so they can serve a fallback instead of waiting for a
+timeout). After a cool-down a few probe calls are let through (half-open);
+if they succeed the circuit closes again.
+
+Usage:
+    rasa_breaker = CircuitBreaker("rasa", slow_call_seconds=3)
+
+    try:
+        with rasa_breaker.call():
+            response = requests.post(...)
+    except CircuitOpenError:
+        return fallback()
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from observability import metrics
+
+logger = logging.getLogger(__name__)
+
+# Circuit Breaker Configuration
+CB_WINDOW_SIZE = int(os.getenv('CB_WINDOW_SIZE', '20'))  # recent calls considered
+CB_MIN_CALLS = int(os.getenv('CB_MIN_CALLS', '5'))  # calls needed before the circuit can trip
+CB_FAILURE_RATE = float(os.getenv('CB_FAILURE_RATE', '0.5'))
+CB_SLOW_CALL_RATE = float(os.getenv('CB_SLOW_CALL_RATE', '0.5'))
+CB_OPEN_SECONDS = float(os.getenv('CB_OPEN_SECONDS', '30'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+_breakers: Dict[str, 'CircuitBreaker'] = {}
+
+CIRCUIT_REJECTIONS = metrics.counter(
+    'circuit_breaker_rejections_total', 'Calls rejected because the circuit was open', ('name',))
+CIRCUIT_TRANSITIONS = metrics.counter(
+    'circuit_breaker_transitions_total', 'Circuit state changes', ('name', 'state'))
+metrics.gauge(
+    'circuit_breaker_state', 'Circuit state (0=closed, 1=half-open, 2=open)', ('name',),
+    callback=lambda: {(name, ): _STATE_VALUES[b.state] for name, b in _breakers.items()})
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker tripping on error rate or latency"""
+
+    def __init__(self, name: str, slow_call_seconds: float,
+                 failure_rate: float = CB_FAILURE_RATE,
+                 slow_call_rate: float = CB_SLOW_CALL_RATE,
+                 window_size: int = CB_WINDOW_SIZE,
+                 min_calls: int = CB_MIN_CALLS,
+                 open_seconds: float = CB_OPEN_SECONDS,
+                 half_open_calls: int = 1):
+        """
+        Args:
+            name: Dependency name (used in logs and metrics)
+            slow_call_seconds: Calls slower than this count as slow
+            failure_rate: Share of failed calls in the window that opens the circuit
+            slow_call_rate: Share of slow calls in the window that opens the circuit
+            window_size: Number of recent calls considered
+            min_calls: Minimum calls in the window before the circuit can open
+            open_seconds: How long to reject calls before probing again
+            half_open_calls: Concurrent probe calls allowed while half-open
+        """
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._calls = deque(maxlen=window_size)  # (failed, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        _breakers[name] = self
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def _refresh_state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, state: str):
+        self._state = state
+        self._probes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == CLOSED:
+            self._calls.clear()
+        CIRCUIT_TRANSITIONS.inc(name=self.name, state=state)
+        log = logger.warning if state == OPEN else logger.info
+        log("🔌 Circuit %s is now %s", self.name, state)
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (reserves a probe slot when half-open)"""
+        with self._lock:
+            self._refresh_state()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+        CIRCUIT_REJECTIONS.inc(name=self.name)
+        return False
+
+    def record(self, duration: float, success: bool):
+        """Record the outcome of a call that was allowed through"""
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._transition(CLOSED if success and not slow else OPEN)
+                return
+
+            self._calls.append((not success, slow))
+            total = len(self._calls)
+            if self._state != CLOSED or total < self.min_calls:
+                return
+
+            failures = sum(1 for failed, _ in self._calls if failed)
+            slow_calls = sum(1 for _, is_slow in self._calls if is_slow)
+            if failures / total >= self.failure_rate or slow_calls / total >= self.slow_call_rate:
+                self._transition(OPEN)
+
+    @contextmanager
+    def call(self) -> Iterator[None]:
+        """
+        Guard a block calling the dependency
+
+        Raises:
+            CircuitOpenError: if the circuit is open (the block is not run)
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        start = time.perf_counter()
+        success = False
+        try:
+            yield
+            success = True
+        finally:
+            self.record(time.perf_counter() - start, success)
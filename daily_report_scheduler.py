@@ -1,67 +1,99 @@
 #!/usr/bin/env python3
 """
-Daily Report Scheduler - Sends automated reports to Seljan at 9:00 AM
+Report & Marketing Job Scheduler - Runs reports for Seljan, follow-ups and the analytics rollup
+
+Jobs and their next run times are stored in Postgres (scheduled_jobs), so
+runs missed during a restart are caught up (within each job's misfire
+grace) and only one container runs them at a time.
 """
 
-import schedule
-import time
 import logging
-from datetime import datetime
+import signal
 from admin_handler import format_daily_report, send_whatsapp_to_admin
+from send_report import format_weekly_report, format_monthly_report
+from marketing.database import db, init_marketing_database
+from marketing.follow_up_scheduler import FollowUpScheduler
+from marketing.job_scheduler import JobScheduler
+from marketing.rollup import AnalyticsRollup
+from observability.log_setup import setup_logging
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+setup_logging("daily_report_scheduler")
 logger = logging.getLogger(__name__)
 
 
+def send_report(name: str, format_report):
+    """Generate a report and send it to Seljan"""
+    logger.info("⏰ Time to send %s report to Seljan...", name)
+
+    report = format_report()
+    if not send_whatsapp_to_admin(report):
+        raise RuntimeError(f"Failed to send {name} report")
+
+    logger.info("✅ %s report sent successfully to Seljan!", name.capitalize())
+
+
 def send_daily_report():
     """Send the daily report to Seljan"""
-    try:
-        logger.info("⏰ Time to send daily report to Seljan...")
-        
-        # Generate report
-        report = format_daily_report()
-        
-        # Send to Seljan
-        success = send_whatsapp_to_admin(report)
-        
-        if success:
-            logger.info("✅ Daily report sent successfully to Seljan!")
-        else:
-            logger.error("❌ Failed to send daily report")
-            
-    except Exception as e:
-        logger.error(f"❌ Error sending daily report: {e}")
+    send_report("daily", format_daily_report)
+
+
+def send_weekly_report():
+    """Send the weekly report to Seljan"""
+    send_report("weekly", format_weekly_report)
+
+
+def send_monthly_report():
+    """Send the monthly report to Seljan"""
+    send_report("monthly", format_monthly_report)
+
+
+def run_follow_ups():
+    """Send all due follow-ups"""
+    FollowUpScheduler().process_all_followups()
+
+
+def rollup_analytics():
+    """Fold new conversion events into the hourly and daily analytics"""
+    AnalyticsRollup().run()
+
+
+def maintain_event_partitions():
+    """Create upcoming conversion event partitions and drop expired ones"""
+    db.ensure_event_partitions()
+    db.drop_expired_event_partitions()
+
+
+def build_scheduler() -> JobScheduler:
+    """Register all periodic jobs"""
+    scheduler = JobScheduler()
+    scheduler.register("daily_report", send_daily_report, "daily 09:00", misfire_grace=3 * 3600)
+    scheduler.register("weekly_report", send_weekly_report, "weekly mon 09:00", misfire_grace=6 * 3600)
+    scheduler.register("monthly_report", send_monthly_report, "monthly 1 09:00", misfire_grace=12 * 3600)
+    scheduler.register("follow_ups", run_follow_ups, "every 900", misfire_grace=900)
+    scheduler.register("analytics_rollup", rollup_analytics, "every 60", misfire_grace=300)
+    scheduler.register("event_partitions", maintain_event_partitions, "daily 03:30", misfire_grace=24 * 3600)
+    return scheduler
 
 
 def main():
     """Main scheduler loop"""
-    logger.info("🚀 Starting Daily Report Scheduler for Seljan")
-    logger.info("📅 Reports will be sent at 9:00 AM daily")
-    
-    # Schedule daily report at 9:00 AM
-    schedule.every().day.at("09:00").do(send_daily_report)
-    
-    # Also schedule a test report 1 minute from now (for testing)
-    # Uncomment this line to test immediately:
-    # schedule.every(1).minutes.do(send_daily_report)
-    
-    logger.info("✅ Scheduler is running...")
-    logger.info(f"⏰ Next report scheduled for: {schedule.next_run()}")
-    
-    # Keep the scheduler running
+    logger.info("🚀 Starting Report & Marketing Job Scheduler")
+
+    init_marketing_database()
+    scheduler = build_scheduler()
+
+    def shutdown(signum, frame):
+        logger.info("👋 Scheduler stopping...")
+        scheduler.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute
-            
-    except KeyboardInterrupt:
-        logger.info("\n👋 Scheduler stopped by user")
+        scheduler.run_forever()
     except Exception as e:
-        logger.error(f"❌ Scheduler error: {e}")
+        logger.error("❌ Scheduler error: %s", e)
 
 
 if __name__ == "__main__":
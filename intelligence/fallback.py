@@ -0,0 +1,111 @@
+"""
+Briz-L Fallback Replies
+Fast answers served when Rasa or the LLM is unavailable (circuit open)
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from .knowledge_store import format_doctor_list, knowledge_store
+from .symptom_triage import SymptomTriage
+
+APOLOGY = "Bağışlayın, hazırda sistemimizdə gecikmə var. Sizə dərhal kömək etmək üçün bizimlə birbaşa əlaqə saxlayın:"
+
+# Answers for the most common questions (keywords -> answer built from a knowledge snapshot)
+FAQ_ANSWERS = [
+    (('ünvan', 'unvan', 'harada', 'harda', 'yol tarifi', 'address'),
+     lambda k: f"Klinikamızın ünvanı:\n\n{k.contact_card}"),
+    (('telefon', 'nömrə', 'nomre', 'əlaqə', 'elaqe', 'whatsapp', 'phone'),
+     lambda k: f"Bizimlə əlaqə:\n\n{k.contact_card}"),
+    (('qiymət', 'qiymet', 'neçəyə', 'neceye', 'price', 'cost'),
+     lambda k: "Dəqiq qiymət yalnız müayinədən sonra müəyyən edilir. Müayinəyə yazılmaq üçün bizimlə əlaqə saxlayın:"
+               f"\n\n{k.contact_card}"),
+    (('həkim', 'hekim', 'doktor', 'doctor'),
+     lambda k: f"Həkimlərimiz:\n{format_doctor_list(k.doctors)}\n\n{k.contact_card}"),
+]
+
+
+def contact_card() -> str:
+    """Clinic address, phones and WhatsApp from the current knowledge snapshot"""
+    return knowledge_store.snapshot.contact_card
+
+
+class FAQCache:
+    """
+    Answers to recently seen questions
+
+    Successful LLM replies to short messages (mostly menu button payloads)
+    are remembered so the same question can still be answered while the
+    LLM is unavailable. FAQ answers from the knowledge store are used otherwise.
+    """
+
+    def __init__(self, max_entries: int = 500, max_key_length: int = 80):
+        self.max_entries = max_entries
+        self.max_key_length = max_key_length
+        self._answers = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(message: str) -> str:
+        return " ".join(message.lower().split())
+
+    def remember(self, message: str, answer: str):
+        """Store an answer for a short message"""
+        key = self._key(message)
+        if not key or len(key) > self.max_key_length or not answer:
+            return
+        with self._lock:
+            self._answers[key] = answer
+            self._answers.move_to_end(key)
+            while len(self._answers) > self.max_entries:
+                self._answers.popitem(last=False)
+
+    def lookup(self, message: str) -> Optional[str]:
+        """Cached or static answer for a message, if any"""
+        key = self._key(message)
+        with self._lock:
+            answer = self._answers.get(key)
+        if answer:
+            return answer
+
+        for keywords, faq_answer in FAQ_ANSWERS:
+            if any(keyword in key for keyword in keywords):
+                return faq_answer(knowledge_store.snapshot)
+        return None
+
+
+faq_cache = FAQCache()
+
+
+def build_fallback_reply(message: str, knowledge_level: str = "beginner",
+                         triage_result: dict = None) -> str:
+    """
+    Build an immediate reply without Rasa or the LLM
+
+    Order of preference: triage-only answer for symptom descriptions,
+    cached/FAQ answer, then the clinic contact card.
+
+    Args:
+        message: User's message
+        knowledge_level: User's knowledge level for the triage explanation
+        triage_result: Triage already computed by the caller, if any
+
+    Returns:
+        str: Reply text
+    """
+    # Fresh instance so fallback calls don't accumulate in triage_history
+    triage = SymptomTriage()
+    if triage_result is None:
+        triage_result = triage.analyze_symptoms("fallback", message, knowledge_level)
+
+    if triage_result.get('has_symptoms'):
+        triage_text = triage.format_triage_response(triage_result, knowledge_level)
+        if triage_text:
+            return f"{triage_text}\n\n{contact_card()}"
+
+    answer = faq_cache.lookup(message)
+    if answer:
+        return answer
+
+    return f"{APOLOGY}\n\n{contact_card()}"
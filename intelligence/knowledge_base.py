@@ -1,11 +1,24 @@
 """
 Briz-L Medical Knowledge Base
 Comprehensive eye condition and surgery information
+
+Clinical texts (treated conditions, symptom keywords, explanations) live
+here; each surgery's official name and aliases come from its surgeries.csv
+row (linked by surgery_id) through the knowledge store, so a rename there
+reaches triage, symptom matching and the router's surgery replies.
 """
 
-# Official Surgery Names (as per clinic standards)
+import math
+import threading
+from types import MappingProxyType
+
+from .knowledge_store import knowledge_store, split_aliases
+from .normalization import KeywordSet, tokens
+
+# Surgery clinical texts; "name" is used only if surgeries.csv has no row for surgery_id
 SURGERIES = {
     "excimer_laser": {
+        "surgery_id": "1",
         "name": "Excimer laser",
         "description": "Gözlük və kontakt linzalardan azad olmaq üçün lazer əməliyyatı",
         "treats": ["yaxıngörmə", "uzaqgörmə", "astiqmatizm"],
@@ -14,6 +27,7 @@ SURGERIES = {
         "expert_explanation": "Excimer laser ilə buynuz qişanın refraksiya gücü dəyişdirilir. LASIK və PRK metodları mövcuddur."
     },
     "katarakta": {
+        "surgery_id": "2",
         "name": "Katarakta (mirvari suyu)",
         "description": "Göz lensinin dəyişdirilməsi əməliyyatı",
         "treats": ["dumanlı görmə", "katarakta", "lens dumanlığı"],
@@ -22,14 +36,16 @@ SURGERIES = {
         "expert_explanation": "Fakoemulsifikasiya ilə IOL implantasiyası. Monofocal, multifocal və ya toric IOL seçimi mövcuddur."
     },
     "pteregium": {
+        "surgery_id": "3",
         "name": "Pteregium",
         "description": "Göz ağının üzərində əmələ gələn toxumanın təmizlənməsi",
         "treats": ["göz ağında ət", "göz ağında ləkə", "pteregium"],
-        "keywords": ["ət", "göz əti", "göz ağında", "ləkə", "toxuma", "pteregium", "pterigy"],
+        "keywords": ["göz əti", "göz ağında", "ləkə", "toxuma", "pteregium", "pterigy"],
         "simple_explanation": "Gözünüzün ağ hissəsində artıq toxuma əmələ gəlib, biz onu təmizləyirik.",
         "expert_explanation": "Konjonktival pteregium ekssizyası və müvafiq rekonstruksiya."
     },
     "phacic": {
+        "surgery_id": "4",
         "name": "Phacic",
         "description": "Gözə süni lens yerləşdirilməsi",
         "treats": ["yüksək miop", "yüksək refraktiv xəta"],
@@ -38,6 +54,7 @@ SURGERIES = {
         "expert_explanation": "Fakik IOL implantasiyası - təbii lens saxlanılır, anterior və ya posterior kameraya implant yerləşdirilir."
     },
     "ceplik": {
+        "surgery_id": "5",
         "name": "Çəplik",
         "description": "Göz əzələlərinin düzəldilməsi",
         "treats": ["çəplik", "strabismus", "göz əyri baxır"],
@@ -46,6 +63,7 @@ SURGERIES = {
         "expert_explanation": "Strabismus cərrahiyyəsi - ekstraokulyar əzələlərin reseksiya və ya sessiya əməliyyatı."
     },
     "cross_linking": {
+        "surgery_id": "6",
         "name": "Cross linking",
         "description": "Buynuz qişanın möhkəmləndirilməsi",
         "treats": ["keratokonus", "buynuz qişa zəifliyi", "nazik buynuz qişa"],
@@ -54,6 +72,7 @@ SURGERIES = {
         "expert_explanation": "Korneal kollagen cross-linking (CXL) - riboflavin və UVA işığı ilə korneal kollagenin möhkəmləndirilməsi."
     },
     "argon_laser": {
+        "surgery_id": "7",
         "name": "Arqon laser",
         "description": "Göz dibinin lazer müalicəsi",
         "treats": ["retina problemi", "diabetik retinopatiya", "retina yırtığı"],
@@ -62,6 +81,7 @@ SURGERIES = {
         "expert_explanation": "Arqon laser fotokoaqulyasiya - retinal yırtıq, diabetik retinopatiya, venoz okkluziya müalicəsi."
     },
     "yag_laser": {
+        "surgery_id": "8",
         "name": "YAG laser",
         "description": "Katarakta əməliyyatından sonra kapsul təmizlənməsi",
         "treats": ["posterior kapsul opasifikasiyası", "PCO", "katarakta sonrası dumanlıq"],
@@ -70,6 +90,7 @@ SURGERIES = {
         "expert_explanation": "Nd:YAG laser posterior kapsulotomiya - PCO müalicəsi."
     },
     "avastin": {
+        "surgery_id": "9",
         "name": "Avastin",
         "description": "Göz dibinə vurulan iynə müalicəsi",
         "treats": ["makula degenerasiyası", "diabetik retinopatiya", "venoz okkluziya"],
@@ -78,6 +99,7 @@ SURGERIES = {
         "expert_explanation": "İntravitreal anti-VEGF iynə (bevacizumab) - neovaskulyar AMD, DME, RVO müalicəsi."
     },
     "qlaukoma": {
+        "surgery_id": "10",
         "name": "Qlaukoma (qara su)",
         "description": "Göz təzyiqinin azaldılması əməliyyatı",
         "treats": ["qlaukoma", "göz təzyiqi", "qara su"],
@@ -143,6 +165,7 @@ SYMPTOM_MAPPING = {
     
     # Growth on eye
     "göz ağında ət": {
+        "aliases": ["gözdə ət"],  # "ət var gözümdə", "gözümdə ət artıb"
         "conditions": ["Pteregium", "pinguekula"],
         "surgeries": ["Pteregium"],
         "questions": ["Böyüyür?", "Görmə problem yaradır?", "Qırmızılaşma var?"],
@@ -186,7 +209,7 @@ SYMPTOM_MAPPING = {
 TERMINOLOGY_LEVELS = {
     "beginner": [
         "görmürəm", "ağrıyır", "dumanlı", "qırmızı", "ət", "çəp",
-        "pis", "problem", "nə edim", "bilmirəm", "köməək"
+        "pis", "problem", "nə edim", "bilmirəm", "kömək"
     ],
     "intermediate": [
         "katarakta", "lazer", "əməliyyat", "müayinə", "nömrə",
@@ -227,49 +250,183 @@ def get_surgery_info(surgery_key: str, knowledge_level: str = "beginner") -> dic
     explanation_key = "simple_explanation" if knowledge_level == "beginner" else "expert_explanation"
     
     return {
-        "name": surgery["name"],
+        "name": _surgery_names(knowledge_store.snapshot)[surgery_key],
         "description": surgery["description"],
         "explanation": surgery.get(explanation_key, surgery["simple_explanation"])
     }
 
-def match_symptom_to_conditions(user_message: str) -> dict:
-    """Match user symptoms to potential conditions and surgeries"""
-    user_message_lower = user_message.lower()
-    matches = []
-    
+def _surgery_names(knowledge) -> dict:
+    """SURGERIES key -> official name from the snapshot's surgeries.csv row"""
+    return {
+        key: knowledge.surgeries_by_id[info["surgery_id"]]["name"]
+        if info["surgery_id"] in knowledge.surgeries_by_id else info["name"]
+        for key, info in SURGERIES.items()
+    }
+
+# Symptom index: built once per knowledge snapshot so matching a message costs
+# a few dict lookups per token instead of a scan over every symptom and keyword.
+# Text is folded by intelligence.normalization, so ASCII, Cyrillic and
+# upper-case spellings share terms. Stems are the first STEM_LENGTH letters,
+# and message tokens are looked up by each of their prefixes, so Azerbaijani
+# suffixes (gözüm, dumanlıdır, ağrıyır) still hit the phrase they inflect.
+STEM_LENGTH = 4
+MIN_PREFIX_LENGTH = 3      # shorter terms ("ət", "su") must match a whole token
+ROOT_STEMS = ("goz", "gor")  # göz (eye) and görmək (to see) forms are one term each
+STOP_WORDS = {"var", "ve", "ile", "cox", "bir", "da", "de"}
+GENERIC_TERM_SHARE = 0.2   # terms in this share of entries are optional in a phrase
+EXACT_PHRASE_BONUS = 0.5   # extra score when the phrase appears in order
+
+
+def _term(token: str) -> str:
+    for root in ROOT_STEMS:
+        if token.startswith(root):
+            return root
+    return token[:STEM_LENGTH]
+
+
+def _build_symptom_index(knowledge):
+    """Source snapshot, read-only match payloads, phrases and term -> [(phrase_id, position)] indexes"""
+    entries = []  # (kind, order, payload)
+    phrases = []  # (entry_id, terms)
+
+    # SYMPTOM_MAPPING names surgeries by their SURGERIES "name"
+    names = _surgery_names(knowledge)
+    renames = {info["name"]: names[key] for key, info in SURGERIES.items()}
+
     for symptom, info in SYMPTOM_MAPPING.items():
-        if any(word in user_message_lower for word in symptom.split()):
-            matches.append({
-                "symptom": symptom,
-                "conditions": info["conditions"],
-                "surgeries": info["surgeries"],
-                "questions": info["questions"],
-                "urgency": info["urgency"]
-            })
-    
-    # Also check surgery keywords
+        entries.append(("symptom", len(entries), MappingProxyType({
+            "symptom": symptom,
+            "conditions": tuple(info["conditions"]),
+            "surgeries": tuple(renames.get(name, name) for name in info["surgeries"]),
+            "questions": tuple(info["questions"]),
+            "urgency": info["urgency"]
+        })))
+        for phrase in [symptom] + info.get("aliases", []):
+            phrases.append((len(entries) - 1, phrase))
+
     for surgery_key, surgery_info in SURGERIES.items():
-        for keyword in surgery_info["keywords"]:
-            if keyword in user_message_lower:
-                matches.append({
-                    "matched_surgery": surgery_info["name"],
-                    "surgery_key": surgery_key
-                })
-                break
-    
-    return matches if matches else None
+        entries.append(("surgery", len(entries), MappingProxyType({
+            "matched_surgery": names[surgery_key],
+            "surgery_key": surgery_key
+        })))
+        row = knowledge.surgeries_by_id.get(surgery_info["surgery_id"], {})
+        keywords = surgery_info["keywords"] + [names[surgery_key]] + split_aliases(row)
+        for keyword in dict.fromkeys(keywords):
+            phrases.append((len(entries) - 1, keyword))
+
+    prefix_index, exact_index, phrase_terms = {}, {}, []
+    for phrase_id, (entry_id, text) in enumerate(phrases):
+        terms = tuple(_term(t) for t in tokens(text) if t not in STOP_WORDS)
+        phrase_terms.append((entry_id, terms))
+        for position, term in enumerate(terms):
+            index = prefix_index if len(term) >= MIN_PREFIX_LENGTH else exact_index
+            index.setdefault(term, []).append((phrase_id, position))
+
+    # Inverse entry frequency: "göz" names half the entries and weighs little
+    term_entries = {}
+    for entry_id, terms in phrase_terms:
+        for term in terms:
+            term_entries.setdefault(term, set()).add(entry_id)
+    weights = {term: math.log(1 + len(entries) / len(ids)) for term, ids in term_entries.items()}
+    generic_terms = {term for term, ids in term_entries.items() if len(ids) >= len(entries) * GENERIC_TERM_SHARE}
+
+    compiled = []
+    for entry_id, terms in phrase_terms:
+        term_weights = tuple(weights[term] for term in terms)
+        generic = tuple(term in generic_terms for term in terms)
+        distinctive = [term for term, flag in zip(terms, generic) if not flag]
+        if distinctive and all(len(term) < MIN_PREFIX_LENGTH for term in distinctive):
+            # A short word alone ("ət" is also meat) is too weak: "gözdə ət" needs both
+            generic = (False,) * len(terms)
+        compiled.append((entry_id, term_weights, sum(term_weights), generic))
+
+    return knowledge, tuple(entries), tuple(compiled), prefix_index, exact_index
+
+
+_symptom_index = None
+_symptom_index_lock = threading.Lock()
+
+
+def _current_symptom_index():
+    """Symptom index for the current knowledge snapshot, rebuilt when it changes"""
+    global _symptom_index
+    knowledge = knowledge_store.snapshot
+    index = _symptom_index
+    if index is None or index[0] is not knowledge:
+        with _symptom_index_lock:
+            index = _symptom_index
+            if index is None or index[0] is not knowledge:
+                index = _symptom_index = _build_symptom_index(knowledge)
+    return index
+
+
+def _score_entries(index, user_message: str) -> dict:
+    """entry_id -> best phrase score for the message"""
+    _, _, symptom_phrases, prefix_index, exact_index = index
+    hits = {}  # phrase_id -> {position: first token index}
+    for token_index, token in enumerate(tokens(user_message)):
+        postings = list(exact_index.get(token, ()))
+        for length in range(MIN_PREFIX_LENGTH, min(len(token), STEM_LENGTH) + 1):
+            postings.extend(prefix_index.get(token[:length], ()))
+        for phrase_id, position in postings:
+            hits.setdefault(phrase_id, {}).setdefault(position, token_index)
+
+    scores = {}
+    for phrase_id, positions in hits.items():
+        entry_id, term_weights, total_weight, generic = symptom_phrases[phrase_id]
+        # Every distinctive term must be present; generic ones ("göz") only add score
+        if any(not generic[position] and position not in positions for position in range(len(generic))):
+            continue
+        if all(generic[position] for position in positions):
+            continue
+        score = sum(term_weights[position] for position in positions)
+        if len(positions) == len(term_weights) and len(term_weights) > 1:
+            order = [positions[position] for position in range(len(term_weights))]
+            if all(b - a == 1 for a, b in zip(order, order[1:])):
+                score += total_weight * EXACT_PHRASE_BONUS
+        if score > scores.get(entry_id, 0.0):
+            scores[entry_id] = score
+    return scores
+
+
+def match_symptom_to_conditions(user_message: str) -> list:
+    """
+    Match user symptoms to potential conditions and surgeries
+
+    Symptom matches come first, then surgery matches, each ranked by score
+    (ties keep SYMPTOM_MAPPING / SURGERIES order). Each call returns fresh
+    dicts and lists copied from the shared index, so callers may modify them.
+
+    Args:
+        user_message: User's message
+
+    Returns:
+        List of matches, or None if nothing matched
+    """
+    index = _current_symptom_index()
+    entries = index[1]
+    scores = _score_entries(index, user_message or "")
+    if not scores:
+        return None
+    ranked = sorted(scores, key=lambda entry_id: (
+        entries[entry_id][0] != "symptom", -scores[entry_id], entry_id))
+    return [_payload_copy(entries[entry_id][2]) for entry_id in ranked]
+
+
+def _payload_copy(payload) -> dict:
+    return {key: list(value) if isinstance(value, tuple) else value for key, value in payload.items()}
+
+_TERMINOLOGY_KEYWORDS = {level: KeywordSet(terms) for level, terms in TERMINOLOGY_LEVELS.items()}
 
 def detect_knowledge_level(message: str) -> str:
     """Detect user's medical knowledge level from their message"""
-    message_lower = message.lower()
-    
     # Check for expert terminology
-    expert_count = sum(1 for term in TERMINOLOGY_LEVELS["expert"] if term in message_lower)
+    expert_count = len(_TERMINOLOGY_KEYWORDS["expert"].find(message))
     if expert_count >= 1:
         return "expert"
     
     # Check for intermediate terminology
-    intermediate_count = sum(1 for term in TERMINOLOGY_LEVELS["intermediate"] if term in message_lower)
+    intermediate_count = len(_TERMINOLOGY_KEYWORDS["intermediate"].find(message))
     if intermediate_count >= 2:
         return "intermediate"
     
@@ -0,0 +1,340 @@
+"""
+Briz-L Knowledge Store
+Clinic facts from doctors.csv, surgeries.csv and YAML files (clinic.yaml holds
+the address, phones and WhatsApp number), loaded into an immutable indexed
+snapshot. A background thread watches the files'
+modification times and swaps in a rebuilt snapshot, so the prompt sections,
+doctor/surgery matchers and template replies follow the files without a
+redeploy.
+"""
+
+import csv
+import logging
+import os
+import sys
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+from observability import metrics
+from .normalization import KeywordSet, fold
+
+logger = logging.getLogger(__name__)
+
+# Knowledge Store Configuration
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOCTORS_CSV = os.getenv('DOCTORS_CSV', os.path.join(DATA_DIR, 'doctors.csv'))
+SURGERIES_CSV = os.getenv('SURGERIES_CSV', os.path.join(DATA_DIR, 'surgeries.csv'))
+CLINIC_YAML = os.path.join(DATA_DIR, 'clinic.yaml')
+KNOWLEDGE_YAML = [path.strip() for path in os.getenv('KNOWLEDGE_YAML', CLINIC_YAML).split(',') if path.strip()]
+KNOWLEDGE_RELOAD_SECONDS = float(os.getenv('KNOWLEDGE_RELOAD_SECONDS', '30'))  # 0 disables the watcher
+
+REBUILD_SECONDS = metrics.histogram('knowledge_rebuild_seconds', 'Time to build a knowledge snapshot')
+SNAPSHOT_BYTES = metrics.gauge('knowledge_snapshot_bytes', 'Estimated memory held by the current knowledge snapshot')
+SNAPSHOT_VERSION = metrics.gauge('knowledge_snapshot_version', 'Version of the current knowledge snapshot')
+
+
+def load_doctors(path: str = DOCTORS_CSV) -> List[Dict[str, str]]:
+    """Doctor rows from doctors.csv (empty list if the file is missing)"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+    except OSError:
+        return []
+
+
+def load_surgeries(path: str = SURGERIES_CSV) -> List[Dict[str, str]]:
+    """Surgery rows from surgeries.csv (empty list if the file is missing)"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+    except OSError:
+        return []
+    surgeries = []
+    for fields in rows[1:]:
+        if len(fields) < 6:
+            continue
+        # Unquoted commas in the details column split it into extra fields
+        surgeries.append({
+            'surgery_id': fields[0],
+            'name': fields[1],
+            'aliases': fields[2],
+            'description': fields[3],
+            'details': ",".join(fields[4:-1]),
+            'category': fields[-1],
+        })
+    return surgeries
+
+
+def load_yaml(paths: List[str]) -> Dict[str, Any]:
+    """Top-level keys of the YAML files merged in order (later files win, missing files are skipped)"""
+    data = {}
+    for path in paths:
+        try:
+            with open(path, encoding='utf-8') as f:
+                data.update(yaml.safe_load(f) or {})
+        except OSError:
+            continue
+    return data
+
+
+def format_doctor_list(doctors) -> str:
+    """Numbered doctor lines for replies (name, title, specialty, WhatsApp link)"""
+    return "\n".join(
+        f"{i}. {d['name']} - {d['title']}, {d['specialty']} ({d['whatsapp_link']})"
+        for i, d in enumerate(doctors, 1)
+    )
+
+
+def split_aliases(row: Dict[str, str]) -> List[str]:
+    """Comma-separated aliases column of a doctors.csv / surgeries.csv row"""
+    return [alias.strip() for alias in (row.get('aliases') or '').split(',') if alias.strip()]
+
+
+def _freeze(value):
+    """Read-only copy of nested dicts/lists"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _deep_size(root) -> int:
+    """
+    Approximate bytes held by an object graph (shared objects counted once)
+
+    Walked from the snapshot itself rather than measured with tracemalloc,
+    which would trace every thread while it runs and count their allocations.
+    """
+    seen = set()
+    stack = [root]
+    size = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, (dict, MappingProxyType)):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            stack.append(vars(obj))
+        elif hasattr(obj, '__slots__'):
+            stack.extend(getattr(obj, name) for name in obj.__slots__ if hasattr(obj, name))
+    return size
+
+
+class KnowledgeSnapshot:
+    """One immutable build of the clinic facts and everything derived from them"""
+
+    __slots__ = ('version', 'doctors', 'surgeries', 'doctors_by_id', 'surgeries_by_id', 'data',
+                 'clinic', 'contact_card', 'prompt_sections', 'mtimes', 'rebuild_seconds', 'memory_bytes',
+                 '_doctor_matcher', '_doctor_names', '_surgery_matcher', '_surgery_names')
+
+    def __init__(self, version: int, doctors: List[Dict[str, str]], surgeries: List[Dict[str, str]],
+                 data: Dict[str, Any], mtimes: Dict[str, Optional[int]]):
+        self.version = version
+        self.doctors = _freeze(doctors)
+        self.surgeries = _freeze(surgeries)
+        self.doctors_by_id = MappingProxyType({d['doctor_id']: d for d in self.doctors})
+        self.surgeries_by_id = MappingProxyType({s['surgery_id']: s for s in self.surgeries})
+        self.data = _freeze(data)
+        self.clinic = self.data.get('clinic') or MappingProxyType({})
+        self.contact_card = self._contact_card()
+        self.mtimes = MappingProxyType(dict(mtimes))
+        self.rebuild_seconds = 0.0
+        self.memory_bytes = 0
+
+        # Doctors are found by first name, surname or alias ("Dr." is not a name)
+        self._doctor_names = {}
+        for doctor in self.doctors:
+            names = [word for word in doctor['name'].split() if fold(word).strip('.') != 'dr']
+            for keyword in names + split_aliases(doctor):
+                self._doctor_names[keyword] = doctor['name']
+        self._doctor_matcher = KeywordSet(self._doctor_names)
+
+        self._surgery_names = {}
+        for surgery in self.surgeries:
+            for keyword in [surgery['name']] + split_aliases(surgery):
+                self._surgery_names[keyword] = surgery['name']
+        self._surgery_matcher = KeywordSet(self._surgery_names)
+
+        self.prompt_sections = MappingProxyType({
+            'doctors': self._doctors_section(),
+            'surgeries': self._surgeries_section(),
+            'clinic': self._clinic_section(),
+        })
+
+    def _contact_card(self) -> str:
+        """Address, phones and WhatsApp lines appended to replies"""
+        lines = []
+        if self.clinic.get('address'):
+            lines.append(f"📍 Ünvan: {self.clinic['address']}")
+        if self.clinic.get('phones'):
+            lines.append(f"📞 Telefon: {', '.join(self.clinic['phones'])}")
+        if self.clinic.get('whatsapp'):
+            lines.append(f"💬 WhatsApp: {self.clinic['whatsapp']}")
+        return "\n".join(lines)
+
+    def _clinic_section(self) -> str:
+        labels = [('name', 'Ad'), ('address', 'Ünvan'), ('phones', 'Telefon'),
+                  ('whatsapp', 'WhatsApp'), ('map', 'Xəritə')]
+        lines = []
+        for key, label in labels:
+            value = self.clinic.get(key)
+            if isinstance(value, tuple):
+                value = ", ".join(value)
+            if value:
+                lines.append(f"{label}: {value}")
+        return "\n".join(lines)
+
+    @property
+    def phone(self) -> str:
+        """Main clinic phone number ('' if clinic.yaml has none)"""
+        phones = self.clinic.get('phones') or ()
+        return phones[0] if phones else ''
+
+    def _doctors_section(self) -> str:
+        return "\n".join(
+            f"{i}. {d['name']} - {d['title']}, {d['specialty']} ({d['phone']}, {d['whatsapp_link']})"
+            for i, d in enumerate(self.doctors, 1)
+        )
+
+    def _surgeries_section(self) -> str:
+        lines = []
+        for i, surgery in enumerate(self.surgeries, 1):
+            name = surgery['name']
+            # Colloquial names ("mirvari suyu", "qara su") help the model; spelling variants do not
+            aliases = [a for a in split_aliases(surgery) if ' ' in a]
+            if aliases:
+                name = f"{name} ({aliases[0]})"
+            lines.append(f"{i}. {name} - {surgery['description']}")
+        return "\n".join(lines)
+
+    def find_doctors(self, message: str) -> List[str]:
+        """Names of the doctors mentioned in a message, in doctors.csv order"""
+        return self._distinct(self._doctor_names[k] for k in self._doctor_matcher.find(message))
+
+    def find_surgeries(self, message: str) -> List[str]:
+        """Official names of the surgeries mentioned in a message, in surgeries.csv order"""
+        return self._distinct(self._surgery_names[k] for k in self._surgery_matcher.find(message))
+
+    @staticmethod
+    def _distinct(names) -> List[str]:
+        return list(dict.fromkeys(names))
+
+    def render(self, template: str) -> str:
+        """Fill {doctors} / {surgeries} / {clinic} placeholders with this snapshot's prompt sections"""
+        return template.format(**self.prompt_sections)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'doctors': len(self.doctors),
+            'surgeries': len(self.surgeries),
+            'yaml_keys': len(self.data),
+            'rebuild_ms': round(self.rebuild_seconds * 1000, 2),
+            'memory_kib': round(self.memory_bytes / 1024, 1),
+        }
+
+
+class KnowledgeStore:
+    """Holds the current KnowledgeSnapshot and rebuilds it when the source files change"""
+
+    def __init__(self, doctors_path: str = DOCTORS_CSV, surgeries_path: str = SURGERIES_CSV,
+                 yaml_paths: List[str] = None, reload_seconds: float = KNOWLEDGE_RELOAD_SECONDS):
+        self.doctors_path = doctors_path
+        self.surgeries_path = surgeries_path
+        self.yaml_paths = list(KNOWLEDGE_YAML if yaml_paths is None else yaml_paths)
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._thread = None
+        self._snapshot = None
+        self.reload(force=True)
+
+    @property
+    def snapshot(self) -> KnowledgeSnapshot:
+        """Current snapshot; read it once per use so one reply sees one version"""
+        if self._thread is None and self.reload_seconds > 0:
+            self._start()
+        return self._snapshot
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='knowledge-watcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.reload_seconds)
+            self.reload()
+
+    def _mtimes(self) -> Dict[str, Optional[int]]:
+        mtimes = {}
+        for path in [self.doctors_path, self.surgeries_path] + self.yaml_paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def _build(self, version: int, mtimes: Dict[str, Optional[int]]) -> KnowledgeSnapshot:
+        start = time.perf_counter()
+        snapshot = KnowledgeSnapshot(version, load_doctors(self.doctors_path),
+                                     load_surgeries(self.surgeries_path),
+                                     load_yaml(self.yaml_paths), mtimes)
+        snapshot.rebuild_seconds = time.perf_counter() - start
+        snapshot.memory_bytes = _deep_size(snapshot)
+        return snapshot
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Rebuild the snapshot if a source file changed
+
+        Args:
+            force: Rebuild even if no file changed
+
+        Returns:
+            Whether a new snapshot was swapped in
+        """
+        with self._lock:
+            current = self._snapshot
+            mtimes = self._mtimes()
+            if not force and current is not None and mtimes == dict(current.mtimes):
+                return False
+            version = current.version + 1 if current else 1
+            try:
+                snapshot = self._build(version, mtimes)
+            except Exception as e:
+                logger.error("❌ Knowledge rebuild failed, keeping v%s: %s", current.version if current else 0, e)
+                if current is None:
+                    self._snapshot = KnowledgeSnapshot(0, [], [], {}, mtimes)
+                return False
+            if current is not None and ((current.doctors and not snapshot.doctors)
+                                        or (current.surgeries and not snapshot.surgeries)
+                                        or (current.clinic and not snapshot.clinic)):
+                # A file mid-write or truncated by mistake: keep serving the old facts
+                logger.warning("⚠️ Knowledge rebuild v%s lost its doctors, surgeries or clinic facts, keeping v%s",
+                               version, current.version)
+                return False
+            # Readers take self._snapshot without the lock: the swap is one assignment
+            self._snapshot = snapshot
+
+        REBUILD_SECONDS.observe(snapshot.rebuild_seconds)
+        SNAPSHOT_BYTES.set(snapshot.memory_bytes)
+        SNAPSHOT_VERSION.set(snapshot.version)
+        logger.info("📚 Knowledge v%s: %s doctors, %s surgeries, %s YAML keys in %.1fms (%.1f KiB)",
+                    snapshot.version, len(snapshot.doctors), len(snapshot.surgeries), len(snapshot.data),
+                    snapshot.rebuild_seconds * 1000, snapshot.memory_bytes / 1024)
+        return True
+
+
+knowledge_store = KnowledgeStore()
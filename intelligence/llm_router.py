@@ -0,0 +1,228 @@
+"""
+Briz-L LLM Router
+Chooses how each reply is produced from the profile the bot already computed:
+a templated local answer (greetings, thanks, contacts, doctor and surgery
+lists), a fast model with a tight token cap for simple turns, or the full
+model for symptoms, urgent triage and expert questions
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from observability import metrics
+from .fallback import contact_card
+from .knowledge_base import get_surgery_info, match_symptom_to_conditions
+from .knowledge_store import format_doctor_list, knowledge_store
+from .normalization import KeywordSet, normalize
+
+# Router Configuration
+LLM_ROUTING_ENABLED = os.getenv('LLM_ROUTING_ENABLED', 'true').lower() == 'true'
+LLM_FULL_MODEL = os.getenv('LLM_FULL_MODEL', 'gpt-4o-mini')
+LLM_FULL_MAX_TOKENS = int(os.getenv('LLM_FULL_MAX_TOKENS', '400'))
+LLM_FAST_MODEL = os.getenv('LLM_FAST_MODEL', 'gpt-4.1-nano')  # cheapest in MODEL_PRICES
+LLM_FAST_MAX_TOKENS = int(os.getenv('LLM_FAST_MAX_TOKENS', '150'))
+TEMPLATE_MAX_WORDS = 6  # longer messages always go to a model
+
+# USD per 1M tokens (prompt, completion)
+MODEL_PRICES = {
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4.1': (2.00, 8.00),
+    'gpt-4.1-mini': (0.40, 1.60),
+    'gpt-4.1-nano': (0.10, 0.40),
+}
+
+TEMPLATE = 'template'
+FAST = 'fast'
+FULL = 'full'
+
+ROUTE_SECONDS = metrics.histogram(
+    'llm_route_seconds', 'Time to produce a reply, by route', ('route',))
+ROUTE_COST = metrics.counter(
+    'llm_route_cost_usd_total', 'Estimated OpenAI cost of replies, by route', ('route', 'model'))
+
+# Canonical forms; ASCII, Cyrillic and inflected spellings are handled by
+# intelligence.normalization. Greetings must be the whole message.
+GREETINGS = frozenset(normalize(greeting) for greeting in (
+    'salam', 'salamlar', 'sabahınız xeyir', 'axşamınız xeyir', 'hi', 'hello', 'privet'))
+THANKS_KEYWORDS = KeywordSet(['təşəkkür', 'sağ ol', 'sağ olun', 'sağol', 'thanks', 'spasibo'])
+ADDRESS_KEYWORDS = KeywordSet(['ünvan', 'harada', 'harda', 'yol tarifi', 'xəritə', 'address'])
+PHONE_KEYWORDS = KeywordSet(['telefon', 'nömrə', 'əlaqə', 'whatsapp', 'phone'])
+DOCTOR_LIST_KEYWORDS = KeywordSet(['həkimlər', 'hansı həkim', 'doktorlar', 'doctors'])
+SURGERY_LIST_KEYWORDS = KeywordSet(['əməliyyatlar', 'hansı əməliyyat', 'xidmətlər', 'services'])
+SURGERY_INFO_KEYWORDS = KeywordSet(['nədir', 'haqqında', 'nə deməkdir'])
+
+
+def model_cost(model: str, usage: Dict[str, Any]) -> float:
+    """Estimated USD cost of one completion from its usage block"""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (usage.get('prompt_tokens', 0) * prompt_price
+            + usage.get('completion_tokens', 0) * completion_price) / 1_000_000
+
+
+class Route:
+    """How one reply is produced"""
+
+    __slots__ = ('name', 'reason', 'model', 'max_tokens', 'reply')
+
+    def __init__(self, name: str, reason: str, model: Optional[str] = None,
+                 max_tokens: int = 0, reply: Optional[str] = None):
+        self.name = name
+        self.reason = reason
+        self.model = model
+        self.max_tokens = max_tokens
+        self.reply = reply
+
+    def __repr__(self):
+        return f"Route({self.name}, {self.reason}, model={self.model})"
+
+
+class LLMRouter:
+    """Routes replies to a local template, the fast model or the full model"""
+
+    def __init__(self, doctors: List[Dict[str, str]] = None, surgeries: List[Dict[str, str]] = None):
+        # None: follow the knowledge store, so CSV edits show up without a restart
+        self._doctors = doctors
+        self._surgeries = surgeries
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @property
+    def doctors(self):
+        return knowledge_store.snapshot.doctors if self._doctors is None else self._doctors
+
+    @property
+    def surgeries(self):
+        return knowledge_store.snapshot.surgeries if self._surgeries is None else self._surgeries
+
+    def route(self, message: str, profile: dict, triage_result: dict = None,
+              is_first_message: bool = False) -> Route:
+        """
+        Choose the route for a reply
+
+        Args:
+            message: User's message
+            profile: UserProfiler.analyze_user result
+            triage_result: SymptomTriage result, if triage ran
+            is_first_message: Whether this is the first message of the conversation
+
+        Returns:
+            Route (with the reply text for the template route)
+        """
+        if not LLM_ROUTING_ENABLED:
+            return self._full('routing_disabled')
+
+        message_lower = " ".join((message or "").lower().split())
+        has_symptoms = bool(triage_result and triage_result.get('has_symptoms'))
+
+        # Anything medical or urgent gets the full model
+        if has_symptoms:
+            if triage_result.get('urgency') in ('emergency', 'urgent'):
+                return self._full('urgent_triage')
+            return self._full('symptoms')
+        if profile.get('intent') == 'symptom_inquiry':
+            return self._full('symptom_inquiry')
+        if profile.get('knowledge_level') == 'expert':
+            return self._full('expert')
+        if profile.get('confidence_level') == 'lost':
+            return self._full('needs_guidance')
+
+        if len(message_lower.split()) <= TEMPLATE_MAX_WORDS:
+            reply, reason = self._template_reply(message_lower, profile, is_first_message)
+            if reply:
+                return Route(TEMPLATE, reason, reply=reply)
+
+        if profile.get('intent') == 'surgery_info':
+            return self._full('surgery_info')
+        return Route(FAST, profile.get('intent', 'general'), model=LLM_FAST_MODEL,
+                     max_tokens=LLM_FAST_MAX_TOKENS)
+
+    @staticmethod
+    def _full(reason: str) -> Route:
+        return Route(FULL, reason, model=LLM_FULL_MODEL, max_tokens=LLM_FULL_MAX_TOKENS)
+
+    def _template_reply(self, message: str, profile: dict, is_first_message: bool):
+        """(reply, reason) for messages a template answers completely, else (None, None)"""
+        if DOCTOR_LIST_KEYWORDS.search(message) and self.doctors:
+            return self._doctors_reply(), 'doctors'
+        if SURGERY_LIST_KEYWORDS.search(message) and self.surgeries:
+            return self._surgeries_reply(), 'surgeries'
+        if SURGERY_INFO_KEYWORDS.search(message):
+            reply = self._surgery_info_reply(message, profile.get('knowledge_level', 'beginner'))
+            if reply:
+                return reply, 'surgery_info'
+        if ADDRESS_KEYWORDS.search(message):
+            return f"Klinikamızın ünvanı:\n\n{contact_card()}", 'address'
+        if PHONE_KEYWORDS.search(message):
+            return f"Bizimlə əlaqə:\n\n{contact_card()}", 'phone'
+        if THANKS_KEYWORDS.search(message) and '?' not in message:
+            return ("Dəyərli sözlərinizə görə təşəkkür edirik! 😊 "
+                    "Başqa sualınız olarsa, hər zaman buradayıq."), 'thanks'
+        if is_first_message and normalize(message) in GREETINGS:
+            return ("Salam! 👋 Mən VERA, Briz-L Göz Klinikasının köməkçisiyəm.\n\n"
+                    "Sizə necə kömək edə bilərəm?\n"
+                    "• Göz problemi / simptomlar\n"
+                    "• Əməliyyatlar haqqında məlumat\n"
+                    "• Həkimlərimiz\n"
+                    "• Müayinəyə yazılmaq"), 'greeting'
+        return None, None
+
+    def _doctors_reply(self) -> str:
+        return f"Həkimlərimiz:\n{format_doctor_list(self.doctors)}\n\n{contact_card()}"
+
+    def _surgeries_reply(self) -> str:
+        lines = [
+            f"{i}. {surgery['name']} - {surgery['description']}"
+            for i, surgery in enumerate(self.surgeries, 1)
+        ]
+        return ("Klinikamızda aparılan əməliyyatlar:\n" + "\n".join(lines)
+                + "\n\nƏməliyyat qiymətləri yalnız müayinədən sonra müəyyən edilir."
+                + f"\n\n{contact_card()}")
+
+    @staticmethod
+    def _surgery_info_reply(message: str, knowledge_level: str) -> Optional[str]:
+        """Explanation of the one surgery named in the message"""
+        matches = [match['surgery_key'] for match in match_symptom_to_conditions(message) or []
+                   if 'surgery_key' in match]
+        if len(matches) != 1:
+            return None
+        info = get_surgery_info(matches[0], knowledge_level)
+        return (f"**{info['name']}** - {info['description']}\n\n{info['explanation']}\n\n"
+                "Sizə uyğun olub-olmadığını müayinədən sonra həkimimiz müəyyən edəcək. "
+                f"Müayinəyə yazılmaq üçün:\n\n{contact_card()}")
+
+    def record(self, route: Route, seconds: float, usage: Dict[str, Any] = None):
+        """
+        Record the latency and estimated cost of a routed reply
+
+        Args:
+            route: Route the reply took
+            seconds: Time to produce the reply
+            usage: OpenAI usage block (None for templates)
+        """
+        cost = model_cost(route.model, usage) if route.model and usage else 0.0
+        ROUTE_SECONDS.observe(seconds, route=route.name)
+        if route.model:
+            ROUTE_COST.inc(cost, route=route.name, model=route.model)
+        with self._lock:
+            stats = self._stats.setdefault(route.name, {'replies': 0, 'seconds': 0.0, 'cost_usd': 0.0})
+            stats['replies'] += 1
+            stats['seconds'] += seconds
+            stats['cost_usd'] += cost
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-route reply count, mean latency (ms) and total/mean cost since start"""
+        with self._lock:
+            return {
+                name: {
+                    'replies': s['replies'],
+                    'mean_ms': round(s['seconds'] / s['replies'] * 1000, 1),
+                    'cost_usd': round(s['cost_usd'], 6),
+                    'cost_per_reply_usd': round(s['cost_usd'] / s['replies'], 6),
+                }
+                for name, s in self._stats.items()
+            }
+
+
+llm_router = LLMRouter()
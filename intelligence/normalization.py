@@ -0,0 +1,144 @@
+"""
+Briz-L Text Normalization
+Azerbaijani-aware casefolding, diacritic folding, Cyrillic transliteration
+and light suffix stripping shared by every keyword detector, so "Görmürəm",
+"GÖRMÜRƏM", "gormurem" and "ҝөрмүрәм" all reach the same canonical keyword
+"""
+
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+NORMALIZATION_CACHE_SIZE = int(os.getenv('NORMALIZATION_CACHE_SIZE', '4096'))
+
+# Azerbaijani casing: İ -> i and I -> ı (str.lower() turns İ into i + combining dot)
+_AZ_UPPER = str.maketrans({'İ': 'i', 'I': 'ı'})
+
+# Azerbaijani letters folded to the ASCII spelling people type without an Azeri keyboard
+_AZ_FOLD = {'ə': 'e', 'ı': 'i', 'ö': 'o', 'ü': 'u', 'ş': 's', 'ç': 'c', 'ğ': 'g'}
+
+# Azerbaijani Cyrillic (and the Russian letters it shares) to folded Latin
+_CYRILLIC = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'q', 'ғ': 'g', 'д': 'd', 'е': 'e', 'ә': 'e',
+    'ж': 'j', 'з': 'z', 'и': 'i', 'ы': 'i', 'ј': 'y', 'й': 'y', 'к': 'k', 'ҝ': 'g',
+    'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'ө': 'o', 'п': 'p', 'р': 'r', 'с': 's',
+    'т': 't', 'у': 'u', 'ү': 'u', 'ф': 'f', 'х': 'x', 'һ': 'h', 'ч': 'c', 'ҹ': 'c',
+    'ш': 's', 'щ': 's', 'ц': 'ts', 'ю': 'yu', 'я': 'ya', 'ё': 'yo', 'э': 'e',
+    'ъ': '', 'ь': '',
+}
+
+_FOLD = str.maketrans({**_AZ_FOLD, **_CYRILLIC})
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Case, possessive, plural, copula and person endings, longest first.
+# Stripping is deliberately light: stems only need to agree between a
+# keyword and the inflected forms users type, not be linguistically right.
+SUFFIXES = tuple(sorted({
+    'lardan', 'lerden', 'larda', 'lerde', 'lari', 'leri', 'lar', 'ler',
+    'imiz', 'iniz', 'umuz', 'unuz', 'miz', 'niz', 'muz', 'nuz',
+    'dir', 'dur', 'tir', 'tur',
+    'nin', 'nun', 'dan', 'den', 'tan', 'ten', 'da', 'de', 'ta', 'te',
+    'yir', 'yur', 'yam', 'yem', 'am', 'em', 'im', 'um', 'in', 'un',
+    'li', 'lu', 'si', 'su', 'ni', 'nu', 'ya', 'ye', 'yi', 'yu',
+    'maq', 'mek', 'ir', 'ur', 'a', 'e', 'i', 'u',
+}, key=len, reverse=True))
+MIN_STEM_LENGTH = 4
+# Negative present (gör-mür-əm "I can't see"): stripping past it would leave
+# the bare verb root and match görmək / görmüşəm / görməyə
+NEGATIVE_PRESENT = ('mir', 'mur')
+EXACT_MATCH_LENGTH = 2  # stems this short must equal the token, not prefix it
+
+
+def fold(text: str) -> str:
+    """Lowercase, fold Azerbaijani letters and accents, transliterate Cyrillic"""
+    text = text.translate(_AZ_UPPER).lower().translate(_FOLD)
+    if text.isascii():
+        return text
+    return "".join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+
+def stem(token: str) -> str:
+    """Strip inflectional suffixes from a folded token, keeping MIN_STEM_LENGTH letters and negation"""
+    stripped = True
+    while stripped and not token.endswith(NEGATIVE_PRESENT):
+        stripped = False
+        for suffix in SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+                token = token[:-len(suffix)]
+                stripped = True
+                break
+    return token
+
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def tokens(text: str) -> Tuple[str, ...]:
+    """Folded word tokens of a message (cached: every detector sees the same message)"""
+    return tuple(_TOKEN_RE.findall(fold(text or "")))
+
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def stems(text: str) -> Tuple[str, ...]:
+    """Stemmed folded tokens of a message"""
+    return tuple(stem(token) for token in tokens(text))
+
+
+def normalize(text: str) -> str:
+    """Canonical form of a message: folded tokens joined by single spaces"""
+    return " ".join(tokens(text))
+
+
+class KeywordSet:
+    """
+    Canonical keywords matched against normalized messages
+
+    A keyword matches when its stems appear as consecutive message stems,
+    each message stem starting with the keyword stem (so "ağrı" matches
+    "ağrıyır" and "çəp" matches "çəplik"). Keywords are indexed by their
+    first stem, so a lookup costs a few dict probes per message token.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = tuple(keywords)
+        self._index = {}
+        for order, keyword in enumerate(self.keywords):
+            terms = stems(keyword)
+            if terms:
+                self._index.setdefault(terms[0], []).append((order, terms))
+        self._lengths = sorted({len(term) for term in self._index})
+
+    def _candidates(self, token: str):
+        for length in self._lengths:
+            if length > len(token):
+                break
+            if length <= EXACT_MATCH_LENGTH and length != len(token):
+                continue
+            yield from self._index.get(token[:length], ())
+
+    @staticmethod
+    def _term_matches(term: str, token: str) -> bool:
+        if len(term) <= EXACT_MATCH_LENGTH:
+            return token == term
+        return token.startswith(term)
+
+    def _matches(self, message: str):
+        message_stems = stems(message)
+        for i, token in enumerate(message_stems):
+            for order, terms in self._candidates(token):
+                rest = message_stems[i + 1:i + len(terms)]
+                if len(rest) == len(terms) - 1 and all(
+                        self._term_matches(term, t) for term, t in zip(terms[1:], rest)):
+                    yield order
+
+    def search(self, message: str) -> bool:
+        """Whether any keyword occurs in the message"""
+        return next(self._matches(message), None) is not None
+
+    def find(self, message: str) -> List[str]:
+        """Keywords found in the message, each once, in declaration order"""
+        return [self.keywords[order] for order in sorted(set(self._matches(message)))]
+
+    def __repr__(self):
+        return f"KeywordSet({len(self.keywords)} keywords)"
@@ -9,6 +9,18 @@ from .knowledge_base import (
     SURGERIES,
     SYMPTOM_MAPPING
 )
+from .knowledge_store import knowledge_store
+from .normalization import KeywordSet
+
+# Canonical forms; see intelligence.normalization
+VISION_KEYWORDS = KeywordSet(['görmə', 'dumanlı', 'bulanıq'])
+PAIN_KEYWORDS = KeywordSet(['ağrı', 'sızıltı'])
+REDNESS_KEYWORDS = KeywordSet(['qırmızı', 'qızarmış'])
+EMERGENCY_KEYWORDS = KeywordSet([
+    'çox ağrı', 'dəhşətli ağrı', 'görmürəm', 'kor',
+    'işıq çaxması', 'qara pərdə', 'qəfil', 'birdən',
+    'qan', 'zədə', 'toxundu', 'vurdu'
+])
 
 class SymptomTriage:
     """Intelligent medical triage system for eye conditions"""
@@ -153,7 +165,7 @@ class SymptomTriage:
         """Generate actionable recommendation"""
         
         if urgency == "emergency":
-            return "⚠️ DƏRHAL klinikamıza gəlin və ya təcili yardım çağırın!\n\nTelefon: +994 12 541 19 00\nWhatsApp: https://wa.me/994555512400"
+            return f"⚠️ DƏRHAL klinikamıza gəlin və ya təcili yardım çağırın!\n\n{knowledge_store.snapshot.contact_card}"
         
         elif urgency == "urgent":
             if surgeries:
@@ -171,11 +183,10 @@ class SymptomTriage:
     def get_diagnostic_questions(self, symptom_context: str) -> list:
         """Get relevant diagnostic questions based on symptom context"""
         
-        context_lower = symptom_context.lower()
         questions = []
         
         # Vision-related questions
-        if any(word in context_lower for word in ['görmə', 'dumanlı', 'bulanıq', 'görmürəm']):
+        if VISION_KEYWORDS.search(symptom_context):
             questions.extend([
                 "Bu problem nə vaxtdan var? (bir neçə gün, ay, il?)",
                 "Hər iki gözə aiddir, yoxsa bir gözə?",
@@ -183,7 +194,7 @@ class SymptomTriage:
             ])
         
         # Pain-related questions
-        if any(word in context_lower for word in ['ağrı', 'ağrıyır', 'sızıltı']):
+        if PAIN_KEYWORDS.search(symptom_context):
             questions.extend([
                 "Ağrı nə qədər güclüdür? (10 bal sistemində)",
                 "Davamlı ağrıdır, yoxsa gəlib-gedəndir?",
@@ -191,7 +202,7 @@ class SymptomTriage:
             ])
         
         # Redness questions
-        if any(word in context_lower for word in ['qırmızı', 'qızarmış']):
+        if REDNESS_KEYWORDS.search(symptom_context):
             questions.extend([
                 "Axıntı var? (yaşarma, irin və s.)",
                 "Qaşınma hiss edirsiniz?",
@@ -210,15 +221,7 @@ class SymptomTriage:
     
     def check_emergency_indicators(self, message: str) -> bool:
         """Check if message contains emergency indicators"""
-        
-        emergency_keywords = [
-            'çox ağrı', 'dəhşətli ağrı', 'görmürəm', 'kor',
-            'işıq çaxması', 'qara pərdə', 'qəfil', 'birdən',
-            'qan', 'zədə', 'toxundu', 'vurdu'
-        ]
-        
-        message_lower = message.lower()
-        return any(keyword in message_lower for keyword in emergency_keywords)
+        return EMERGENCY_KEYWORDS.search(message)
     
     def format_triage_response(self, triage_result: dict, knowledge_level: str) -> str:
         """Format triage results into a coherent response"""
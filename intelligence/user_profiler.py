@@ -5,6 +5,8 @@ Now includes platform detection for multi-channel support
 """
 
 from .knowledge_base import detect_knowledge_level, TERMINOLOGY_LEVELS
+from .knowledge_store import knowledge_store
+from .normalization import KeywordSet
 
 # Platform detection patterns
 PLATFORM_PATTERNS = {
@@ -84,6 +86,45 @@ PLATFORM_CHARACTERISTICS = {
     }
 }
 
+# Canonical keyword forms: casing, diacritics, Cyrillic and suffixes are
+# handled by intelligence.normalization, so no spelling variants are listed
+SYMPTOM_KEYWORDS = KeywordSet([
+    'görmürəm', 'ağrı', 'dumanlı', 'qırmızı', 'görmə problem', 'görmə azalması',
+    'göz əti', 'çəp', 'problem var', 'işıq çaxması'
+])
+SURGERY_KEYWORDS = KeywordSet([
+    'əməliyyat', 'lazer', 'katarakta', 'excimer', 'çəplik',
+    'operasiya', 'cərrahiyyə', 'nə qədər çəkir', 'qiymət'
+])
+BOOKING_KEYWORDS = KeywordSet([
+    'müayinə', 'qeydiyyat', 'yazıl', 'randevu', 'gəlmək istəyirəm',
+    'vaxt', 'həkim', 'görüş', 'appointment'
+])
+PRICE_KEYWORDS = KeywordSet(['qiymət', 'pul', 'nə qədər', 'ödəniş', 'məbləğ'])
+
+LOST_INDICATORS = KeywordSet([
+    'bilmirəm', 'nə edim', 'başa düşmürəm', 'kömək',
+    'nə etməli', 'qarışıq', 'anlamıram', 'çaşqınam'
+])
+UNCERTAIN_INDICATORS = KeywordSet([
+    'ola bilər', 'düşünürəm', 'yəqin', 'görünür',
+    'deyəsən', 'bəlkə', 'şübhə', 'əmin deyil'
+])
+CONFIDENT_INDICATORS = KeywordSet([
+    'istəyirəm', 'lazımdır', 'bilirəm', 'əminəm',
+    'mütləq', 'vaxt', 'həkim seç', 'əməliyyat et'
+])
+
+GREETING_KEYWORDS = KeywordSet(['salam', 'hello', 'hi', 'privet', 'sabah', 'axşam'])
+DECIDING_KEYWORDS = KeywordSet([
+    'fərq', 'hansı yaxşı', 'seçim', 'müqayisə',
+    'daha yaxşı', 'tövsiyə', 'məsləhət'
+])
+READY_KEYWORDS = KeywordSet([
+    'müayinə', 'yazıl', 'qeydiyyat', 'vaxt',
+    'gəlmək', 'görüş', 'randevu'
+])
+
 class UserProfiler:
     """Profiles users based on their messages and conversation history"""
     
@@ -92,36 +133,20 @@ class UserProfiler:
     
     def _detect_intent(self, message: str) -> str:
         """Detect what the user is trying to accomplish"""
-        message_lower = message.lower()
-        
         # Symptom inquiry
-        symptom_keywords = [
-            'görmürəm', 'ağrıyır', 'dumanlı', 'qırmızı', 'göz ağrısı',
-            'görmə problem', 'görmə azalması', 'göz əti', 'çəp',
-            'problem var', 'ağrı', 'işıq çaxması'
-        ]
-        if any(keyword in message_lower for keyword in symptom_keywords):
+        if SYMPTOM_KEYWORDS.search(message):
             return 'symptom_inquiry'
         
         # Surgery information
-        surgery_keywords = [
-            'əməliyyat', 'lazer', 'katarakta', 'excimer', 'çəplik',
-            'operasiya', 'cərrahiyyə', 'nə qədər çəkir', 'qiymət'
-        ]
-        if any(keyword in message_lower for keyword in surgery_keywords):
+        if SURGERY_KEYWORDS.search(message):
             return 'surgery_info'
         
         # Booking intent
-        booking_keywords = [
-            'müayinə', 'qeydiyyat', 'yazılmaq', 'randevu', 'gəlmək istəyirəm',
-            'vaxt', 'həkim', 'görüş', 'appointment'
-        ]
-        if any(keyword in message_lower for keyword in booking_keywords):
+        if BOOKING_KEYWORDS.search(message):
             return 'booking'
         
         # Pricing inquiry
-        price_keywords = ['qiymət', 'pul', 'nə qədər', 'ödəniş', 'məbləğ']
-        if any(keyword in message_lower for keyword in price_keywords):
+        if PRICE_KEYWORDS.search(message):
             return 'pricing'
         
         # General inquiry
@@ -129,30 +154,16 @@ class UserProfiler:
     
     def _detect_confidence(self, message: str) -> str:
         """Detect user's confidence level about their needs"""
-        message_lower = message.lower()
-        
         # Lost/confused indicators
-        lost_indicators = [
-            'bilmirəm', 'nə edim', 'başa düşmürəm', 'kömək',
-            'nə etməli', 'qarışıq', 'anlamıram', 'çaşqınam'
-        ]
-        if any(indicator in message_lower for indicator in lost_indicators):
+        if LOST_INDICATORS.search(message):
             return 'lost'
         
         # Uncertain indicators
-        uncertain_indicators = [
-            'ola bilər', 'düşünürəm', 'yəqin', 'görünür',
-            'deyəsən', 'bəlkə', 'şübhə', 'əmin deyil'
-        ]
-        if any(indicator in message_lower for indicator in uncertain_indicators):
+        if UNCERTAIN_INDICATORS.search(message):
             return 'uncertain'
         
         # Confident indicators
-        confident_indicators = [
-            'istəyirəm', 'lazımdır', 'bilirəm', 'əminəm',
-            'mütləq', 'vaxt', 'həkim seç', 'əməliyyat et'
-        ]
-        if any(indicator in message_lower for indicator in confident_indicators):
+        if CONFIDENT_INDICATORS.search(message):
             return 'confident'
         
         # Default to uncertain
@@ -160,11 +171,8 @@ class UserProfiler:
     
     def _detect_conversation_stage(self, message: str, history: list) -> str:
         """Detect what stage of conversation flow user is in"""
-        message_lower = message.lower()
-        
         # Greeting stage
-        greeting_keywords = ['salam', 'hello', 'hi', 'privet', 'sabah', 'axşam']
-        if any(keyword in message_lower for keyword in greeting_keywords):
+        if GREETING_KEYWORDS.search(message):
             return 'greeting'
         
         # Questioning stage (asking about symptoms/options)
@@ -172,19 +180,11 @@ class UserProfiler:
             return 'questioning'
         
         # Deciding stage (comparing options, asking details)
-        deciding_keywords = [
-            'fərq', 'hansı yaxşı', 'seçim', 'müqayisə',
-            'daha yaxşı', 'tövsiyə', 'məsləhət'
-        ]
-        if any(keyword in message_lower for keyword in deciding_keywords):
+        if DECIDING_KEYWORDS.search(message):
             return 'deciding'
         
         # Ready to book (wants to schedule)
-        ready_keywords = [
-            'müayinə', 'yazıl', 'qeydiyyat', 'vaxt',
-            'gəlmək', 'görüş', 'randevu'
-        ]
-        if any(keyword in message_lower for keyword in ready_keywords):
+        if READY_KEYWORDS.search(message):
             return 'ready_to_book'
         
         # Extended conversation
@@ -331,9 +331,9 @@ def generate_adaptive_prompt(profile: dict, symptom_analysis: dict = None) -> st
 - Emoji istifadə et ✅ 👁️ 🏥
 - Düymələr YOXDUR - əvəzinə nömrələnmiş siyahı yaz (1️⃣ 2️⃣ 3️⃣)
 - Sərbəst, rahat dil istifadə et
-- WhatsApp linkləri ver: wa.me/994555512400
+- WhatsApp linkləri ver: {whatsapp}
 - Qısa mesajlar → daha çox interaction
-        """)
+        """.format(whatsapp=knowledge_store.snapshot.clinic.get('whatsapp', '')))
     elif platform == 'facebook':
         prompt_parts.append("""
 **PLATFORM: Facebook Messenger 💬**
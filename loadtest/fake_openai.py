@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Fake OpenAI + Graph API Server
+OpenAI-compatible /v1/chat/completions (plain and streamed) and a Graph API
+/messages sink for load testing the webhook -> Rasa -> action server path
+without paying for tokens or hitting rate limits.
+
+Point the services at it:
+    OPENAI_BASE_URL=http://localhost:8090/v1        (action server)
+    GRAPH_API_URL=http://localhost:8090/graph       (social media webhook)
+
+Latency distributions (milliseconds):
+    fixed:800  uniform:300,1500  normal:900,250  lognormal:800,0.5 (median, sigma)
+
+Usage:
+    python loadtest/fake_openai.py --latency lognormal:900,0.4 --token-delay 15 \\
+        --error-rate 0.01 --rate-limit-rate 0.02 --graph-latency fixed:120
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Callable
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+REPLIES = [
+    "Salam! Sizə necə kömək edə bilərəm? Göz problemi, əməliyyatlar və ya müayinə barədə soruşa bilərsiniz.",
+    "Dumanlı görmə katarakta əlaməti ola bilər. Nə vaxtdan başlayıb? Hər iki gözdə eynidir? "
+    "Dəqiq diaqnoz üçün müayinə vacibdir.",
+    "Əməliyyatın qiyməti yalnız müayinədən sonra müəyyən edilir. Müayinəyə yazılmaq üçün "
+    "+994 12 541 19 00 nömrəsi ilə əlaqə saxlaya bilərsiniz.",
+    "Excimer laser gözlük və linzalardan azad olmaq üçün aparılan lazer əməliyyatıdır. "
+    "Sizə uyğun olub-olmadığını həkimimiz müayinədə müəyyən edəcək.",
+]
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Sampler (seconds) for a 'kind:params' latency spec in milliseconds"""
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',') if v]
+    if kind == 'fixed':
+        return lambda: values[0] / 1000
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == 'normal':
+        return lambda: max(0.0, random.gauss(values[0], values[1])) / 1000
+    if kind == 'lognormal':
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1]) / 1000
+    raise argparse.ArgumentTypeError(f"unknown latency distribution: {spec}")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeServer:
+    """Request handlers plus counters served on /stats"""
+
+    def __init__(self, args):
+        self.llm_latency = parse_latency(args.latency)
+        self.graph_latency = parse_latency(args.graph_latency)
+        self.token_delay = args.token_delay / 1000
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.timeout_rate = args.timeout_rate
+        self.hang_seconds = args.hang_seconds
+        self.counts = Counter()
+        self.started = time.time()
+
+    def _injected_error(self):
+        """Error response to inject for this request, if any"""
+        roll = random.random()
+        if roll < self.error_rate:
+            self.counts['llm_500'] += 1
+            return web.json_response(
+                {"error": {"message": "The server had an error while processing your request.",
+                           "type": "server_error"}}, status=500)
+        roll -= self.error_rate
+        if roll < self.rate_limit_rate:
+            self.counts['llm_429'] += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit reached for requests", "type": "requests",
+                           "code": "rate_limit_exceeded"}},
+                status=429, headers={"Retry-After": "1"})
+        return None
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.counts['llm_requests'] += 1
+
+        if random.random() < self.timeout_rate:
+            # Client-side timeout test: hold the connection open
+            self.counts['llm_hung'] += 1
+            await asyncio.sleep(self.hang_seconds)
+
+        await asyncio.sleep(self.llm_latency())
+        error = self._injected_error()
+        if error is not None:
+            return error
+
+        model = body.get("model", "gpt-4o-mini")
+        reply = random.choice(REPLIES)
+        max_tokens = body.get("max_tokens")
+        if max_tokens:
+            reply = reply[:max_tokens * 4]
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in body.get("messages", []))
+        completion_tokens = estimate_tokens(reply)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if body.get("stream"):
+            return await self._stream(request, completion_id, created, model, reply)
+
+        self.counts['llm_200'] += 1
+        return web.json_response({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    async def _stream(self, request, completion_id, created, model, reply) -> web.StreamResponse:
+        """Server-sent events, one chunk per word"""
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        def chunk(delta, finish_reason=None):
+            return "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }, ensure_ascii=False) + "\n\n"
+
+        await response.write(chunk({"role": "assistant", "content": ""}).encode())
+        for i, word in enumerate(reply.split(" ")):
+            await asyncio.sleep(self.token_delay)
+            await response.write(chunk({"content": word if i == 0 else " " + word}).encode())
+        await response.write(chunk({}, "stop").encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        self.counts['llm_200'] += 1
+        self.counts['llm_streamed'] += 1
+        return response
+
+    async def graph_messages(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        node = request.match_info['node']
+        self.counts['graph_requests'] += 1
+        await asyncio.sleep(self.graph_latency())
+
+        if body.get("messaging_product") == "whatsapp":
+            if body.get("status") == "read":
+                self.counts['graph_read'] += 1
+                return web.json_response({"success": True})
+            self.counts['graph_whatsapp'] += 1
+            return web.json_response({
+                "messaging_product": "whatsapp",
+                "contacts": [{"input": body.get("to"), "wa_id": body.get("to")}],
+                "messages": [{"id": f"wamid.{uuid.uuid4().hex}"}],
+            })
+
+        self.counts['graph_messenger'] += 1
+        return web.json_response({
+            "recipient_id": body.get("recipient", {}).get("id", node),
+            "message_id": f"m_{uuid.uuid4().hex}",
+        })
+
+    async def graph_root(self, request: web.Request) -> web.Response:
+        return web.json_response({"fake": True})
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"uptime_seconds": round(time.time() - self.started, 1), **self.counts})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_post("/graph/{node}/messages", self.graph_messages)
+        app.router.add_get("/graph/", self.graph_root)
+        app.router.add_get("/stats", self.stats)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', default='lognormal:900,0.4', help='LLM time to first byte')
+    parser.add_argument('--token-delay', type=float, default=15, help='ms between streamed chunks')
+    parser.add_argument('--graph-latency', default='fixed:120')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of 500 responses')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of 429 responses')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='fraction of requests held open')
+    parser.add_argument('--hang-seconds', type=float, default=60)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    server = FakeServer(args)
+    logger.info("🧪 Fake OpenAI on http://%s:%s/v1, Graph API on http://%s:%s/graph",
+                args.host, args.port, args.host, args.port)
+    web.run_app(server.app(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
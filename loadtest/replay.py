@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Conversation Replay Harness
+Drives recorded or synthetic Azerbaijani conversations through the full
+webhook -> Rasa -> action server path (or straight into Rasa's REST channel)
+and reports throughput plus p50/p95/p99 end to end and per stage.
+
+Run the stack against loadtest/fake_openai.py (OPENAI_BASE_URL, GRAPH_API_URL)
+with TRACE_LOG_PATH set on each service, then pass those span files with
+--spans so the stage breakdown (rasa_forward, action, llm, graph_send, ...)
+covers only the spans recorded during this run.
+
+Usage:
+    python loadtest/replay.py --synthetic 200 --concurrency 50 --spans traces/*.jsonl
+    python loadtest/replay.py --conversations recorded.jsonl --platform facebook
+    python loadtest/replay.py --from-db 500 --platform rasa --url http://localhost:5005/webhooks/rest/webhook
+
+Conversation files are JSON lines: {"user_id": "...", "messages": ["...", ...]}
+"""
+
+import argparse
+import asyncio
+import glob
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from typing import Any, Dict, List
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from observability.tracing import load_spans, summarize_spans
+
+DEFAULT_URLS = {
+    'whatsapp': 'http://localhost:5000/webhooks/whatsapp/webhook',
+    'facebook': 'http://localhost:5000/webhooks/facebook/webhook',
+    'rasa': 'http://localhost:5005/webhooks/rest/webhook',
+}
+
+OPENERS = [
+    "Salam", "Salam, sualım var", "Sabahınız xeyir", "Salam, gözümlə bağlı problem var",
+]
+QUESTIONS = [
+    "Gözlərim dumanlı görür, nə etməliyəm?",
+    "Uzağı yaxşı görmürəm, gözlük taxıram",
+    "Gözüm qızarıb və ağrıyır",
+    "Katarakta əməliyyatının qiyməti nə qədərdir?",
+    "Excimer laser haqqında məlumat verin",
+    "Lazer əməliyyatı ağrılıdır?",
+    "Həkimlər kimdir?",
+    "Uşağımın gözü çəpdir, nə vaxt müraciət edək?",
+    "Şəkərim var, göz dibi müayinəsi lazımdır?",
+    "Gözümün ağında ət var",
+    "Əməliyyatdan sonra nə qədər istirahət lazımdır?",
+    "Qara su nədir?",
+]
+CLOSERS = [
+    "Müayinəyə yazılmaq istəyirəm", "Ünvanınız haradadır?", "Telefon nömrəniz?",
+    "Çox sağ olun", "Təşəkkür edirəm, fikirləşərəm",
+]
+
+
+def synthetic_conversations(count: int) -> List[Dict[str, Any]]:
+    """Random opener, 1-4 questions and a closer per conversation"""
+    conversations = []
+    for i in range(count):
+        messages = [random.choice(OPENERS)]
+        messages += random.sample(QUESTIONS, random.randint(1, 4))
+        messages.append(random.choice(CLOSERS))
+        conversations.append({'user_id': f"99455{random.randint(0, 9_999_999):07d}", 'messages': messages})
+    return conversations
+
+
+def load_conversations(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def recorded_conversations(limit: int) -> List[Dict[str, Any]]:
+    """User messages of recent leads from marketing_leads.conversation_history"""
+    from marketing.database import db, ANALYTICS_POOL
+
+    rows = db.using(ANALYTICS_POOL).execute_query("""
+        SELECT user_id, conversation_history FROM marketing_leads
+        WHERE total_messages >= 2
+        ORDER BY last_interaction DESC
+        LIMIT %s;
+    """, (limit,)) or []
+    conversations = []
+    for row in rows:
+        messages = [entry.get('message') for entry in row['conversation_history'] or []
+                    if entry.get('sender') == 'user' and entry.get('message')]
+        if messages:
+            # Replay under a fresh id so the real lead is not touched
+            conversations.append({'user_id': f"replay_{uuid.uuid4().hex[:12]}", 'messages': messages})
+    return conversations
+
+
+def build_payload(platform: str, user_id: str, text: str) -> Dict[str, Any]:
+    """Inbound event in the format the platform's webhook (or Rasa's REST channel) receives"""
+    now = int(time.time())
+    if platform == 'whatsapp':
+        return {
+            "object": "whatsapp_business_account",
+            "entry": [{"id": "loadtest", "changes": [{"field": "messages", "value": {
+                "messaging_product": "whatsapp",
+                "metadata": {"phone_number_id": "loadtest"},
+                "contacts": [{"wa_id": user_id, "profile": {"name": "Load Test"}}],
+                "messages": [{"from": user_id, "id": f"wamid.{uuid.uuid4().hex}", "timestamp": str(now),
+                              "type": "text", "text": {"body": text}}],
+            }}]}],
+        }
+    if platform == 'facebook':
+        return {
+            "object": "page",
+            "entry": [{"id": "loadtest", "time": now * 1000, "messaging": [{
+                "sender": {"id": user_id},
+                "recipient": {"id": "loadtest"},
+                "timestamp": now * 1000,
+                "message": {"mid": f"m_{uuid.uuid4().hex}", "text": text},
+            }]}],
+        }
+    return {"sender": f"loadtest_{user_id}", "message": text, "metadata": {"platform": "loadtest"}}
+
+
+class Replay:
+    """Runs conversations concurrently and records per-message latency"""
+
+    def __init__(self, args):
+        self.url = args.url or DEFAULT_URLS[args.platform]
+        self.platform = args.platform
+        self.think_time = args.think_time
+        self.app_secret = args.app_secret.encode() if args.app_secret else None
+        self.timeout = aiohttp.ClientTimeout(total=args.timeout)
+        self.records = []  # span-like records for summarize_spans
+        self.statuses = {}
+
+    def _headers(self, body: bytes) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.app_secret and self.platform != 'rasa':
+            digest = hmac.new(self.app_secret, body, hashlib.sha256).hexdigest()
+            headers["X-Hub-Signature-256"] = f"sha256={digest}"
+        return headers
+
+    async def _send(self, session: aiohttp.ClientSession, user_id: str, text: str):
+        body = json.dumps(build_payload(self.platform, user_id, text)).encode()
+        start = time.perf_counter()
+        error = None
+        try:
+            async with session.post(self.url, data=body, headers=self._headers(body)) as response:
+                await response.read()
+                status = str(response.status)
+                if response.status >= 400:
+                    error = status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = error = type(e).__name__
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.records.append({
+            'span': 'replay_end_to_end',
+            'platform': self.platform,
+            'duration_ms': (time.perf_counter() - start) * 1000,
+            'error': error,
+        })
+
+    async def _conversation(self, session, semaphore, conversation):
+        async with semaphore:
+            for text in conversation['messages']:
+                await self._send(session, conversation['user_id'], text)
+                if self.think_time:
+                    await asyncio.sleep(random.expovariate(1 / self.think_time))
+
+    async def run(self, conversations: List[Dict[str, Any]], concurrency: int) -> float:
+        """Replay all conversations; returns elapsed seconds"""
+        semaphore = asyncio.Semaphore(concurrency)
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        start = time.perf_counter()
+        async with aiohttp.ClientSession(connector=connector, timeout=self.timeout) as session:
+            await asyncio.gather(*(self._conversation(session, semaphore, c) for c in conversations))
+        return time.perf_counter() - start
+
+
+def print_summary(summary: Dict[str, Dict[str, Any]]):
+    print(f"{'stage/platform':<40} {'count':>7} {'err':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for stage, stats in summary.items():
+        print(f"{stage:<40} {stats['count']:>7} {stats['errors']:>5} "
+              f"{stats['p50']:>9.1f} {stats['p95']:>9.1f} {stats['p99']:>9.1f} {stats['max']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--synthetic', type=int, default=100, help='number of synthetic conversations')
+    source.add_argument('--conversations', help='JSON-lines file of recorded conversations')
+    source.add_argument('--from-db', type=int, metavar='N', help='replay the last N leads from marketing_leads')
+    parser.add_argument('--platform', choices=sorted(DEFAULT_URLS), default='whatsapp')
+    parser.add_argument('--url', help='override the target URL')
+    parser.add_argument('--concurrency', type=int, default=20, help='conversations in flight')
+    parser.add_argument('--think-time', type=float, default=0.0, help='mean seconds between messages')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--app-secret', default=os.getenv('FB_APP_SECRET', ''), help='signs webhook payloads')
+    parser.add_argument('--spans', nargs='*', default=[], help='span files (globs) written during the run')
+    args = parser.parse_args()
+
+    if args.conversations:
+        conversations = load_conversations(args.conversations)
+    elif args.from_db:
+        conversations = recorded_conversations(args.from_db)
+    else:
+        conversations = synthetic_conversations(args.synthetic)
+    total_messages = sum(len(c['messages']) for c in conversations)
+
+    replay = Replay(args)
+    print(f"🚀 Replaying {len(conversations)} conversations ({total_messages} messages) "
+          f"to {replay.url} with concurrency {args.concurrency}")
+    run_start = time.time()
+    elapsed = asyncio.run(replay.run(conversations, args.concurrency))
+
+    print(f"\n📊 {total_messages} messages in {elapsed:.1f}s = {total_messages / elapsed:.1f} msg/s"
+          f"   responses: {dict(sorted(replay.statuses.items()))}\n")
+
+    records = list(replay.records)
+    for pattern in args.spans:
+        for path in glob.glob(pattern):
+            records.extend(r for r in load_spans(path) if r.get('start', 0) >= run_start)
+    print_summary(summarize_spans(records))
+
+
+if __name__ == "__main__":
+    main()
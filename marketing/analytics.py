@@ -2,16 +2,52 @@
 Marketing Analytics - Track and analyze marketing performance
 """
 
+import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
-from .database import db
+from .database import db, ANALYTICS_POOL
+
+logger = logging.getLogger(__name__)
+
+# Fixed dashboard queries, prepared once per connection
+db.prepare('analytics_daily_stats', """
+    SELECT * FROM marketing_analytics
+    WHERE date = COALESCE(%s::DATE, CURRENT_DATE);
+""")
+db.prepare('analytics_hourly_stats', """
+    SELECT * FROM marketing_analytics_hourly
+    WHERE hour >= date_trunc('hour', NOW()) - make_interval(hours => %s - 1)
+    ORDER BY hour;
+""")
+db.prepare('analytics_top_interests', """
+    SELECT value, leads
+    FROM interest_counts
+    WHERE kind = %s AND leads > 0
+    ORDER BY leads DESC
+    LIMIT %s;
+""")
+db.prepare('analytics_recent_events', """
+    SELECT * FROM conversion_events
+    ORDER BY created_at DESC
+    LIMIT %s;
+""")
+db.prepare('analytics_event_counts', """
+    SELECT 
+        event_type::TEXT AS event_type,
+        COUNT(*) as count
+    FROM conversion_events
+    WHERE created_at >= CURRENT_DATE - %s::INT
+    GROUP BY event_type
+    ORDER BY count DESC;
+""")
 
 
 class MarketingAnalytics:
     """Provides analytics and insights on marketing performance"""
     
-    def __init__(self):
-        self.db = db
+    def __init__(self, pool: str = ANALYTICS_POOL):
+        # Heavy dashboard queries stay off the reply path's connections
+        self.db = db.using(pool)
     
     def get_lead_stats(self) -> Dict[str, Any]:
         """
@@ -47,7 +83,7 @@ class MarketingAnalytics:
                 'today_leads': today_leads
             }
         except Exception as e:
-            print(f"❌ Error getting lead stats: {e}")
+            logger.error("❌ Error getting lead stats: %s", e)
             return {
                 'total_leads': 0,
                 'hot_leads': 0,
@@ -64,15 +100,8 @@ class MarketingAnalytics:
         Returns:
             Dict with daily statistics
         """
-        date_param = date if date else 'CURRENT_DATE'
-        
-        query = f"""
-            SELECT * FROM marketing_analytics
-            WHERE date = {date_param};
-        """
-        
         try:
-            result = self.db.execute_query(query)
+            result = self.db.execute_prepared('analytics_daily_stats', (date,))
             return dict(result[0]) if result else {
                 'date': date or datetime.now().date(),
                 'total_leads': 0,
@@ -82,7 +111,7 @@ class MarketingAnalytics:
                 'follow_up_responses': 0
             }
         except Exception as e:
-            print(f"❌ Error getting daily stats: {e}")
+            logger.error("❌ Error getting daily stats: %s", e)
             return {}
     
     def get_weekly_stats(self) -> Dict[str, Any]:
@@ -102,7 +131,7 @@ class MarketingAnalytics:
             result = self.db.execute_query(query)
             return dict(result[0]) if result else {}
         except Exception as e:
-            print(f"❌ Error getting weekly stats: {e}")
+            logger.error("❌ Error getting weekly stats: %s", e)
             return {}
     
     def get_monthly_stats(self) -> Dict[str, Any]:
@@ -122,9 +151,26 @@ class MarketingAnalytics:
             result = self.db.execute_query(query)
             return dict(result[0]) if result else {}
         except Exception as e:
-            print(f"❌ Error getting monthly stats: {e}")
+            logger.error("❌ Error getting monthly stats: %s", e)
             return {}
     
+    def get_hourly_stats(self, hours: int = 24) -> List[Dict[str, Any]]:
+        """
+        Get per-hour statistics from the analytics rollup
+        
+        Args:
+            hours: Number of most recent hours to return
+        
+        Returns:
+            List of dicts (oldest first) with hour and counters
+        """
+        try:
+            results = self.db.execute_prepared('analytics_hourly_stats', (hours,))
+            return [dict(row) for row in results] if results else []
+        except Exception as e:
+            logger.error("❌ Error getting hourly stats: %s", e)
+            return []
+    
     def get_conversion_funnel(self) -> Dict[str, Any]:
         """
         Get conversion funnel statistics
@@ -189,7 +235,7 @@ class MarketingAnalytics:
                 }
             }
         except Exception as e:
-            print(f"❌ Error getting conversion funnel: {e}")
+            logger.error("❌ Error getting conversion funnel: %s", e)
             return {}
     
     def get_lead_distribution(self) -> Dict[str, Any]:
@@ -215,80 +261,55 @@ class MarketingAnalytics:
                     }
             return distribution
         except Exception as e:
-            print(f"❌ Error getting lead distribution: {e}")
+            logger.error("❌ Error getting lead distribution: %s", e)
             return {}
     
     def get_top_surgeries(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get most inquired about surgeries"""
-        query = """
-            SELECT 
-                UNNEST(surgeries_interested) as surgery,
-                COUNT(*) as inquiry_count
-            FROM marketing_leads
-            WHERE ARRAY_LENGTH(surgeries_interested, 1) > 0
-            GROUP BY surgery
-            ORDER BY inquiry_count DESC
-            LIMIT %s;
-        """
-        
         try:
-            results = self.db.execute_query(query, (limit,))
-            return [dict(row) for row in results] if results else []
+            results = self.db.execute_prepared('analytics_top_interests', ('surgery', limit))
+            return [
+                {'surgery': row['value'], 'inquiry_count': row['leads']} for row in results
+            ] if results else []
         except Exception as e:
-            print(f"❌ Error getting top surgeries: {e}")
+            logger.error("❌ Error getting top surgeries: %s", e)
             return []
     
     def get_top_symptoms(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get most reported symptoms"""
-        query = """
-            SELECT 
-                UNNEST(symptoms) as symptom,
-                COUNT(*) as mention_count
-            FROM marketing_leads
-            WHERE ARRAY_LENGTH(symptoms, 1) > 0
-            GROUP BY symptom
-            ORDER BY mention_count DESC
-            LIMIT %s;
-        """
-        
         try:
-            results = self.db.execute_query(query, (limit,))
-            return [dict(row) for row in results] if results else []
+            results = self.db.execute_prepared('analytics_top_interests', ('symptom', limit))
+            return [
+                {'symptom': row['value'], 'mention_count': row['leads']} for row in results
+            ] if results else []
         except Exception as e:
-            print(f"❌ Error getting top symptoms: {e}")
+            logger.error("❌ Error getting top symptoms: %s", e)
             return []
     
     def get_conversion_events(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Get recent conversion events"""
-        query = """
-            SELECT * FROM conversion_events
-            ORDER BY created_at DESC
-            LIMIT %s;
-        """
-        
         try:
-            results = self.db.execute_query(query, (limit,))
+            results = self.db.execute_prepared('analytics_recent_events', (limit,))
             return [dict(row) for row in results] if results else []
         except Exception as e:
-            print(f"❌ Error getting conversion events: {e}")
+            logger.error("❌ Error getting conversion events: %s", e)
             return []
     
-    def get_event_counts(self) -> Dict[str, int]:
-        """Get counts of different event types"""
-        query = """
-            SELECT 
-                event_type,
-                COUNT(*) as count
-            FROM conversion_events
-            GROUP BY event_type
-            ORDER BY count DESC;
+    def get_event_counts(self, days: int = 30) -> Dict[str, int]:
         """
+        Get counts of different event types
         
+        Args:
+            days: Count events of the last N days (only their partitions are scanned)
+        
+        Returns:
+            Dict of event type -> count
+        """
         try:
-            results = self.db.execute_query(query)
+            results = self.db.execute_prepared('analytics_event_counts', (days - 1,))
             return {row['event_type']: row['count'] for row in results} if results else {}
         except Exception as e:
-            print(f"❌ Error getting event counts: {e}")
+            logger.error("❌ Error getting event counts: %s", e)
             return {}
     
     def get_dashboard_summary(self) -> Dict[str, Any]:
@@ -329,7 +350,7 @@ class MarketingAnalytics:
             results = self.db.execute_query(query)
             return {row['score_range']: row['count'] for row in results} if results else {}
         except Exception as e:
-            print(f"❌ Error getting score distribution: {e}")
+            logger.error("❌ Error getting score distribution: %s", e)
             return {}
     
     def get_recent_hot_leads(self, limit: int = 10) -> List[Dict[str, Any]]:
@@ -351,7 +372,7 @@ class MarketingAnalytics:
             results = self.db.execute_query(query, (limit,))
             return [dict(row) for row in results] if results else []
         except Exception as e:
-            print(f"❌ Error getting recent hot leads: {e}")
+            logger.error("❌ Error getting recent hot leads: %s", e)
             return []
     
     def get_engagement_metrics(self) -> Dict[str, Any]:
@@ -381,7 +402,7 @@ class MarketingAnalytics:
                 'highly_engaged_leads': highly_engaged
             }
         except Exception as e:
-            print(f"❌ Error getting engagement metrics: {e}")
+            logger.error("❌ Error getting engagement metrics: %s", e)
             return {}
     
     def export_data_for_analysis(self, days: int = 30) -> Dict[str, List]:
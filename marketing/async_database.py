@@ -0,0 +1,353 @@
+"""
+Async PostgreSQL access for the marketing system (asyncpg)
+
+Same query surface as DatabaseManager (execute_query, execute_values,
+execute_prepared, using, ping, close) with psycopg2-style placeholders, so
+the SQL in lead_tracker / follow_up_scheduler is shared between the sync
+and async paths. asyncpg prepares and caches every statement per
+connection, so execute_prepared is a plain query here; with
+DB_PREPARED_STATEMENTS off the statement cache is disabled instead.
+
+AsyncLeadTracker and AsyncFollowUpScheduler run their reply-path queries
+natively; AsyncMarketingAnalytics runs the (report-only) analytics methods
+in a worker thread on the psycopg2 analytics pool.
+"""
+
+import asyncio
+import json
+import logging
+import shlex
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import asyncpg
+
+from .analytics import MarketingAnalytics
+from .database import (
+    db, ANALYTICS_POOL, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_PREPARED_STATEMENTS, POOL_CONFIGS, PRIMARY_POOL,
+    _to_server_params,
+)
+from .event_writer import event_writer
+from .follow_up_scheduler import (
+    FollowUpScheduler, MARK_RESPONSE_QUERY, SCHEDULE_FOLLOW_UP_QUERY,
+)
+from .lead_tracker import LeadTracker, RECORD_INTERESTS_QUERY
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=512)
+def _convert(query: str):
+    return _to_server_params(query)
+
+
+def _values(names: Optional[List[str]], params) -> list:
+    if names:
+        return [params[key] for key in names]
+    return list(params or ())
+
+
+def _connect_kwargs(config: Dict[str, Any]) -> Dict[str, Any]:
+    """asyncpg pool arguments from a psycopg2-style pool config"""
+    server_settings = {}
+    if config.get('application_name'):
+        server_settings['application_name'] = config['application_name']
+    # '-c statement_timeout=15000 -c ...' -> server settings
+    tokens = shlex.split(config.get('options', ''))
+    for flag, setting in zip(tokens[::2], tokens[1::2]):
+        if flag == '-c' and '=' in setting:
+            key, value = setting.split('=', 1)
+            server_settings[key] = value
+    return {
+        'host': config['host'],
+        'port': int(config['port']),
+        'database': config['database'],
+        'user': config['user'],
+        'password': config['password'],
+        'server_settings': server_settings,
+        'min_size': 1,
+        'max_size': config.get('maxconn', DB_POOL_MAX),
+        # Behind a transaction-pooling PgBouncer a cached statement may be
+        # executed on a server connection that never prepared it
+        'statement_cache_size': 100 if DB_PREPARED_STATEMENTS else 0,
+    }
+
+
+async def _init_connection(conn):
+    # JSON(B) in and out as Python objects; strings are passed through as
+    # already-encoded JSON, like the psycopg2 path (json.dumps(...)::JSONB)
+    for type_name in ('json', 'jsonb'):
+        await conn.set_type_codec(
+            type_name,
+            encoder=lambda value: value if isinstance(value, str) else json.dumps(value),
+            decoder=json.loads,
+            schema='pg_catalog',
+        )
+
+
+class AsyncDatabaseManager:
+    """Manages asyncpg connection pools and operations"""
+
+    def __init__(self, pool_configs: Dict[str, Dict[str, Any]] = None, default_pool: str = PRIMARY_POOL):
+        self.pool_configs = pool_configs or POOL_CONFIGS
+        self.default_pool = default_pool
+        self._pools: Dict[str, asyncpg.Pool] = {}
+        self._lock = asyncio.Lock()
+
+    def using(self, pool: str) -> 'AsyncDatabaseManager':
+        """Manager sharing these pools whose queries default to another pool"""
+        routed = AsyncDatabaseManager.__new__(AsyncDatabaseManager)
+        routed.__dict__.update(self.__dict__)
+        routed.default_pool = pool
+        return routed
+
+    async def _get_pool(self, name: Optional[str] = None) -> asyncpg.Pool:
+        name = name or self.default_pool
+        if name not in self.pool_configs:
+            name = PRIMARY_POOL
+        if name not in self._pools:
+            async with self._lock:
+                if name not in self._pools:
+                    try:
+                        self._pools[name] = await asyncpg.create_pool(
+                            init=_init_connection, **_connect_kwargs(self.pool_configs[name])
+                        )
+                        logger.info("✅ Async database pool '%s' connected successfully", name)
+                    except Exception as e:
+                        logger.error("❌ Async database connection error (%s pool): %s", name, e)
+                        raise
+        return self._pools[name]
+
+    async def execute_query(self, query: str, params=None, fetch: bool = True, pool: Optional[str] = None):
+        """Execute a SQL query (psycopg2 placeholders)"""
+        sql, names, _ = _convert(query)
+        conn_pool = await self._get_pool(pool)
+        try:
+            async with conn_pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+                if fetch:
+                    return await conn.fetch(sql, *_values(names, params))
+                await conn.execute(sql, *_values(names, params))
+                return None
+        except Exception as e:
+            logger.error("❌ Database error: %s", e)
+            raise
+
+    async def execute_values(self, query: str, rows: Iterable[tuple], page_size: int = 1000,
+                             fetch: bool = False, pool: Optional[str] = None):
+        """Execute a multi-row statement (INSERT ... VALUES %s), one round trip per page"""
+        rows = list(rows)
+        results = []
+        conn_pool = await self._get_pool(pool)
+        async with conn_pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+            async with conn.transaction():
+                for start in range(0, len(rows), page_size):
+                    page = rows[start:start + page_size]
+                    width = len(page[0])
+                    values_sql = ", ".join(
+                        "(" + ", ".join(f"${i * width + j + 1}" for j in range(width)) + ")"
+                        for i in range(len(page))
+                    )
+                    sql = query.replace("%s", values_sql, 1).replace("%%", "%")
+                    args = [value for row in page for value in row]
+                    if fetch:
+                        results.extend(await conn.fetch(sql, *args))
+                    else:
+                        await conn.execute(sql, *args)
+        return results if fetch else None
+
+    def prepare(self, name: str, query: str):
+        """Register a named statement (shared with the sync DatabaseManager)"""
+        db.prepare(name, query)
+
+    async def execute_prepared(self, name: str, params=None, fetch: bool = True):
+        """Execute a statement registered with prepare() (asyncpg caches the plan)"""
+        query = db._statements[name][0]
+        return await self.execute_query(query, params, fetch=fetch)
+
+    async def ping(self) -> bool:
+        """Run a trivial query to confirm the database is reachable"""
+        conn_pool = await self._get_pool(PRIMARY_POOL)
+        async with conn_pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+            return await conn.fetchval("SELECT 1") == 1
+
+    async def close(self):
+        """Close all pools"""
+        for name, conn_pool in list(self._pools.items()):
+            await conn_pool.close()
+            logger.info("✅ Async database pool '%s' closed", name)
+        self._pools.clear()
+
+
+# Global async database instance
+async_db = AsyncDatabaseManager()
+
+
+class AsyncLeadTracker:
+    """Async LeadTracker: same API, awaitable, scoring/SQL shared with the sync tracker"""
+
+    def __init__(self):
+        self.db = async_db
+        self._sync = LeadTracker()  # message -> params/events helpers and reports
+
+    async def create_or_update_lead(self, user_id: str, message: str,
+                                    detected_items: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Create or update a lead in the database (see LeadTracker.create_or_update_lead)
+
+        Returns:
+            Updated lead data with score
+        """
+        params = self._sync._lead_params(user_id, message, detected_items)
+
+        result = await self.db.execute_prepared('lead_update', params)
+        if not result:
+            result = await self.db.execute_prepared('lead_insert', params)
+            if not result:
+                # Lost the race against a concurrent first message
+                result = await self.db.execute_prepared('lead_update', params)
+                if not result:
+                    return {}
+
+        lead = dict(result[0])
+        old_status = lead.pop('old_status', None)
+
+        await self._record_interests(user_id, detected_items)
+        lifecycle = self._sync._lifecycle_events(user_id, lead, old_status)
+        await self._log_conversion_events(user_id, detected_items, lifecycle)
+        return lead
+
+    async def _record_interests(self, user_id: str, detected_items: Dict[str, Any]):
+        rows = self._sync._interest_rows(user_id, detected_items)
+        if not rows:
+            return
+        try:
+            await self.db.execute_values(RECORD_INTERESTS_QUERY, rows)
+        except Exception as e:
+            logger.warning("⚠️ Error recording interests: %s", e)
+
+    async def _log_conversion_events(self, user_id: str, detected_items: Dict[str, Any],
+                                     lifecycle: Optional[List[tuple]] = None):
+        events = self._sync._conversion_events(detected_items, lifecycle)
+        if not events:
+            return
+        rows = [(user_id, event_type, event_data) for event_type, event_data in events]
+        try:
+            if event_writer.mode == 'write_through':
+                await asyncio.to_thread(event_writer.write_many, rows)
+            else:
+                event_writer.write_many(rows)  # only queues
+        except Exception as e:
+            logger.warning("⚠️ Error logging events: %s", e)
+
+    async def get_lead(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get lead by user_id"""
+        result = await self.db.execute_prepared('lead_get', (user_id,))
+        return dict(result[0]) if result else None
+
+    async def save_bot_response(self, user_id: str, bot_message: str) -> bool:
+        """Save bot response to conversation history"""
+        entry = json.dumps({
+            'timestamp': datetime.now().isoformat(),
+            'message': bot_message,
+            'sender': 'bot'
+        })
+        try:
+            if not await self.db.execute_prepared('lead_append_bot_response', (entry, user_id)):
+                logger.warning("⚠️ Cannot save bot response: Lead %s not found", user_id)
+                return False
+            logger.debug("💾 Bot response saved for %s", user_id)
+            return True
+        except Exception as e:
+            logger.warning("⚠️ Error saving bot response: %s", e)
+            return False
+
+    async def mark_lead_converted(self, user_id: str):
+        """Mark lead as converted (booked appointment)"""
+        await asyncio.to_thread(self._sync.mark_lead_converted, user_id)
+
+    async def get_hot_leads(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get all hot leads"""
+        return await asyncio.to_thread(self._sync.get_hot_leads, limit)
+
+    async def get_lead_stats(self) -> Dict[str, Any]:
+        """Get overall lead statistics"""
+        return await asyncio.to_thread(self._sync.get_lead_stats)
+
+
+class AsyncFollowUpScheduler:
+    """Async FollowUpScheduler for per-lead checks; batch sending stays on threads"""
+
+    def __init__(self):
+        self.db = async_db
+        self._sync = FollowUpScheduler()
+
+    async def get_leads_needing_followup(self, follow_up_type: Optional[str] = None, limit: int = 50,
+                                         after: Optional[Tuple[int, str]] = None) -> List[Dict[str, Any]]:
+        """Get leads that are due a follow-up (see FollowUpScheduler.get_leads_needing_followup)"""
+        name, params = self._sync._due_statement(follow_up_type, limit, after)
+        try:
+            results = await self.db.execute_prepared(name, params)
+            return [dict(row) for row in results] if results else []
+        except Exception as e:
+            logger.error("❌ Error getting leads for follow-up: %s", e)
+            return []
+
+    async def should_send_followup(self, user_id: str) -> Dict[str, Any]:
+        """Determine if and what type of follow-up should be sent"""
+        result = await self.db.execute_prepared('followup_should_send', (user_id,))
+        return self._sync._followup_decision(result)
+
+    async def schedule_follow_up(self, user_id: str, follow_up_type: str) -> bool:
+        """Schedule a follow-up for a lead"""
+        try:
+            await self.db.execute_query(SCHEDULE_FOLLOW_UP_QUERY, (user_id, follow_up_type), fetch=False)
+            logger.info("📧 Follow-up scheduled: %s (%s)", user_id, follow_up_type)
+            return True
+        except Exception as e:
+            logger.error("❌ Error scheduling follow-up: %s", e)
+            return False
+
+    async def mark_response_received(self, user_id: str, follow_up_type: str) -> bool:
+        """Mark that user responded to follow-up"""
+        try:
+            await self.db.execute_query(MARK_RESPONSE_QUERY, (user_id, follow_up_type), fetch=False)
+            logger.info("✅ Follow-up response recorded: %s", user_id)
+            return True
+        except Exception as e:
+            logger.error("❌ Error marking response: %s", e)
+            return False
+
+    def get_follow_up_message(self, follow_up_type: str,
+                              lead_data: Optional[Dict[str, Any]] = None) -> str:
+        """Get appropriate follow-up message (no I/O)"""
+        return self._sync.get_follow_up_message(follow_up_type, lead_data)
+
+    async def process_all_followups(self) -> Dict[str, int]:
+        """Send all pending follow-ups (concurrent channel sends run on the sender's threads)"""
+        return await asyncio.to_thread(self._sync.process_all_followups)
+
+
+class AsyncMarketingAnalytics:
+    """
+    Awaitable MarketingAnalytics
+
+    Every public MarketingAnalytics method is available as a coroutine that
+    runs the sync method in a worker thread on the analytics pool. These
+    are report queries, so they only need to not block the event loop.
+    """
+
+    def __init__(self, pool: str = ANALYTICS_POOL):
+        self._analytics = MarketingAnalytics(pool)
+
+    def __getattr__(self, name: str):
+        method = getattr(self._analytics, name)
+        if name.startswith('_') or not callable(method):
+            return method
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        call.__name__ = name
+        call.__doc__ = method.__doc__
+        return call
@@ -0,0 +1,205 @@
+"""
+Channel Sender - Delivers outbound messages to WhatsApp, Messenger, Instagram and Telegram
+
+Outbound messages go out after Meta's 24-hour customer service window has
+closed (a follow-up is due 24h+ after the lead's last message). Outside the
+window WhatsApp only accepts approved template messages and Messenger /
+Instagram only accept tagged messages, so users who cannot be reached that
+way are skipped rather than sent a message the platform would reject.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Channel Configuration
+GRAPH_API_URL = os.getenv('GRAPH_API_URL', 'https://graph.facebook.com/v18.0')
+FB_PAGE_ACCESS_TOKEN = os.getenv('FB_PAGE_ACCESS_TOKEN')
+FB_PAGE_ID = os.getenv('FB_PAGE_ID')
+WA_ACCESS_TOKEN = os.getenv('WA_ACCESS_TOKEN')
+WA_PHONE_NUMBER_ID = os.getenv('WA_PHONE_NUMBER_ID')
+TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+WA_TEMPLATE_LANGUAGE = os.getenv('WA_TEMPLATE_LANGUAGE', 'az')
+# Message tag for Messenger/Instagram messages outside the 24h window. Tags
+# are restricted to their documented use (e.g. ACCOUNT_UPDATE,
+# CONFIRMED_EVENT_UPDATE); empty skips those users instead.
+FB_MESSAGE_TAG = os.getenv('FB_FOLLOWUP_MESSAGE_TAG', '')
+
+SEND_WORKERS = int(os.getenv('FOLLOWUP_SEND_WORKERS', '16'))
+SEND_TIMEOUT = float(os.getenv('FOLLOWUP_SEND_TIMEOUT', '10'))
+
+# Messages per second per channel (platform limits are per sending account)
+CHANNEL_RATES = {
+    'whatsapp': float(os.getenv('FOLLOWUP_RATE_WHATSAPP', '50')),
+    'facebook': float(os.getenv('FOLLOWUP_RATE_FACEBOOK', '50')),
+    'instagram': float(os.getenv('FOLLOWUP_RATE_INSTAGRAM', '20')),
+    'telegram': float(os.getenv('FOLLOWUP_RATE_TELEGRAM', '25')),
+}
+
+# Status codes worth retrying on a later run (nothing is recorded for them)
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def channel_for_user(user_id: str) -> Optional[Tuple[str, str]]:
+    """
+    Work out the delivery channel from a lead's user_id
+
+    Webhook users are stored as "<platform>_<id>", Telegram users as the
+    bare numeric chat id. Website chat users cannot be messaged.
+
+    Returns:
+        (channel, recipient id) or None if the user is not reachable
+    """
+    platform, sep, recipient = user_id.partition('_')
+    if sep and platform in ('whatsapp', 'facebook', 'instagram') and recipient:
+        return platform, recipient
+    if user_id.isdigit():
+        return 'telegram', user_id
+    return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ChannelSender:
+    """Sends messages concurrently, rate limited per channel"""
+
+    def __init__(self, workers: int = SEND_WORKERS, rates: Dict[str, float] = None):
+        self.workers = workers
+        self.buckets = {channel: TokenBucket(rate) for channel, rate in (rates or CHANNEL_RATES).items()}
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _request(self, channel: str, recipient: str, text: str,
+                 template: Optional[str]) -> requests.Response:
+        if channel == 'whatsapp':
+            return self.session.post(
+                f"{GRAPH_API_URL}/{WA_PHONE_NUMBER_ID}/messages",
+                headers={"Authorization": f"Bearer {WA_ACCESS_TOKEN}"},
+                json={
+                    "messaging_product": "whatsapp",
+                    "recipient_type": "individual",
+                    "to": recipient,
+                    "type": "template",
+                    "template": {"name": template, "language": {"code": WA_TEMPLATE_LANGUAGE}}
+                },
+                timeout=SEND_TIMEOUT
+            )
+        if channel in ('facebook', 'instagram'):
+            node = FB_PAGE_ID if channel == 'facebook' else 'me'
+            return self.session.post(
+                f"{GRAPH_API_URL}/{node}/messages",
+                params={"access_token": FB_PAGE_ACCESS_TOKEN},
+                json={
+                    "messaging_type": "MESSAGE_TAG",
+                    "tag": FB_MESSAGE_TAG,
+                    "recipient": {"id": recipient},
+                    "message": {"text": text}
+                },
+                timeout=SEND_TIMEOUT
+            )
+        return self.session.post(
+            f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
+            json={"chat_id": recipient, "text": text},
+            timeout=SEND_TIMEOUT
+        )
+
+    @staticmethod
+    def _skip_reason(channel: str, template: Optional[str]) -> Optional[str]:
+        """Why a message cannot be sent outside the 24h window (None if it can)"""
+        if channel == 'whatsapp' and not template:
+            return 'outside 24h window: no approved WhatsApp template'
+        if channel in ('facebook', 'instagram') and not FB_MESSAGE_TAG:
+            return 'outside 24h window: no message tag configured'
+        return None
+
+    def send(self, user_id: str, text: str, template: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Send one message
+
+        Args:
+            user_id: Lead user_id (the channel is derived from it)
+            text: Message text (Telegram, Messenger, Instagram)
+            template: Approved WhatsApp template sent instead of the text
+
+        Returns:
+            Dict with user_id, channel, delivered, skipped, transient and error
+        """
+        result = {'user_id': user_id, 'channel': None, 'delivered': False, 'skipped': False,
+                  'transient': False, 'error': None}
+
+        target = channel_for_user(user_id)
+        if target is None:
+            result['error'] = 'unreachable channel'
+            return result
+        channel, recipient = target
+        result['channel'] = channel
+
+        skip_reason = self._skip_reason(channel, template)
+        if skip_reason:
+            result['skipped'] = True
+            result['error'] = skip_reason
+            return result
+
+        bucket = self.buckets.get(channel)
+        if bucket:
+            bucket.acquire()
+
+        try:
+            response = self._request(channel, recipient, text, template)
+        except requests.RequestException as e:
+            result['transient'] = True
+            result['error'] = f"{type(e).__name__}: {e}"
+            return result
+
+        if response.ok:
+            result['delivered'] = True
+        else:
+            result['transient'] = response.status_code in TRANSIENT_STATUSES
+            result['error'] = f"HTTP {response.status_code}: {response.text[:200]}"
+        return result
+
+    def send_batch(self, messages: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Send many messages concurrently
+
+        Args:
+            messages: List of (user_id, text) or (user_id, text, whatsapp_template)
+
+        Returns:
+            One result dict per message, in the same order
+        """
+        if not messages:
+            return []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='channel-send') as pool:
+            return list(pool.map(lambda item: self.send(*item), messages))
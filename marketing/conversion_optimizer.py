@@ -5,6 +5,18 @@ Conversion Optimizer - Detects buying signals and optimizes for conversion
 from typing import Dict, List, Any
 import re
 
+from intelligence.knowledge_store import knowledge_store
+from intelligence.normalization import KeywordSet
+
+# Objection keywords (canonical forms, see intelligence.normalization)
+OBJECTION_KEYWORDS = {
+    'price_concern': KeywordSet(['baha', 'qiymət çox', 'ucuz']),
+    'time_concern': KeywordSet(['vaxt yoxdur', 'məşğul', 'sonra']),
+    'fear_concern': KeywordSet(['qorxuram', 'təhlükə', 'risk', 'ağrı']),
+    'doubt': KeywordSet(['əmin deyil', 'bilmirəm', 'düşünürəm']),
+    'delay': KeywordSet(['sonra', 'gələn həftə', 'bir az'])
+}
+
 
 class ConversionOptimizer:
     """Detects buying signals and determines conversion tactics"""
@@ -12,7 +24,7 @@ class ConversionOptimizer:
     # Buying signal patterns
     BUYING_SIGNALS = {
         'price_inquiry': {
-            'keywords': ['qiymət', 'qiyməti', 'pul', 'nə qədər', 'ödəniş', 'məbləğ', 'dəyər'],
+            'keywords': ['qiymət', 'pul', 'nə qədər', 'ödəniş', 'məbləğ', 'dəyər'],
             'weight': 30,
             'urgency': 'high'
         },
@@ -28,7 +40,7 @@ class ConversionOptimizer:
             'urgency': 'medium'
         },
         'booking_intent': {
-            'keywords': ['müayinə', 'müayinəyə', 'yazıl', 'qeydiyyat', 'booking', 
+            'keywords': ['müayinə', 'yazıl', 'qeydiyyat', 'booking',
                         'appointment', 'təyin et', 'görüş'],
             'weight': 40,
             'urgency': 'very_high'
@@ -58,15 +70,14 @@ class ConversionOptimizer:
         'mild': ['yorğunluq', 'quruyur', 'sulanır', 'qaşınır']
     }
     
-    # Doctor names for detection
-    DOCTOR_NAMES = ['iltifat', 'emil', 'səbinə', 'sabina', 'seymur', 'həkim', 'doktor']
+    # Generic doctor words; doctor and surgery names (with aliases) come from
+    # doctors.csv / surgeries.csv through the knowledge store
+    DOCTOR_WORDS = ['həkim', 'doktor']
     
-    # Surgery names for detection (from knowledge base)
-    SURGERY_NAMES = [
-        'excimer', 'laser', 'katarakta', 'mirvari', 'pteregium', 'phacic',
-        'çəplik', 'cesplik', 'cross linking', 'arqon', 'yag', 'avastin', 
-        'qlaukoma', 'qara su'
-    ]
+    # Compiled once; matching normalizes casing, diacritics and suffixes
+    _SIGNAL_KEYWORDS = {name: KeywordSet(data['keywords']) for name, data in BUYING_SIGNALS.items()}
+    _SYMPTOM_KEYWORDS = {urgency: KeywordSet(keywords) for urgency, keywords in SYMPTOM_KEYWORDS.items()}
+    _DOCTOR_KEYWORDS = KeywordSet(DOCTOR_WORDS)
     
     def __init__(self):
         pass
@@ -82,8 +93,6 @@ class ConversionOptimizer:
         Returns:
             Dict with detected signals, items, and recommended actions
         """
-        message_lower = message.lower()
-        
         result = {
             'buying_signals': [],
             'signal_score': 0,
@@ -104,7 +113,7 @@ class ConversionOptimizer:
         
         # Detect buying signals
         for signal_name, signal_data in self.BUYING_SIGNALS.items():
-            if any(keyword in message_lower for keyword in signal_data['keywords']):
+            if self._SIGNAL_KEYWORDS[signal_name].search(message):
                 result['buying_signals'].append(signal_name)
                 result['signal_score'] += signal_data['weight']
                 
@@ -123,30 +132,28 @@ class ConversionOptimizer:
         if 'price_inquiry' in result['buying_signals']:
             detected_items['price_inquiry'] = True
         
+        knowledge = knowledge_store.snapshot
+        
         # Doctor inquiry
-        for doctor in self.DOCTOR_NAMES:
-            if doctor in message_lower:
-                detected_items['doctor_inquiry'] = True
-                detected_items['doctors'].append(doctor)
+        for doctor in knowledge.find_doctors(message) + self._DOCTOR_KEYWORDS.find(message):
+            detected_items['doctor_inquiry'] = True
+            detected_items['doctors'].append(doctor)
         
         # Surgery inquiry
-        for surgery in self.SURGERY_NAMES:
-            if surgery in message_lower:
-                detected_items['surgery_inquiry'] = True
-                if surgery not in detected_items['surgeries']:
-                    detected_items['surgeries'].append(surgery)
+        for surgery in knowledge.find_surgeries(message):
+            detected_items['surgery_inquiry'] = True
+            detected_items['surgeries'].append(surgery)
         
         # Booking intent
         if 'booking_intent' in result['buying_signals'] or 'availability_inquiry' in result['buying_signals']:
             detected_items['booking_intent'] = True
         
         # Symptoms detection
-        for urgency, keywords in self.SYMPTOM_KEYWORDS.items():
-            for keyword in keywords:
-                if keyword in message_lower:
-                    detected_items['symptoms'].append(keyword)
-                    if urgency == 'urgent':
-                        detected_items['urgent_symptoms'] = True
+        for urgency, keywords in self._SYMPTOM_KEYWORDS.items():
+            for keyword in keywords.find(message):
+                detected_items['symptoms'].append(keyword)
+                if urgency == 'urgent':
+                    detected_items['urgent_symptoms'] = True
         
         # Determine if conversion ready (score >= 60 or explicit booking intent)
         result['conversion_ready'] = (
@@ -202,17 +209,19 @@ class ConversionOptimizer:
     
     def _get_hard_cta(self, analysis: Dict[str, Any]) -> str:
         """Hard push for immediate booking"""
+        knowledge = knowledge_store.snapshot
+        doctors = "\n".join(f"🔹 {d['name']} ({d['phone']})" for d in knowledge.doctors)
         ctas = [
-            "\n\n📞 **MÜAYİNƏYƏ YAZILAQ?**\n\nHansı həkim ilə görüş təyin edək?\n🔹 Dr. İltifat Şərif (010 710 74 65)\n🔹 Dr. Səbinə Əbiyeva (055 319 75 76)",
+            f"\n\n📞 **MÜAYİNƏYƏ YAZILAQ?**\n\nHansı həkim ilə görüş təyin edək?\n{doctors}",
             
-            "\n\n📅 **HAZİR TƏYİN EDƏK?**\n\nSizə nömrə verək, birbaşa zəng edib vaxt tutasınız?\n📞 +994 12 541 19 00\n📱 WhatsApp: https://wa.me/994555512400",
+            f"\n\n📅 **HAZİR TƏYİN EDƏK?**\n\nSizə nömrə verək, birbaşa zəng edib vaxt tutasınız?\n📞 {knowledge.phone}\n📱 WhatsApp: {knowledge.clinic.get('whatsapp', '')}",
             
             "\n\n⏰ **VAXİT İTİRMƏYƏK!**\n\nMüayinə üçün indiki ən yaxın vaxtı sizə ayıraq?\nHansı həkimi seçirsiniz?"
         ]
         
         # Return appropriate CTA based on what was detected
         if 'price_inquiry' in analysis['buying_signals']:
-            return "\n\nDəqiq qiymət müayinədən sonra deyilir. Hər vəziyyət fərqlidir.\n\n📞 **Müayinəyə yazılaq?** Birbaşa zəng edin: +994 12 541 19 00"
+            return f"\n\nDəqiq qiymət müayinədən sonra deyilir. Hər vəziyyət fərqlidir.\n\n📞 **Müayinəyə yazılaq?** Birbaşa zəng edin: {knowledge.phone}"
         elif 'availability_inquiry' in analysis['buying_signals']:
             return ctas[0]
         else:
@@ -224,14 +233,14 @@ class ConversionOptimizer:
     
     def _get_differentiator_cta(self) -> str:
         """Emphasize clinic strengths"""
-        return "\n\n✅ **BRİZ-L ÜSTÜNLÜKLƏRI:**\n• 15+ il təcrübə\n• Müasir avadanlıq\n• Peşəkar komanda\n\n📞 Müayinə üçün bizimlə əlaqə saxlayın: +994 12 541 19 00"
+        return f"\n\n✅ **BRİZ-L ÜSTÜNLÜKLƏRI:**\n• 15+ il təcrübə\n• Müasir avadanlıq\n• Peşəkar komanda\n\n📞 Müayinə üçün bizimlə əlaqə saxlayın: {knowledge_store.snapshot.phone}"
     
     def _get_triage_cta(self, analysis: Dict[str, Any]) -> str:
         """CTA for medical triage"""
         if analysis['detected_items']['urgent_symptoms']:
-            return "\n\n⚠️ **DİQQƏT!**\n\nBu problem ciddi ola bilər. Mümkün qədər tez müayinə vacibdir!\n\n📞 DƏRHAL ZƏNG EDİN: +994 12 541 19 00"
+            return f"\n\n⚠️ **DİQQƏT!**\n\nBu problem ciddi ola bilər. Mümkün qədər tez müayinə vacibdir!\n\n📞 DƏRHAL ZƏNG EDİN: {knowledge_store.snapshot.phone}"
         else:
-            return "\n\n🩺 **MÜAYİNƏ TÖVSİYƏ EDİRİK**\n\nDəqiq diaqnoz üçün həkim müayinəsi lazımdır.\n\n📞 Vaxt təyin edək: +994 12 541 19 00"
+            return f"\n\n🩺 **MÜAYİNƏ TÖVSİYƏ EDİRİK**\n\nDəqiq diaqnoz üçün həkim müayinəsi lazımdır.\n\n📞 Vaxt təyin edək: {knowledge_store.snapshot.phone}"
     
     def _get_educational_cta(self) -> str:
         """Gentle CTA for information seekers"""
@@ -265,15 +274,7 @@ class ConversionOptimizer:
     
     def detect_objections(self, message: str) -> Dict[str, Any]:
         """Detect customer objections"""
-        message_lower = message.lower()
-        
-        objections = {
-            'price_concern': any(word in message_lower for word in ['bahá', 'qiymət çox', 'ucuz']),
-            'time_concern': any(word in message_lower for word in ['vaxt yoxdur', 'məşğul', 'sonra']),
-            'fear_concern': any(word in message_lower for word in ['qorxuram', 'təhlükə', 'risk', 'ağrı']),
-            'doubt': any(word in message_lower for word in ['əmin deyil', 'bilmirəm', 'düşünürəm']),
-            'delay': any(word in message_lower for word in ['sonra', 'gələn həftə', 'bir az'])
-        }
+        objections = {name: keywords.search(message) for name, keywords in OBJECTION_KEYWORDS.items()}
         
         return {
             'has_objection': any(objections.values()),
@@ -2,15 +2,23 @@
 PostgreSQL Database Connection Manager for Marketing System
 """
 
+import copy
+import logging
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor, Json
+import re
+import threading
+from psycopg2.extras import RealDictCursor, Json, execute_values
+from psycopg2.extensions import connection as PGConnection
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 from contextlib import contextmanager
-from typing import Optional, Dict, Any
+from datetime import date
+from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Database Configuration
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'postgres'),
@@ -20,40 +28,226 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'herahera')
 }
 
+# Connection pools
+PRIMARY_POOL = 'primary'
+ANALYTICS_POOL = 'analytics'
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))  # seconds to wait for a free connection
+ANALYTICS_STATEMENT_TIMEOUT_MS = int(os.getenv('ANALYTICS_STATEMENT_TIMEOUT_MS', '15000'))
+# Server-side prepared statements for hot queries (disable behind a
+# transaction-pooling PgBouncer, which does not keep them per client)
+DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'true').lower() == 'true'
+
+# Analytics queries go to ANALYTICS_DB_HOST (e.g. a read replica) when set,
+# otherwise to the primary, always read-only and with a statement timeout
+ANALYTICS_DB_CONFIG = {
+    'host': os.getenv('ANALYTICS_DB_HOST', DB_CONFIG['host']),
+    'port': os.getenv('ANALYTICS_DB_PORT', DB_CONFIG['port']),
+    'database': os.getenv('ANALYTICS_DB_NAME', DB_CONFIG['database']),
+    'user': os.getenv('ANALYTICS_DB_USER', DB_CONFIG['user']),
+    'password': os.getenv('ANALYTICS_DB_PASSWORD', DB_CONFIG['password']),
+    'options': f'-c statement_timeout={ANALYTICS_STATEMENT_TIMEOUT_MS} -c default_transaction_read_only=on',
+    'application_name': 'briz-analytics',
+    'maxconn': int(os.getenv('ANALYTICS_DB_POOL_MAX', '4')),
+}
+
+POOL_CONFIGS = {
+    PRIMARY_POOL: {**DB_CONFIG, 'application_name': 'briz-primary'},
+    ANALYTICS_POOL: ANALYTICS_DB_CONFIG,
+}
+
+# Conversion event partitioning (monthly ranges on created_at)
+EVENT_PARTITIONS_AHEAD = int(os.getenv('EVENT_PARTITIONS_AHEAD', '3'))  # months created in advance
+EVENT_RETENTION_MONTHS = int(os.getenv('EVENT_RETENTION_MONTHS', '24'))  # older partitions are dropped
+
+# xid8, pg_current_xact_id() and pg_snapshot_xmin() (analytics rollup watermark)
+MIN_SERVER_VERSION_NUM = 130000
+
+# Values of the conversion_event_type enum (new ones are appended on startup)
+CONVERSION_EVENT_TYPES = [
+    'price_inquiry', 'doctor_inquiry', 'booking_intent', 'urgent_symptoms',
+    'new_lead', 'became_hot', 'converted', 'follow_up_sent', 'follow_up_response',
+]
+
+# Doctor / surgery interests recorded as matched keywords before the names came
+# from doctors.csv / surgeries.csv, with the official names they were renamed to
+# ('laser' is ambiguous and stays as it is). Applied once, see schema_migrations.
+INTEREST_NAMES_MIGRATION = 'interest_names_v1'
+LEGACY_INTEREST_NAMES = {
+    'doctor': {
+        'iltifat': 'Dr. İltifat Şərif',
+        'emil': 'Dr. Emil Qafarlı',
+        'səbinə': 'Dr. Səbinə Əbiyeva',
+        'sabina': 'Dr. Səbinə Əbiyeva',
+        'seymur': 'Dr. Seymur Bayramov',
+    },
+    'surgery': {
+        'excimer': 'Excimer laser',
+        'katarakta': 'Katarakta',
+        'mirvari': 'Katarakta',
+        'pteregium': 'Pteregium',
+        'phacic': 'Phacic',
+        'çəplik': 'Çəplik',
+        'cesplik': 'Çəplik',
+        'cross linking': 'Cross linking',
+        'arqon': 'Arqon laser',
+        'yag': 'YAG laser',
+        'avastin': 'Avastin',
+        'qlaukoma': 'Qlaukoma',
+        'qara su': 'Qlaukoma',
+    },
+}
+
+# Lead scoring (seeded into lead_score_weights / lead_status_thresholds;
+# edit the tables to retune without a deploy)
+DEFAULT_SCORE_WEIGHTS = {
+    'price_inquiry': 30,
+    'doctor_inquiry': 20,
+    'surgery_inquiry': 15,
+    'symptom_mentioned': 25,
+    'booking_intent': 40,
+    'multiple_messages': 10,
+    'return_visit': 15,
+    'urgent_symptoms': 35,
+    'multiple_surgeries': 10,
+}
+DEFAULT_STATUS_THRESHOLDS = {
+    'hot': 80,
+    'warm': 50,
+    'cold': 20,
+    'new': 0,
+}
+
+
+_PLACEHOLDER = re.compile(r'%\((\w+)\)s|%s|%%')
+
+
+def _to_server_params(query: str):
+    """
+    Rewrite psycopg2 placeholders (%s / %(name)s) as PREPARE parameters ($n)
+    
+    Returns:
+        (rewritten query, parameter names or None for positional, parameter count)
+    """
+    names: List[str] = []
+    positional = 0
+    
+    def replace(match):
+        nonlocal positional
+        if match.group(0) == '%%':
+            return '%'
+        if match.group(1):
+            if match.group(1) not in names:
+                names.append(match.group(1))
+            return f'${names.index(match.group(1)) + 1}'
+        positional += 1
+        return f'${positional}'
+    
+    rewritten = _PLACEHOLDER.sub(replace, query).strip().rstrip(';')
+    if names and positional:
+        raise ValueError("Cannot mix %s and %(name)s placeholders")
+    return rewritten, (names or None), len(names) or positional
+
+
+class PreparingConnection(PGConnection):
+    """Connection remembering which statements were PREPAREd in its session"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+def _add_months(day: date, months: int) -> date:
+    """First day of the month `months` after the month of `day`"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
 
 class DatabaseManager:
-    """Manages PostgreSQL database connections and operations"""
+    """
+    Manages PostgreSQL connection pools and operations
     
-    def __init__(self, config: Dict[str, Any] = None):
-        self.config = config or DB_CONFIG
-        self._connection = None
+    Connections come from named pools: 'primary' for the reply path and
+    writes, 'analytics' for dashboard/report queries (a replica or the
+    primary with a statement timeout). Use db.using('analytics') for a
+    manager whose queries default to that pool.
+    """
     
-    def get_connection(self):
-        """Get or create database connection"""
-        if self._connection is None or self._connection.closed:
-            try:
-                self._connection = psycopg2.connect(**self.config)
-                print("✅ Database connected successfully")
-            except Exception as e:
-                print(f"❌ Database connection error: {e}")
-                raise
-        return self._connection
+    def __init__(self, config: Dict[str, Any] = None, pool_configs: Dict[str, Dict[str, Any]] = None,
+                 default_pool: str = PRIMARY_POOL):
+        if pool_configs is None:
+            pool_configs = {PRIMARY_POOL: config} if config else POOL_CONFIGS
+        self.pool_configs = pool_configs
+        self.config = pool_configs[PRIMARY_POOL]
+        self.default_pool = default_pool
+        self._pools: Dict[str, ThreadedConnectionPool] = {}
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._in_use: Dict[str, int] = {}
+        self._statements: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+    
+    def using(self, pool: str) -> 'DatabaseManager':
+        """Manager sharing these pools whose queries default to another pool"""
+        routed = copy.copy(self)
+        routed.default_pool = pool
+        return routed
+    
+    def _get_pool(self, name: str):
+        if name not in self.pool_configs:
+            name = PRIMARY_POOL  # e.g. benchmarks configure a single pool
+        with self._lock:
+            if name not in self._pools:
+                config = dict(self.pool_configs[name])
+                maxconn = config.pop('maxconn', DB_POOL_MAX)
+                try:
+                    self._pools[name] = ThreadedConnectionPool(
+                        1, maxconn, connection_factory=PreparingConnection, **config
+                    )
+                    logger.info("✅ Database pool '%s' connected successfully", name)
+                except Exception as e:
+                    logger.error("❌ Database connection error (%s pool): %s", name, e)
+                    raise
+                self._slots[name] = threading.BoundedSemaphore(maxconn)
+                self._in_use[name] = 0
+        return name, self._pools[name]
     
     @contextmanager
-    def get_cursor(self, dict_cursor=True):
-        """Context manager for database cursor"""
-        conn = self.get_connection()
-        cursor_factory = RealDictCursor if dict_cursor else None
-        cursor = conn.cursor(cursor_factory=cursor_factory)
+    def get_cursor(self, dict_cursor=True, pool: Optional[str] = None):
+        """Context manager for a cursor on a pooled connection (commits on success)"""
+        name, conn_pool = self._get_pool(pool or self.default_pool)
+        slots = self._slots[name]
+        if not slots.acquire(timeout=DB_POOL_TIMEOUT):
+            raise PoolError(f"Timed out waiting for a '{name}' database connection")
+        
+        conn = None
+        broken = False
         try:
-            yield cursor
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            print(f"❌ Database error: {e}")
-            raise
+            conn = conn_pool.getconn()
+            if conn.closed:
+                conn_pool.putconn(conn, close=True)
+                conn = conn_pool.getconn()
+            cursor_factory = RealDictCursor if dict_cursor else None
+            cursor = conn.cursor(cursor_factory=cursor_factory)
+            with self._lock:
+                self._in_use[name] += 1
+            try:
+                yield cursor
+                conn.commit()
+            except Exception as e:
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+                logger.error("❌ Database error: %s", e)
+                raise
+            finally:
+                with self._lock:
+                    self._in_use[name] -= 1
+                cursor.close()
         finally:
-            cursor.close()
+            if conn is not None:
+                conn_pool.putconn(conn, close=broken or bool(conn.closed))
+            slots.release()
     
     def execute_query(self, query: str, params: tuple = None, fetch: bool = True):
         """Execute a SQL query"""
@@ -68,11 +262,79 @@ class DatabaseManager:
         with self.get_cursor() as cursor:
             cursor.executemany(query, params_list)
     
+    def execute_values(self, query: str, rows: list, template: str = None,
+                       page_size: int = 1000, fetch: bool = False):
+        """Execute a multi-row statement (e.g. INSERT ... VALUES %s) in one round trip per page"""
+        with self.get_cursor() as cursor:
+            return execute_values(cursor, query, rows, template=template,
+                                  page_size=page_size, fetch=fetch)
+    
+    def prepare(self, name: str, query: str):
+        """
+        Register a hot query as a named server-side prepared statement
+        
+        Nothing is sent to the server here; each pooled connection PREPAREs
+        the statement on its first execute_prepared() call, after which only
+        the name and parameters travel and the parse/plan is reused.
+        
+        Args:
+            name: Statement name (an SQL identifier, unique per process)
+            query: SQL with %s or %(name)s placeholders, as for execute_query
+        """
+        if name not in self._statements:
+            self._statements[name] = (query,) + _to_server_params(query)
+    
+    def execute_prepared(self, name: str, params=None, fetch: bool = True):
+        """
+        Execute a statement registered with prepare()
+        
+        Args:
+            name: Statement name
+            params: Tuple (for %s) or dict (for %(name)s) of parameters
+            fetch: Return the result rows
+        """
+        query, server_query, names, count = self._statements[name]
+        if not DB_PREPARED_STATEMENTS:
+            return self.execute_query(query, params, fetch=fetch)
+        
+        values = [params[key] for key in names] if names else list(params or ())
+        with self.get_cursor() as cursor:
+            conn = cursor.connection
+            if name not in conn.prepared:
+                cursor.execute(f"PREPARE {name} AS {server_query}")
+                conn.prepared.add(name)
+            if count:
+                cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * count)})", values)
+            else:
+                cursor.execute(f"EXECUTE {name}")
+            if fetch:
+                return cursor.fetchall()
+            return None
+    
+    def ping(self) -> bool:
+        """Run a trivial query to confirm the database is reachable"""
+        with self.get_cursor(dict_cursor=False) as cursor:
+            cursor.execute("SELECT 1")
+            return cursor.fetchone()[0] == 1
+    
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Connection usage per pool for the /metrics endpoint"""
+        with self._lock:
+            return {
+                name: {
+                    'open': len(conn_pool._pool) + len(conn_pool._used),
+                    'in_use': self._in_use[name],
+                }
+                for name, conn_pool in self._pools.items()
+            }
+    
     def close(self):
-        """Close database connection"""
-        if self._connection and not self._connection.closed:
-            self._connection.close()
-            print("✅ Database connection closed")
+        """Close all pooled connections"""
+        with self._lock:
+            for name, conn_pool in self._pools.items():
+                conn_pool.closeall()
+                logger.info("✅ Database pool '%s' closed", name)
+            self._pools.clear()
     
     def init_tables(self):
         """Initialize marketing database tables"""
@@ -106,15 +368,59 @@ class DatabaseManager:
             );
             """,
             
-            # Conversion events table
+            # Delivery outcome of each follow-up
+            """
+            ALTER TABLE follow_ups ADD COLUMN IF NOT EXISTS delivered BOOLEAN DEFAULT TRUE;
+            ALTER TABLE follow_ups ADD COLUMN IF NOT EXISTS channel TEXT;
+            ALTER TABLE follow_ups ADD COLUMN IF NOT EXISTS error TEXT;
+            ALTER TABLE follow_ups ADD COLUMN IF NOT EXISTS skipped BOOLEAN DEFAULT FALSE;
+            """,
+            
+            # Conversion events: compact enum event type
+            """
+            DO $$ BEGIN
+                CREATE TYPE conversion_event_type AS ENUM ();
+            EXCEPTION WHEN duplicate_object THEN NULL;
+            END $$;
+            """,
+            *[
+                f"ALTER TYPE conversion_event_type ADD VALUE IF NOT EXISTS '{event_type}';"
+                for event_type in CONVERSION_EVENT_TYPES
+            ],
+            
+            # Move an unpartitioned conversion_events table out of the way;
+            # its rows are copied back by _migrate_legacy_events()
+            """
+            DO $$ BEGIN
+                IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('conversion_events')) = 'r' THEN
+                    ALTER TABLE conversion_events RENAME TO conversion_events_legacy;
+                    ALTER TABLE conversion_events_legacy RENAME CONSTRAINT conversion_events_pkey
+                        TO conversion_events_legacy_pkey;
+                    ALTER TABLE conversion_events_legacy ALTER COLUMN id DROP DEFAULT;
+                    ALTER SEQUENCE conversion_events_id_seq OWNED BY NONE;
+                    DROP INDEX IF EXISTS idx_events_user, idx_events_type;
+                END IF;
+            END $$;
+            """,
+            
+            # Conversion events table, range partitioned by month on created_at.
+            # xact_id (writer transaction) is the analytics rollup watermark; it
+            # is added without a default first so existing rows are not rewritten
             """
+            CREATE SEQUENCE IF NOT EXISTS conversion_events_id_seq AS BIGINT;
+            ALTER SEQUENCE conversion_events_id_seq AS BIGINT;
             CREATE TABLE IF NOT EXISTS conversion_events (
-                id SERIAL PRIMARY KEY,
+                id BIGINT NOT NULL DEFAULT nextval('conversion_events_id_seq'),
                 user_id TEXT REFERENCES marketing_leads(user_id),
-                event_type TEXT,
+                event_type conversion_event_type NOT NULL,
                 event_data JSONB,
-                created_at TIMESTAMP DEFAULT NOW()
-            );
+                created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at);
+            ALTER SEQUENCE conversion_events_id_seq OWNED BY conversion_events.id;
+            ALTER TABLE conversion_events ADD COLUMN IF NOT EXISTS xact_id xid8;
+            ALTER TABLE conversion_events ALTER COLUMN xact_id SET DEFAULT pg_current_xact_id();
+            CREATE TABLE IF NOT EXISTS conversion_events_default PARTITION OF conversion_events DEFAULT;
             """,
             
             # Analytics table
@@ -129,6 +435,36 @@ class DatabaseManager:
             );
             """,
             
+            # Hourly analytics, folded from conversion_events (see rollup.py)
+            """
+            CREATE TABLE IF NOT EXISTS marketing_analytics_hourly (
+                hour TIMESTAMP PRIMARY KEY,
+                total_leads INTEGER DEFAULT 0,
+                hot_leads INTEGER DEFAULT 0,
+                booking_intents INTEGER DEFAULT 0,
+                follow_ups_sent INTEGER DEFAULT 0,
+                follow_up_responses INTEGER DEFAULT 0
+            );
+            """,
+            
+            # Last conversion event id folded by each rollup
+            """
+            CREATE TABLE IF NOT EXISTS rollup_state (
+                name TEXT PRIMARY KEY,
+                last_event_id BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMPTZ DEFAULT NOW()
+            );
+            ALTER TABLE rollup_state ADD COLUMN IF NOT EXISTS next_xact_id xid8;
+            """,
+            
+            # One-off data migrations already applied
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name TEXT PRIMARY KEY,
+                applied_at TIMESTAMPTZ DEFAULT NOW()
+            );
+            """,
+            
             # Create indexes for performance
             """
             CREATE INDEX IF NOT EXISTS idx_leads_status ON marketing_leads(lead_status);
@@ -136,16 +472,313 @@ class DatabaseManager:
             CREATE INDEX IF NOT EXISTS idx_leads_last_interaction ON marketing_leads(last_interaction);
             CREATE INDEX IF NOT EXISTS idx_events_user ON conversion_events(user_id);
             CREATE INDEX IF NOT EXISTS idx_events_type ON conversion_events(event_type);
+            CREATE INDEX IF NOT EXISTS idx_events_created ON conversion_events(created_at DESC);
+            CREATE INDEX IF NOT EXISTS idx_events_xact ON conversion_events(xact_id);
+            """,
+            
+            # Normalized lead interests (one row per lead and symptom /
+            # surgery / doctor) and the number of leads per interest
+            """
+            CREATE TABLE IF NOT EXISTS lead_interests (
+                user_id TEXT REFERENCES marketing_leads(user_id),
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                first_seen TIMESTAMP DEFAULT NOW(),
+                last_seen TIMESTAMP DEFAULT NOW(),
+                hits INTEGER DEFAULT 1,
+                PRIMARY KEY (user_id, kind, value)
+            );
+            CREATE INDEX IF NOT EXISTS idx_lead_interests_kind_value ON lead_interests(kind, value);
+            
+            CREATE TABLE IF NOT EXISTS interest_counts (
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                leads INTEGER DEFAULT 0,
+                PRIMARY KEY (kind, value)
+            );
+            CREATE INDEX IF NOT EXISTS idx_interest_counts_top ON interest_counts(kind, leads DESC);
+            """,
+            
+            # One-time backfill of the interest tables from the lead arrays
+            """
+            INSERT INTO lead_interests (user_id, kind, value, first_seen, last_seen, hits)
+            SELECT l.user_id, i.kind, i.value, l.first_contact, l.last_interaction, 1
+            FROM marketing_leads l
+            CROSS JOIN LATERAL (
+                SELECT 'symptom' AS kind, unnest(l.symptoms) AS value
+                UNION SELECT 'surgery', unnest(l.surgeries_interested)
+                UNION SELECT 'doctor', unnest(l.doctors_inquired)
+            ) i
+            WHERE i.value IS NOT NULL
+                AND NOT EXISTS (SELECT 1 FROM lead_interests)
+            ON CONFLICT DO NOTHING;
+            
+            INSERT INTO interest_counts (kind, value, leads)
+            SELECT kind, value, COUNT(*) FROM lead_interests
+            WHERE NOT EXISTS (SELECT 1 FROM interest_counts)
+            GROUP BY kind, value;
+            """,
+            
+            # Lead scoring tables and functions (see LeadTracker)
+            """
+            CREATE TABLE IF NOT EXISTS lead_score_weights (
+                signal TEXT PRIMARY KEY,
+                weight INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS lead_status_thresholds (
+                status TEXT PRIMARY KEY,
+                min_score INTEGER NOT NULL
+            );
+            """,
+            (
+                "INSERT INTO lead_score_weights (signal, weight) VALUES "
+                + ", ".join(f"('{signal}', {weight})" for signal, weight in DEFAULT_SCORE_WEIGHTS.items())
+                + " ON CONFLICT (signal) DO NOTHING;"
+            ),
+            (
+                "INSERT INTO lead_status_thresholds (status, min_score) VALUES "
+                + ", ".join(f"('{status}', {score})" for status, score in DEFAULT_STATUS_THRESHOLDS.items())
+                + " ON CONFLICT (status) DO NOTHING;"
+            ),
+            """
+            CREATE OR REPLACE FUNCTION lead_score_increment(signals TEXT[]) RETURNS INTEGER
+            LANGUAGE SQL STABLE AS $$
+                SELECT COALESCE(SUM(w.weight), 0)::INTEGER
+                FROM unnest(signals) AS s(signal)
+                JOIN lead_score_weights w USING (signal);
+            $$;
+            
+            CREATE OR REPLACE FUNCTION lead_status_for_score(score INTEGER) RETURNS TEXT
+            LANGUAGE SQL STABLE AS $$
+                SELECT COALESCE(
+                    (SELECT status FROM lead_status_thresholds
+                     WHERE min_score <= score
+                     ORDER BY min_score DESC
+                     LIMIT 1),
+                    'new'
+                );
+            $$;
+            """,
+            
+            # Persistent job schedule (see job_scheduler.py)
+            """
+            CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                name TEXT PRIMARY KEY,
+                schedule TEXT NOT NULL,
+                next_run_at TIMESTAMPTZ NOT NULL,
+                misfire_grace_seconds INTEGER DEFAULT 3600,
+                enabled BOOLEAN DEFAULT TRUE,
+                running BOOLEAN DEFAULT FALSE,
+                last_run_at TIMESTAMPTZ,
+                last_status TEXT,
+                last_error TEXT,
+                last_duration_ms INTEGER,
+                updated_at TIMESTAMPTZ DEFAULT NOW()
+            );
+            ALTER TABLE scheduled_jobs ADD COLUMN IF NOT EXISTS last_started_at TIMESTAMPTZ;
+            ALTER TABLE scheduled_jobs ADD COLUMN IF NOT EXISTS timeout_seconds INTEGER;
+            """,
+            
+            # Follow-up selection: NOT EXISTS probe per (lead, tier) and the
+            # keyset-ordered scan over leads that can still get follow-ups
+            """
+            CREATE INDEX IF NOT EXISTS idx_follow_ups_user_type ON follow_ups(user_id, follow_up_type);
+            CREATE INDEX IF NOT EXISTS idx_leads_followup_due
+                ON marketing_leads(lead_score DESC, user_id DESC)
+                INCLUDE (last_interaction)
+                WHERE booking_intent_detected = FALSE
+                    AND lead_status IN ('warm', 'hot', 'cold');
             """
         ]
         
         try:
+            self._check_server_version()
             for query in queries:
                 self.execute_query(query, fetch=False)
-            print("✅ Marketing database tables initialized successfully")
+            self._migrate_legacy_events()
+            self._migrate_interest_names()
+            self.ensure_event_partitions()
+            logger.info("✅ Marketing database tables initialized successfully")
         except Exception as e:
-            print(f"❌ Error initializing tables: {e}")
+            logger.error("❌ Error initializing tables: %s", e)
             raise
+    
+    def _check_server_version(self):
+        """Fail early with a clear message on a PostgreSQL older than 13"""
+        result = self.execute_query("SELECT current_setting('server_version_num')::INT AS version_num;")
+        version_num = result[0]['version_num']
+        if version_num < MIN_SERVER_VERSION_NUM:
+            raise RuntimeError(
+                f"PostgreSQL 13 or newer is required (server_version_num {version_num}): "
+                "the analytics rollup uses xid8, pg_current_xact_id() and pg_snapshot_xmin()"
+            )
+    
+    def _migrate_legacy_events(self):
+        """Copy rows of a pre-partitioning conversion_events table into the partitioned one"""
+        result = self.execute_query("SELECT to_regclass('conversion_events_legacy') IS NOT NULL AS exists;")
+        if not result[0]['exists']:
+            return
+        
+        result = self.execute_query("SELECT MIN(created_at) AS first_event FROM conversion_events_legacy;")
+        first_event = result[0]['first_event']
+        if first_event is not None:
+            months_back = (date.today().year - first_event.year) * 12 + date.today().month - first_event.month
+            self.ensure_event_partitions(months_back=months_back)
+        
+        # Ids are kept (the sequence is shared) and xact_id is left empty, so
+        # the analytics rollup folds these rows by its old id watermark once
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO conversion_events (id, user_id, event_type, event_data, created_at, xact_id)
+                SELECT id, user_id, event_type::conversion_event_type, event_data, COALESCE(created_at, NOW()), NULL
+                FROM conversion_events_legacy
+                WHERE event_type = ANY(enum_range(NULL::conversion_event_type)::TEXT[]);
+            """)
+            migrated = cursor.rowcount
+            cursor.execute("DROP TABLE conversion_events_legacy;")
+        logger.info("✅ Migrated %s conversion events into the partitioned table", migrated)
+    
+    def _migrate_interest_names(self):
+        """
+        Rename doctor/surgery interests recorded as matched keywords ('emil',
+        'katarakta', 'qara su') to the official doctors.csv / surgeries.csv
+        names that are recorded now, merging lead_interests rows and
+        recounting interest_counts so one interest is not split across keys
+
+        Runs once: the schema_migrations row is inserted in the same
+        transaction, so a failed run is retried on the next start.
+        """
+        names = [(kind, old, new) for kind, renames in LEGACY_INTEREST_NAMES.items()
+                 for old, new in renames.items()]
+        kinds, olds, news = (list(column) for column in zip(*names))
+        
+        with self.get_cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO schema_migrations (name) VALUES (%s) ON CONFLICT (name) DO NOTHING;",
+                (INTEREST_NAMES_MIGRATION,)
+            )
+            if not cursor.rowcount:
+                return
+            
+            cursor.execute("""
+                CREATE TEMP TABLE interest_names (kind TEXT, old TEXT, new TEXT) ON COMMIT DROP;
+                INSERT INTO interest_names
+                SELECT * FROM unnest(%s::TEXT[], %s::TEXT[], %s::TEXT[]);
+            """, (kinds, olds, news))
+            
+            cursor.execute("""
+                UPDATE marketing_leads l
+                SET surgeries_interested = ARRAY(
+                    SELECT DISTINCT COALESCE(n.new, v) FROM unnest(l.surgeries_interested) v
+                    LEFT JOIN interest_names n ON n.kind = 'surgery' AND n.old = v)
+                WHERE l.surgeries_interested && ARRAY(SELECT old FROM interest_names WHERE kind = 'surgery');
+                
+                UPDATE marketing_leads l
+                SET doctors_inquired = ARRAY(
+                    SELECT DISTINCT COALESCE(n.new, v) FROM unnest(l.doctors_inquired) v
+                    LEFT JOIN interest_names n ON n.kind = 'doctor' AND n.old = v)
+                WHERE l.doctors_inquired && ARRAY(SELECT old FROM interest_names WHERE kind = 'doctor');
+            """)
+            
+            cursor.execute("""
+                WITH legacy AS (
+                    DELETE FROM lead_interests li USING interest_names n
+                    WHERE li.kind = n.kind AND li.value = n.old
+                    RETURNING li.user_id, li.kind, n.new AS value, li.first_seen, li.last_seen, li.hits
+                )
+                INSERT INTO lead_interests (user_id, kind, value, first_seen, last_seen, hits)
+                SELECT user_id, kind, value, MIN(first_seen), MAX(last_seen), SUM(hits)
+                FROM legacy
+                GROUP BY user_id, kind, value
+                ON CONFLICT (user_id, kind, value) DO UPDATE SET
+                    first_seen = LEAST(lead_interests.first_seen, EXCLUDED.first_seen),
+                    last_seen = GREATEST(lead_interests.last_seen, EXCLUDED.last_seen),
+                    hits = lead_interests.hits + EXCLUDED.hits;
+            """)
+            migrated = cursor.rowcount
+            if not migrated:
+                return
+            
+            cursor.execute("""
+                DELETE FROM interest_counts c USING interest_names n
+                WHERE c.kind = n.kind AND c.value IN (n.old, n.new);
+                
+                INSERT INTO interest_counts (kind, value, leads)
+                SELECT kind, value, COUNT(*) FROM lead_interests
+                WHERE (kind, value) IN (SELECT kind, new FROM interest_names)
+                GROUP BY kind, value;
+            """)
+        logger.info("✅ Renamed %s legacy doctor/surgery interests to official names", migrated)
+    
+    def ensure_event_partitions(self, months_ahead: int = EVENT_PARTITIONS_AHEAD,
+                                months_back: int = 1) -> List[str]:
+        """
+        Create missing monthly partitions of conversion_events
+        
+        Rows that already landed in the default partition for a new month
+        are moved into it before it is attached.
+        
+        Args:
+            months_ahead: Months after the current one to create
+            months_back: Months before the current one to create
+        
+        Returns:
+            Names of the partitions created
+        """
+        this_month = date.today().replace(day=1)
+        created = []
+        for offset in range(-months_back, months_ahead + 1):
+            start = _add_months(this_month, offset)
+            end = _add_months(start, 1)
+            name = f"conversion_events_p{start:%Y%m}"
+            
+            with self.get_cursor() as cursor:
+                cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS exists;", (name,))
+                if cursor.fetchone()['exists']:
+                    continue
+                cursor.execute(f"""
+                    CREATE TABLE {name} (LIKE conversion_events INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+                    WITH moved AS (
+                        DELETE FROM conversion_events_default
+                        WHERE created_at >= %(start)s AND created_at < %(end)s
+                        RETURNING *
+                    )
+                    INSERT INTO {name} SELECT * FROM moved;
+                    ALTER TABLE conversion_events ATTACH PARTITION {name}
+                        FOR VALUES FROM (%(start)s) TO (%(end)s);
+                """, {'start': start.isoformat(), 'end': end.isoformat()})
+            created.append(name)
+            logger.info("🗂️ Created partition %s", name)
+        return created
+    
+    def drop_expired_event_partitions(self, retention_months: int = EVENT_RETENTION_MONTHS) -> List[str]:
+        """
+        Drop monthly partitions of conversion_events older than the retention
+        
+        Args:
+            retention_months: Number of past months to keep (plus the current one)
+        
+        Returns:
+            Names of the partitions dropped
+        """
+        cutoff = _add_months(date.today(), -retention_months)
+        rows = self.execute_query("""
+            SELECT c.relname AS name FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'conversion_events'::regclass
+                AND c.relname ~ '^conversion_events_p[0-9]{6}$'
+                AND c.relname < %s
+            ORDER BY c.relname;
+        """, (f"conversion_events_p{cutoff:%Y%m}",))
+        
+        dropped = []
+        for row in rows or []:
+            with self.get_cursor() as cursor:
+                cursor.execute(f"ALTER TABLE conversion_events DETACH PARTITION {row['name']};")
+                cursor.execute(f"DROP TABLE {row['name']};")
+            dropped.append(row['name'])
+            logger.info("🗑️ Dropped expired partition %s", row['name'])
+        return dropped
 
 
 # Global database instance
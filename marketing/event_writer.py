@@ -0,0 +1,146 @@
+"""
+Event Writer - Batches conversion_events inserts off the reply path
+
+Events from many messages are queued and written by a background thread
+with one multi-row INSERT per batch, flushed when the batch is full or the
+flush interval has passed, and on shutdown. With EVENT_WRITER_MODE=
+write_through every event is committed before the caller continues (no
+events are lost if the process crashes, at the cost of a round trip).
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+from psycopg2.extras import Json
+
+from .database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Event Writer Configuration
+EVENT_WRITER_MODE = os.getenv('EVENT_WRITER_MODE', 'buffered').lower()  # 'buffered' or 'write_through'
+EVENT_BATCH_SIZE = int(os.getenv('EVENT_BATCH_SIZE', '500'))
+EVENT_FLUSH_INTERVAL = float(os.getenv('EVENT_FLUSH_INTERVAL', '2.0'))  # seconds
+EVENT_QUEUE_SIZE = int(os.getenv('EVENT_QUEUE_SIZE', '50000'))
+EVENT_WRITE_RETRIES = 3
+
+INSERT_EVENTS = "INSERT INTO conversion_events (user_id, event_type, event_data) VALUES %s;"
+
+_STOP = object()
+
+EventRow = Tuple[str, str, Dict[str, Any]]
+
+
+class EventWriter:
+    """Queues conversion events and writes them in batches from a background thread"""
+
+    def __init__(self, mode: str = EVENT_WRITER_MODE, batch_size: int = EVENT_BATCH_SIZE,
+                 flush_interval: float = EVENT_FLUSH_INTERVAL):
+        # Own connection: the batch commits never interleave with the
+        # request thread's transactions on the shared one
+        self.db = DatabaseManager()
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+    def write(self, user_id: str, event_type: str, event_data: Dict[str, Any] = None):
+        """Queue a single event"""
+        self.write_many([(user_id, event_type, event_data or {})])
+
+    def write_many(self, events: Iterable[EventRow]):
+        """
+        Queue events (or write them immediately in write_through mode)
+
+        Args:
+            events: (user_id, event_type, event_data) tuples
+        """
+        events = list(events)
+        if not events:
+            return
+        if self.mode == 'write_through':
+            self._write(events)
+            return
+
+        if self._thread is None:
+            self._start()
+        for i, event in enumerate(events):
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                # Writer is behind (database slow or down): write inline rather than lose events
+                logger.warning("⚠️ Event queue full, writing %d events inline", len(events) - i)
+                self._write(events[i:])
+                return
+
+    def queue_depth(self) -> int:
+        """Number of events waiting to be written"""
+        return self._queue.qsize()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='event-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.shutdown)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            stop = item is _STOP
+            batch = [] if stop else [item]
+            deadline = time.monotonic() + self.flush_interval
+            while not stop and len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[EventRow]):
+        rows = [(user_id, event_type, Json(event_data)) for user_id, event_type, event_data in batch]
+        for attempt in range(1, EVENT_WRITE_RETRIES + 1):
+            try:
+                self.db.execute_values(INSERT_EVENTS, rows, page_size=self.batch_size)
+                self.written += len(rows)
+                return
+            except Exception as e:
+                logger.warning("⚠️ Writing %d events failed (attempt %d/%d): %s",
+                               len(rows), attempt, EVENT_WRITE_RETRIES, e)
+                if attempt < EVENT_WRITE_RETRIES:
+                    time.sleep(0.5 * attempt)
+        self.dropped += len(rows)
+        logger.error("❌ Dropped %d conversion events", len(rows))
+
+    def shutdown(self, timeout: float = 10.0):
+        """Write out everything still queued and stop the writer thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        self.db.close()
+
+
+event_writer = EventWriter()
@@ -3,9 +3,94 @@ Follow-up Scheduler - Automates re-engagement with leads
 """
 
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+import logging
+import os
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+from intelligence.knowledge_store import knowledge_store
 from .database import db
+from .channel_sender import ChannelSender
+
+logger = logging.getLogger(__name__)
+
+# Leads fetched (and sent concurrently) per page
+FOLLOWUP_PAGE_SIZE = int(os.getenv('FOLLOWUP_PAGE_SIZE', '500'))
+
+# Approved WhatsApp templates per follow-up type (WhatsApp leads are skipped without one)
+WA_FOLLOWUP_TEMPLATES = {
+    '24h': os.getenv('WA_FOLLOWUP_TEMPLATE_24H', ''),
+    '48h': os.getenv('WA_FOLLOWUP_TEMPLATE_48H', ''),
+    '1week': os.getenv('WA_FOLLOWUP_TEMPLATE_1WEEK', ''),
+}
+
+# Highest follow-up tier reached by a lead's inactivity (NULL if none yet)
+FOLLOWUP_TIER_SQL = """
+    SELECT CASE
+        WHEN l.last_interaction < NOW() - INTERVAL '7 days' THEN '1week'
+        WHEN l.last_interaction < NOW() - INTERVAL '48 hours' THEN '48h'
+        WHEN l.last_interaction < NOW() - INTERVAL '24 hours' THEN '24h'
+    END AS follow_up_type
+"""
+
+# All leads due their next follow-up, in keyset order. The lead filter
+# matches the partial index idx_leads_followup_due and the NOT EXISTS probe
+# is answered from idx_follow_ups_user_type.
+DUE_FOLLOWUPS_QUERY = """
+            SELECT l.*, t.follow_up_type
+            FROM marketing_leads l
+            CROSS JOIN LATERAL (""" + FOLLOWUP_TIER_SQL + """) t
+            WHERE l.booking_intent_detected = FALSE
+                AND l.lead_status IN ('warm', 'hot', 'cold')
+                AND l.last_interaction < NOW() - INTERVAL '24 hours'
+                AND NOT EXISTS (
+                    SELECT 1 FROM follow_ups f
+                    WHERE f.user_id = l.user_id AND f.follow_up_type = t.follow_up_type
+                )
+                {conditions}
+            ORDER BY l.lead_score DESC, l.user_id DESC
+            LIMIT %s;
+"""
+
+# A lead's current follow-up tier and whether it was already sent
+SHOULD_SEND_QUERY = f"""
+            SELECT l.lead_score, l.lead_status, l.booking_intent_detected,
+                NOW() - l.last_interaction AS time_since_last,
+                t.follow_up_type,
+                EXISTS (
+                    SELECT 1 FROM follow_ups f
+                    WHERE f.user_id = l.user_id AND f.follow_up_type = t.follow_up_type
+                ) AS already_sent
+            FROM marketing_leads l
+            CROSS JOIN LATERAL ({FOLLOWUP_TIER_SQL}) t
+            WHERE l.user_id = %s;
+"""
+
+db.prepare('followup_should_send', SHOULD_SEND_QUERY)
+
+# A follow-up row plus its event for the analytics rollup
+SCHEDULE_FOLLOW_UP_QUERY = """
+            WITH scheduled AS (
+                INSERT INTO follow_ups (user_id, follow_up_type, sent_at, response_received)
+                VALUES (%s, %s, NOW(), FALSE)
+                RETURNING user_id, follow_up_type
+            )
+            INSERT INTO conversion_events (user_id, event_type, event_data)
+            SELECT user_id, 'follow_up_sent'::conversion_event_type, jsonb_build_object('follow_up_type', follow_up_type)
+            FROM scheduled;
+"""
+
+# A repeated response to the same follow-up is only counted once
+MARK_RESPONSE_QUERY = """
+            WITH responded AS (
+                UPDATE follow_ups
+                SET response_received = TRUE
+                WHERE user_id = %s AND follow_up_type = %s
+                    AND response_received = FALSE
+                RETURNING user_id, follow_up_type
+            )
+            INSERT INTO conversion_events (user_id, event_type, event_data)
+            SELECT DISTINCT user_id, 'follow_up_response'::conversion_event_type, jsonb_build_object('follow_up_type', follow_up_type)
+            FROM responded;
+"""
 
 
 class FollowUpScheduler:
@@ -13,67 +98,141 @@ class FollowUpScheduler:
     
     FOLLOW_UP_MESSAGES = {
         '24h': [
-            "Salam! Mən VERA, dün bizimlə danışmışdınız. 👋\n\nBaşqa sualınız var? Müayinə üçün kömək edə bilərəm? 😊\n\n📞 +994 12 541 19 00",
+            "Salam! Mən VERA, dün bizimlə danışmışdınız. 👋\n\nBaşqa sualınız var? Müayinə üçün kömək edə bilərəm? 😊\n\n📞 {phone}",
 
-            "Salam! VERA sizinlə əlaqə saxlayır. 🙂\n\nDünənki söhbətimizə davam edək? Göz sağlamlığınız üçün hər hansı kömək lazımdırsa, buradayıq!\n\n📞 +994 12 541 19 00",
+            "Salam! VERA sizinlə əlaqə saxlayır. 🙂\n\nDünənki söhbətimizə davam edək? Göz sağlamlığınız üçün hər hansı kömək lazımdırsa, buradayıq!\n\n📞 {phone}",
 
-            "Salam! Mən VERA, Briz-L köməkçisiyəm. 👋\n\nDünən bizimlə əlaqə saxlamışdınız. Suallarınıza cavab verə və ya müayinə təyin edə bilərik.\n\n📞 +994 12 541 19 00"
+            "Salam! Mən VERA, Briz-L köməkçisiyəm. 👋\n\nDünən bizimlə əlaqə saxlamışdınız. Suallarınıza cavab verə və ya müayinə təyin edə bilərik.\n\n📞 {phone}"
         ],
         '48h': [
-            "Salam! Bir neçə gün əvvəl bizimlə danışmışdıq. 👋\n\nGözünüzlə bağlı probleminizlə həll tapdınız? Hələ də kömək lazımdırsa, burdayıq! 🙂\n\n📞 +994 12 541 19 00",
+            "Salam! Bir neçə gün əvvəl bizimlə danışmışdıq. 👋\n\nGözünüzlə bağlı probleminizlə həll tapdınız? Hələ də kömək lazımdırsa, burdayıq! 🙂\n\n📞 {phone}",
             
-            "Salam! İki gün əvvəl məlumat almışdınız. 📝\n\nQərarınızı vermisinizsə və ya sualınız varsa, məmnuniyyətlə cavablandırırıq.\n\n📞 +994 12 541 19 00",
+            "Salam! İki gün əvvəl məlumat almışdınız. 📝\n\nQərarınızı vermisinizsə və ya sualınız varsa, məmnuniyyətlə cavablandırırıq.\n\n📞 {phone}",
             
-            "Salam! Göz sağlamlığınız barədə düşünmüsünüzmü? 🤔\n\nMüayinə üçün vaxt təyin etməyə kömək edə bilərik.\n\n📞 +994 12 541 19 00"
+            "Salam! Göz sağlamlığınız barədə düşünmüsünüzmü? 🤔\n\nMüayinə üçün vaxt təyin etməyə kömək edə bilərik.\n\n📞 {phone}"
         ],
         '1week': [
-            "Salam! Keçən həftə mənimlə yazışmışdınız. 👋\n\nGöz sağlamlığınız vacibdir. İndi müayinəyə yazıla bilərsiniz. Kömək edim? 📞\n\n☎️ +994 12 541 19 00\n📱 WhatsApp: https://wa.me/994555512400",
+            "Salam! Keçən həftə mənimlə yazışmışdınız. 👋\n\nGöz sağlamlığınız vacibdir. İndi müayinəyə yazıla bilərsiniz. Kömək edim? 📞\n\n☎️ {phone}\n📱 WhatsApp: {whatsapp}",
             
-            "Salam! Bir həftə əvvəl bizimlə danışmışdınız. 📅\n\nGöz probleminiz hələ də qalırsa, müayinə vaxtıdır. Sizə kömək edək?\n\n📞 +994 12 541 19 00",
+            "Salam! Bir həftə əvvəl bizimlə danışmışdınız. 📅\n\nGöz probleminiz hələ də qalırsa, müayinə vaxtıdır. Sizə kömək edək?\n\n📞 {phone}",
             
-            "Salam! Keçən həftə göz sağlamlığı barədə məlumat almışdınız. 👓\n\nErkən müayinə hər zaman yaxşıdır. Vaxt təyin edək?\n\n📞 +994 12 541 19 00"
+            "Salam! Keçən həftə göz sağlamlığı barədə məlumat almışdınız. 👓\n\nErkən müayinə hər zaman yaxşıdır. Vaxt təyin edək?\n\n📞 {phone}"
         ]
     }
     
     def __init__(self):
         self.db = db
     
-    def get_leads_needing_followup(self, follow_up_type: str = '24h') -> List[Dict[str, Any]]:
+    def get_leads_needing_followup(self, follow_up_type: Optional[str] = None, limit: int = 50,
+                                   after: Optional[Tuple[int, str]] = None) -> List[Dict[str, Any]]:
         """
-        Get leads that need follow-up based on time elapsed
+        Get leads that are due a follow-up, with the follow-up type each is due
+        
+        Each lead is due the highest tier its inactivity has reached
+        ('1week' > '48h' > '24h'), unless that tier was already sent.
         
         Args:
-            follow_up_type: '24h', '48h', or '1week'
+            follow_up_type: Only return leads due this type ('24h', '48h',
+                '1week'); None returns all tiers at once
+            limit: Maximum number of leads to return
+            after: Keyset cursor (lead_score, user_id) of the last lead of the
+                previous page; results continue after it
         
         Returns:
-            List of leads needing follow-up
+            List of leads (with a 'follow_up_type' key), ordered by
+            lead_score DESC, user_id DESC
         """
-        time_intervals = {
-            '24h': '24 hours',
-            '48h': '48 hours',
-            '1week': '7 days'
-        }
+        name, params = self._due_statement(follow_up_type, limit, after)
         
-        interval = time_intervals.get(follow_up_type, '24 hours')
+        try:
+            results = self.db.execute_prepared(name, params)
+            return [dict(row) for row in results] if results else []
+        except Exception as e:
+            logger.error("❌ Error getting leads for follow-up: %s", e)
+            return []
+    
+    def _due_statement(self, follow_up_type: Optional[str], limit: int,
+                       after: Optional[Tuple[int, str]]) -> Tuple[str, tuple]:
+        """Prepared statement name (one per filter combination) and parameters of a due page"""
+        conditions = []
+        params = []
+        if after is not None:
+            conditions.append("AND (l.lead_score, l.user_id) < (%s, %s)")
+            params.extend(after)
+        if follow_up_type is not None:
+            conditions.append("AND t.follow_up_type = %s")
+            params.append(follow_up_type)
+        params.append(limit)
+        
+        name = f"followups_due_{int(after is not None)}{int(follow_up_type is not None)}"
+        self.db.prepare(name, DUE_FOLLOWUPS_QUERY.format(conditions="\n                ".join(conditions)))
+        return name, tuple(params)
+    
+    def iter_leads_needing_followup(self, follow_up_type: Optional[str] = None,
+                                    page_size: int = FOLLOWUP_PAGE_SIZE) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Page through every lead due a follow-up
         
-        query = """
-            SELECT l.* FROM marketing_leads l
-            LEFT JOIN follow_ups f ON l.user_id = f.user_id 
-                AND f.follow_up_type = %s
-            WHERE l.booking_intent_detected = FALSE
-                AND l.lead_status IN ('warm', 'hot', 'cold')
-                AND l.last_interaction < NOW() - INTERVAL %s
-                AND f.user_id IS NULL
-            ORDER BY l.lead_score DESC
-            LIMIT 50;
+        Args:
+            follow_up_type: Only leads due this type; None for all tiers
+            page_size: Leads per page
+        
+        Yields:
+            Pages (lists) of leads
+        """
+        after = None
+        while True:
+            page = self.get_leads_needing_followup(follow_up_type, limit=page_size, after=after)
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last = page[-1]
+            after = (last['lead_score'], last['user_id'])
+    
+    def record_follow_ups(self, outcomes: List[Dict[str, Any]]) -> int:
         """
+        Record delivery outcomes of a batch of follow-ups
+        
+        Transient failures (timeouts, rate limits, 5xx) are not recorded so
+        the lead is picked up again on the next run. Skipped follow-ups (the
+        channel's 24h window had closed) are recorded so the tier is not
+        retried, but they are not counted as sent.
         
+        Args:
+            outcomes: Dicts with user_id, follow_up_type, channel, delivered, skipped, error
+        
+        Returns:
+            Number of delivered follow-ups recorded
+        """
+        rows = [
+            (o['user_id'], o['follow_up_type'], o['delivered'], o.get('skipped', False), o['channel'], o['error'])
+            for o in outcomes if not o.get('transient')
+        ]
+        if not rows:
+            return 0
+        
+        delivered = sum(1 for row in rows if row[2])
         try:
-            results = self.db.execute_query(query, (follow_up_type, interval))
-            return [dict(row) for row in results] if results else []
+            # One statement: follow-up rows plus their events for the analytics rollup
+            self.db.execute_values("""
+                WITH recorded AS (
+                    INSERT INTO follow_ups (user_id, follow_up_type, delivered, skipped, channel, error)
+                    VALUES %s
+                    RETURNING user_id, follow_up_type, channel, delivered
+                )
+                INSERT INTO conversion_events (user_id, event_type, event_data)
+                SELECT user_id, 'follow_up_sent'::conversion_event_type,
+                       jsonb_build_object('follow_up_type', follow_up_type, 'channel', channel)
+                FROM recorded
+                WHERE delivered;
+            """, rows)
         except Exception as e:
-            print(f"❌ Error getting leads for follow-up: {e}")
-            return []
+            logger.error("❌ Error recording follow-ups: %s", e)
+            return 0
+        
+        return delivered
     
     def schedule_follow_up(self, user_id: str, follow_up_type: str) -> bool:
         """
@@ -86,26 +245,13 @@ class FollowUpScheduler:
         Returns:
             Boolean indicating success
         """
-        query = """
-            INSERT INTO follow_ups (user_id, follow_up_type, sent_at, response_received)
-            VALUES (%s, %s, NOW(), FALSE);
-        """
-        
         try:
-            self.db.execute_query(query, (user_id, follow_up_type), fetch=False)
-            
-            # Update analytics
-            self.db.execute_query("""
-                INSERT INTO marketing_analytics (date, follow_ups_sent)
-                VALUES (CURRENT_DATE, 1)
-                ON CONFLICT (date) 
-                DO UPDATE SET follow_ups_sent = marketing_analytics.follow_ups_sent + 1;
-            """, fetch=False)
+            self.db.execute_query(SCHEDULE_FOLLOW_UP_QUERY, (user_id, follow_up_type), fetch=False)
             
-            print(f"📧 Follow-up scheduled: {user_id} ({follow_up_type})")
+            logger.info("📧 Follow-up scheduled: %s (%s)", user_id, follow_up_type)
             return True
         except Exception as e:
-            print(f"❌ Error scheduling follow-up: {e}")
+            logger.error("❌ Error scheduling follow-up: %s", e)
             return False
     
     def get_follow_up_message(self, follow_up_type: str, 
@@ -123,7 +269,9 @@ class FollowUpScheduler:
         import random
         
         messages = self.FOLLOW_UP_MESSAGES.get(follow_up_type, self.FOLLOW_UP_MESSAGES['24h'])
-        base_message = random.choice(messages)
+        knowledge = knowledge_store.snapshot
+        base_message = random.choice(messages).format(phone=knowledge.phone,
+                                                      whatsapp=knowledge.clinic.get('whatsapp', ''))
         
         # Personalize based on lead data if available
         if lead_data:
@@ -150,59 +298,64 @@ class FollowUpScheduler:
         Returns:
             Boolean indicating success
         """
-        query = """
-            UPDATE follow_ups
-            SET response_received = TRUE
-            WHERE user_id = %s AND follow_up_type = %s;
-        """
-        
         try:
-            self.db.execute_query(query, (user_id, follow_up_type), fetch=False)
-            
-            # Update analytics
-            self.db.execute_query("""
-                INSERT INTO marketing_analytics (date, follow_up_responses)
-                VALUES (CURRENT_DATE, 1)
-                ON CONFLICT (date) 
-                DO UPDATE SET follow_up_responses = marketing_analytics.follow_up_responses + 1;
-            """, fetch=False)
+            self.db.execute_query(MARK_RESPONSE_QUERY, (user_id, follow_up_type), fetch=False)
             
-            print(f"✅ Follow-up response recorded: {user_id}")
+            logger.info("✅ Follow-up response recorded: %s", user_id)
             return True
         except Exception as e:
-            print(f"❌ Error marking response: {e}")
+            logger.error("❌ Error marking response: %s", e)
             return False
     
-    def process_all_followups(self) -> Dict[str, int]:
+    def process_all_followups(self, sender: Optional[ChannelSender] = None) -> Dict[str, int]:
         """
-        Process all pending follow-ups (run this periodically)
+        Send all pending follow-ups (run this periodically)
+        
+        Due leads (all tiers at once) are paged through with a keyset
+        cursor, messages are delivered concurrently by the channel sender
+        and outcomes are recorded per page in bulk.
+        
+        Args:
+            sender: Channel sender to deliver with (a new one by default)
         
         Returns:
             Dict with counts of follow-ups processed
         """
+        sender = sender or ChannelSender()
         results = {
             '24h_sent': 0,
             '48h_sent': 0,
             '1week_sent': 0,
-            'total_sent': 0
+            'total_sent': 0,
+            'failed': 0,
+            'skipped': 0,
+            'deferred': 0
         }
         
-        # Process each follow-up type
-        for follow_up_type in ['24h', '48h', '1week']:
-            leads = self.get_leads_needing_followup(follow_up_type)
+        for page in self.iter_leads_needing_followup():
+            messages = [
+                (lead['user_id'], self.get_follow_up_message(lead['follow_up_type'], lead),
+                 WA_FOLLOWUP_TEMPLATES.get(lead['follow_up_type']))
+                for lead in page
+            ]
+            outcomes = sender.send_batch(messages)
+            for lead, outcome in zip(page, outcomes):
+                outcome['follow_up_type'] = lead['follow_up_type']
             
-            for lead in leads:
-                success = self.schedule_follow_up(lead['user_id'], follow_up_type)
-                if success:
-                    results[f'{follow_up_type}_sent'] += 1
+            self.record_follow_ups(outcomes)
+            for outcome in outcomes:
+                if outcome['delivered']:
+                    results[f"{outcome['follow_up_type']}_sent"] += 1
                     results['total_sent'] += 1
-                    
-                    # Note: Actual message sending would be handled by
-                    # Telegram bot or messaging service integration
-                    message = self.get_follow_up_message(follow_up_type, lead)
-                    print(f"📨 Follow-up message for {lead['user_id']}:\n{message}\n")
-        
-        print(f"📊 Follow-up batch complete: {results['total_sent']} messages processed")
+                elif outcome['skipped']:
+                    results['skipped'] += 1
+                elif outcome['transient']:
+                    results['deferred'] += 1
+                else:
+                    results['failed'] += 1
+        
+        logger.info("📊 Follow-up batch complete: %s sent, %s failed, %s skipped, %s deferred",
+                    results['total_sent'], results['failed'], results['skipped'], results['deferred'])
         return results
     
     def get_follow_up_effectiveness(self) -> Dict[str, Any]:
@@ -215,13 +368,13 @@ class FollowUpScheduler:
         try:
             # Total follow-ups sent
             result = self.db.execute_query("""
-                SELECT COUNT(*) as total FROM follow_ups;
+                SELECT COUNT(*) as total FROM follow_ups WHERE delivered;
             """)
             total_sent = result[0]['total'] if result else 0
             
             # Follow-ups with responses
             result = self.db.execute_query("""
-                SELECT COUNT(*) as total FROM follow_ups WHERE response_received = TRUE;
+                SELECT COUNT(*) as total FROM follow_ups WHERE delivered AND response_received = TRUE;
             """)
             total_responses = result[0]['total'] if result else 0
             
@@ -233,6 +386,7 @@ class FollowUpScheduler:
                     SUM(CASE WHEN response_received THEN 1 ELSE 0 END) as responses,
                     ROUND(100.0 * SUM(CASE WHEN response_received THEN 1 ELSE 0 END) / COUNT(*), 2) as response_rate
                 FROM follow_ups
+                WHERE delivered
                 GROUP BY follow_up_type;
             """)
             
@@ -252,7 +406,7 @@ class FollowUpScheduler:
                 'by_type': by_type
             }
         except Exception as e:
-            print(f"❌ Error getting follow-up stats: {e}")
+            logger.error("❌ Error getting follow-up stats: %s", e)
             return {}
     
     def get_recent_followups(self, limit: int = 20) -> List[Dict[str, Any]]:
@@ -277,7 +431,7 @@ class FollowUpScheduler:
             results = self.db.execute_query(query, (limit,))
             return [dict(row) for row in results] if results else []
         except Exception as e:
-            print(f"❌ Error getting recent follow-ups: {e}")
+            logger.error("❌ Error getting recent follow-ups: %s", e)
             return []
     
     def should_send_followup(self, user_id: str) -> Dict[str, Any]:
@@ -290,10 +444,11 @@ class FollowUpScheduler:
         Returns:
             Dict with recommendation
         """
-        # Get lead data
-        query = "SELECT * FROM marketing_leads WHERE user_id = %s;"
-        result = self.db.execute_query(query, (user_id,))
-        
+        result = self.db.execute_prepared('followup_should_send', (user_id,))
+        return self._followup_decision(result)
+    
+    def _followup_decision(self, result) -> Dict[str, Any]:
+        """Recommendation from the followup_should_send row (if any)"""
         if not result:
             return {'should_send': False, 'reason': 'Lead not found'}
         
@@ -303,34 +458,16 @@ class FollowUpScheduler:
         if lead['booking_intent_detected'] or lead['lead_status'] == 'converted':
             return {'should_send': False, 'reason': 'Already converted'}
         
-        # Calculate time since last interaction
-        last_interaction = lead['last_interaction']
-        now = datetime.now()
-        time_diff = now - last_interaction
-        
-        # Determine follow-up type
-        if time_diff >= timedelta(days=7):
-            follow_up_type = '1week'
-        elif time_diff >= timedelta(hours=48):
-            follow_up_type = '48h'
-        elif time_diff >= timedelta(hours=24):
-            follow_up_type = '24h'
-        else:
+        follow_up_type = lead['follow_up_type']
+        if follow_up_type is None:
             return {'should_send': False, 'reason': 'Too soon'}
         
-        # Check if this type of follow-up was already sent
-        check_query = """
-            SELECT * FROM follow_ups 
-            WHERE user_id = %s AND follow_up_type = %s;
-        """
-        existing = self.db.execute_query(check_query, (user_id, follow_up_type))
-        
-        if existing:
+        if lead['already_sent']:
             return {'should_send': False, 'reason': f'{follow_up_type} already sent'}
         
         return {
             'should_send': True,
             'follow_up_type': follow_up_type,
             'lead_score': lead['lead_score'],
-            'time_since_last': str(time_diff)
+            'time_since_last': str(lead['time_since_last'])
         }
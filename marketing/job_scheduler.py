@@ -0,0 +1,295 @@
+"""
+Job Scheduler - Persistent, leader-elected scheduler for periodic marketing jobs
+
+Job definitions (schedule, next run, last outcome) live in the
+scheduled_jobs table, so a restart picks up where the previous process
+left off. Only the process holding a Postgres advisory lock runs jobs;
+other replicas stand by and take over if the leader's connection drops.
+
+Schedules:
+    "every 900"          every 900 seconds
+    "daily 09:00"        every day at 09:00
+    "weekly mon 09:00"   every Monday at 09:00
+    "monthly 1 09:00"    on the 1st of every month at 09:00
+
+Times are in clinic local time (SCHEDULER_UTC_OFFSET hours from UTC).
+"""
+
+import logging
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+import psycopg2
+
+from .database import db, DB_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Scheduler Configuration
+SCHEDULER_UTC_OFFSET = float(os.getenv('SCHEDULER_UTC_OFFSET', '4'))  # Asia/Baku
+SCHEDULER_POLL_SECONDS = float(os.getenv('SCHEDULER_POLL_SECONDS', '15'))
+SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', '4'))
+DEFAULT_MISFIRE_GRACE = 3600  # seconds a run may start late before it is skipped
+
+LOCAL_TZ = timezone(timedelta(hours=SCHEDULER_UTC_OFFSET))
+LEADER_LOCK_KEY = zlib.crc32(b'briz_job_scheduler')
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+def _parse_time(value: str):
+    hour, minute = value.split(':')
+    return int(hour), int(minute)
+
+
+def next_run_time(spec: str, after: datetime) -> datetime:
+    """
+    Next time a schedule fires strictly after a moment
+
+    Args:
+        spec: Schedule spec (see module docstring)
+        after: Timezone-aware datetime
+
+    Returns:
+        Timezone-aware datetime (UTC)
+    """
+    parts = spec.split()
+    kind = parts[0]
+
+    if kind == 'every':
+        return (after + timedelta(seconds=int(parts[1]))).astimezone(timezone.utc)
+
+    local = after.astimezone(LOCAL_TZ)
+    hour, minute = _parse_time(parts[-1])
+
+    if kind == 'daily':
+        candidate = local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if candidate <= local:
+            candidate += timedelta(days=1)
+
+    elif kind == 'weekly':
+        weekday = WEEKDAYS.index(parts[1].lower()[:3])
+        candidate = local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        candidate += timedelta(days=(weekday - local.weekday()) % 7)
+        if candidate <= local:
+            candidate += timedelta(days=7)
+
+    elif kind == 'monthly':
+        day = int(parts[1])
+        year, month = local.year, local.month
+        while True:
+            try:
+                candidate = local.replace(year=year, month=month, day=day,
+                                          hour=hour, minute=minute, second=0, microsecond=0)
+            except ValueError:
+                candidate = None  # month too short for this day
+            if candidate is not None and candidate > local:
+                break
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    else:
+        raise ValueError(f"Unknown schedule: {spec}")
+
+    return candidate.astimezone(timezone.utc)
+
+
+class JobScheduler:
+    """Runs registered jobs on their schedules from the leader process"""
+
+    def __init__(self, workers: int = SCHEDULER_WORKERS, poll_seconds: float = SCHEDULER_POLL_SECONDS):
+        self.db = db
+        self.poll_seconds = poll_seconds
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._running = set()  # jobs this process is running
+        self._running_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._lock_conn = None
+        self._stop = threading.Event()
+
+    def register(self, name: str, func: Callable[[], Any], schedule: str,
+                 misfire_grace: int = DEFAULT_MISFIRE_GRACE, timeout: Optional[int] = None):
+        """
+        Register a job (and persist its schedule)
+
+        The stored next run is kept across restarts; it is only recomputed
+        when the schedule itself changes.
+
+        Args:
+            name: Unique job name
+            func: Callable run with no arguments
+            schedule: Schedule spec, e.g. "daily 09:00"
+            misfire_grace: Seconds a run may be late before it is skipped
+            timeout: Seconds after which a run still marked running (e.g. by a
+                leader that died) is considered abandoned; defaults to misfire_grace
+        """
+        first_run_at = next_run_time(schedule, datetime.now(timezone.utc))  # also validates the spec
+        self.jobs[name] = {'func': func, 'schedule': schedule}
+        self.db.execute_query("""
+            INSERT INTO scheduled_jobs (name, schedule, next_run_at, misfire_grace_seconds, timeout_seconds)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (name) DO UPDATE SET
+                next_run_at = CASE WHEN scheduled_jobs.schedule = EXCLUDED.schedule
+                                   THEN scheduled_jobs.next_run_at
+                                   ELSE EXCLUDED.next_run_at END,
+                schedule = EXCLUDED.schedule,
+                misfire_grace_seconds = EXCLUDED.misfire_grace_seconds,
+                timeout_seconds = EXCLUDED.timeout_seconds,
+                updated_at = NOW();
+        """, (name, schedule, first_run_at, misfire_grace, timeout), fetch=False)
+        logger.info("🗓️ Job registered: %s (%s)", name, schedule)
+
+    # ------------------------------------------------------------------
+    # Leader election
+    # ------------------------------------------------------------------
+
+    def _is_leader(self) -> bool:
+        """Hold (or try to take) the advisory lock on a dedicated connection"""
+        try:
+            if self._lock_conn is not None and not self._lock_conn.closed:
+                with self._lock_conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                return True
+        except Exception as e:
+            logger.warning("⚠️ Lost scheduler leader connection: %s", e)
+            self._lock_conn = None
+
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", (LEADER_LOCK_KEY,))
+                acquired = cursor.fetchone()[0]
+        except Exception as e:
+            logger.warning("⚠️ Leader election failed: %s", e)
+            acquired = False
+
+        if not acquired:
+            if conn is not None:
+                conn.close()
+            return False
+
+        self._lock_conn = conn
+        # Jobs the previous leader was running are reclaimed by
+        # _claim_due_jobs once they exceed their timeout, not here: its
+        # worker threads may still be running them
+        logger.info("👑 This process is now the scheduler leader")
+        return True
+
+    # ------------------------------------------------------------------
+    # Running jobs
+    # ------------------------------------------------------------------
+
+    def _claim_due_jobs(self):
+        """
+        Atomically mark due jobs as running and return them
+
+        A job still marked running is only claimed once its run started
+        longer ago than its timeout (or misfire grace): it was abandoned by
+        a leader that died mid-run.
+        """
+        with self._running_lock:
+            names = [name for name in self.jobs if name not in self._running]
+        if not names:
+            return []
+        due = self.db.execute_query("""
+            UPDATE scheduled_jobs
+            SET running = TRUE, last_started_at = NOW(), updated_at = NOW()
+            WHERE name = ANY(%s)
+                AND enabled
+                AND next_run_at <= NOW()
+                AND (NOT running
+                     OR COALESCE(last_started_at, updated_at)
+                        < NOW() - make_interval(secs => COALESCE(timeout_seconds, misfire_grace_seconds)))
+            RETURNING name, schedule, next_run_at, misfire_grace_seconds;
+        """, (names,)) or []
+        with self._running_lock:
+            self._running.update(row['name'] for row in due)
+        return due
+
+    def _finish(self, name: str, next_run_at: datetime, status: str,
+                error: Optional[str] = None, duration_ms: Optional[int] = None):
+        self.db.execute_query("""
+            UPDATE scheduled_jobs
+            SET running = FALSE,
+                next_run_at = %s,
+                last_run_at = CASE WHEN %s = 'missed' THEN last_run_at ELSE NOW() END,
+                last_status = %s,
+                last_error = %s,
+                last_duration_ms = COALESCE(%s, last_duration_ms),
+                updated_at = NOW()
+            WHERE name = %s;
+        """, (next_run_at, status, status, error, duration_ms, name), fetch=False)
+
+    def _run_job(self, row: Dict[str, Any]):
+        try:
+            self._execute(row)
+        finally:
+            with self._running_lock:
+                self._running.discard(row['name'])
+
+    def _execute(self, row: Dict[str, Any]):
+        name = row['name']
+        schedule = row['schedule']
+        now = datetime.now(timezone.utc)
+        next_run_at = next_run_time(schedule, max(now, row['next_run_at']))
+
+        lateness = (now - row['next_run_at']).total_seconds()
+        if lateness > row['misfire_grace_seconds']:
+            logger.warning("⏭️ Job %s missed its %s run by %.0fs, skipping to %s",
+                           name, row['next_run_at'], lateness, next_run_at)
+            self._finish(name, next_run_at, 'missed')
+            return
+
+        logger.info("▶️ Running job %s", name)
+        start = time.perf_counter()
+        try:
+            self.jobs[name]['func']()
+            status, error = 'ok', None
+        except Exception as e:
+            logger.exception("❌ Job %s failed: %s", name, e)
+            status, error = 'error', f"{type(e).__name__}: {e}"
+        duration_ms = int((time.perf_counter() - start) * 1000)
+
+        try:
+            self._finish(name, next_run_at, status, error, duration_ms)
+        except Exception as e:
+            logger.error("❌ Could not record result of job %s: %s", name, e)
+        logger.info("✅ Job %s finished (%s) in %dms, next run %s", name, status, duration_ms, next_run_at)
+
+    def run_pending(self) -> int:
+        """
+        Start every due job (leader only)
+
+        Returns:
+            Number of jobs started
+        """
+        if not self._is_leader():
+            return 0
+        try:
+            due = self._claim_due_jobs()
+        except Exception as e:
+            logger.error("❌ Error claiming due jobs: %s", e)
+            return 0
+        for row in due:
+            self._executor.submit(self._run_job, dict(row))
+        return len(due)
+
+    def run_forever(self):
+        """Poll for due jobs until stop() is called"""
+        logger.info("🚀 Job scheduler running (%d jobs, polling every %ss)", len(self.jobs), self.poll_seconds)
+        while not self._stop.is_set():
+            self.run_pending()
+            self._stop.wait(self.poll_seconds)
+
+    def stop(self):
+        """Stop polling, wait for running jobs and release leadership"""
+        self._stop.set()
+        self._executor.shutdown(wait=True)
+        if self._lock_conn is not None and not self._lock_conn.closed:
+            self._lock_conn.close()
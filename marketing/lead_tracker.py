@@ -4,25 +4,108 @@ Tracks every user interaction and calculates lead score
 """
 
 import json
+import logging
 from datetime import datetime
 from typing import Dict, List, Any, Optional
-from .database import db
+from .database import db, DEFAULT_SCORE_WEIGHTS
+from .event_writer import event_writer
+
+logger = logging.getLogger(__name__)
+
+
+# detected_items key -> lead_interests kind
+INTEREST_KINDS = {
+    'symptoms': 'symptom',
+    'surgeries': 'surgery',
+    'doctors': 'doctor',
+}
+
+# Upsert a message's interests; leads newly interested in a value
+# (xmax = 0: the row was inserted, not updated) bump interest_counts
+RECORD_INTERESTS_QUERY = """
+    WITH upserted AS (
+        INSERT INTO lead_interests (user_id, kind, value)
+        VALUES %s
+        ON CONFLICT (user_id, kind, value) DO UPDATE SET
+            hits = lead_interests.hits + 1,
+            last_seen = NOW()
+        RETURNING kind, value, (xmax = 0) AS inserted
+    )
+    INSERT INTO interest_counts (kind, value, leads)
+    SELECT kind, value, 1 FROM upserted WHERE inserted
+    ON CONFLICT (kind, value) DO UPDATE SET leads = interest_counts.leads + 1;
+"""
+
+
+# Existing lead: score increment, cap and status applied in one statement.
+# The FOR UPDATE subquery serializes concurrent messages of the same user
+# and returns the status before this update.
+UPDATE_LEAD_QUERY = """
+    UPDATE marketing_leads l
+    SET last_interaction = NOW(),
+        total_messages = l.total_messages + 1,
+        symptoms = ARRAY(SELECT DISTINCT unnest(COALESCE(l.symptoms, '{}') || %(symptoms)s::TEXT[])),
+        surgeries_interested = ARRAY(SELECT DISTINCT unnest(COALESCE(l.surgeries_interested, '{}') || %(surgeries)s::TEXT[])),
+        doctors_inquired = ARRAY(SELECT DISTINCT unnest(COALESCE(l.doctors_inquired, '{}') || %(doctors)s::TEXT[])),
+        lead_score = prev.new_score,
+        lead_status = CASE WHEN prev.old_status = 'converted' THEN 'converted'
+                           ELSE lead_status_for_score(prev.new_score) END,
+        booking_intent_detected = COALESCE(l.booking_intent_detected, FALSE) OR %(booking_intent)s::BOOLEAN,
+        conversation_history = COALESCE(l.conversation_history, '[]'::JSONB) || jsonb_build_array(%(entry)s::JSONB)
+    FROM (
+        SELECT lead_status AS old_status,
+               LEAST(100, COALESCE(lead_score, 0) + lead_score_increment(
+                   %(signals)s::TEXT[] || ARRAY['return_visit']
+                   || CASE WHEN COALESCE(total_messages, 0) + 1 >= 5
+                           THEN ARRAY['multiple_messages'] ELSE '{}'::TEXT[] END
+               )) AS new_score
+        FROM marketing_leads
+        WHERE user_id = %(user_id)s
+        FOR UPDATE
+    ) prev
+    WHERE l.user_id = %(user_id)s
+    RETURNING l.*, prev.old_status;
+"""
+
+# New lead; a concurrent first message that wins the insert makes this a
+# no-op and the caller retries as an update
+INSERT_LEAD_QUERY = """
+    INSERT INTO marketing_leads
+    (user_id, first_contact, last_interaction, total_messages,
+     symptoms, surgeries_interested, doctors_inquired, lead_score,
+     lead_status, booking_intent_detected, conversation_history)
+    SELECT %(user_id)s::TEXT, NOW(), NOW(), 1,
+           %(symptoms)s::TEXT[], %(surgeries)s::TEXT[], %(doctors)s::TEXT[], score,
+           lead_status_for_score(score), %(booking_intent)s::BOOLEAN, jsonb_build_array(%(entry)s::JSONB)
+    FROM (SELECT LEAST(100, lead_score_increment(%(signals)s::TEXT[])) AS score) s
+    ON CONFLICT (user_id) DO NOTHING
+    RETURNING *;
+"""
+
+GET_LEAD_QUERY = "SELECT * FROM marketing_leads WHERE user_id = %s;"
+
+# Append a bot reply in SQL: no read first, and no lost user messages when
+# they arrive while this runs
+APPEND_BOT_RESPONSE_QUERY = """
+    UPDATE marketing_leads
+    SET conversation_history = COALESCE(conversation_history, '[]'::JSONB)
+                               || jsonb_build_array(%s::JSONB)
+    WHERE user_id = %s
+    RETURNING user_id;
+"""
+
+# Parsed and planned once per connection (see DatabaseManager.prepare)
+db.prepare('lead_update', UPDATE_LEAD_QUERY)
+db.prepare('lead_insert', INSERT_LEAD_QUERY)
+db.prepare('lead_get', GET_LEAD_QUERY)
+db.prepare('lead_append_bot_response', APPEND_BOT_RESPONSE_QUERY)
 
 
 class LeadTracker:
     """Tracks and scores leads based on their interactions"""
     
-    # Scoring weights
-    SCORE_WEIGHTS = {
-        'price_inquiry': 30,
-        'doctor_inquiry': 20,
-        'surgery_inquiry': 15,
-        'symptom_mentioned': 25,
-        'booking_intent': 40,
-        'multiple_messages': 10,
-        'return_visit': 15,
-        'urgent_symptoms': 35
-    }
+    # Default scoring weights (the live ones are in lead_score_weights)
+    SCORE_WEIGHTS = DEFAULT_SCORE_WEIGHTS
     
     def __init__(self):
         self.db = db
@@ -32,6 +115,9 @@ class LeadTracker:
         """
         Create or update a lead in the database
         
+        Scoring runs in SQL (lead_score_increment / lead_status_for_score), so
+        concurrent messages of one user cannot overwrite each other's score.
+        
         Args:
             user_id: Unique user identifier
             message: User's message
@@ -40,179 +126,135 @@ class LeadTracker:
         Returns:
             Updated lead data with score
         """
-        # Check if lead exists
-        existing_lead = self.get_lead(user_id)
-        
-        if existing_lead:
-            return self._update_existing_lead(user_id, message, detected_items, existing_lead)
+        params = self._lead_params(user_id, message, detected_items)
+        
+        result = self.db.execute_prepared('lead_update', params)
+        if not result:
+            result = self.db.execute_prepared('lead_insert', params)
+            if result:
+                return self._after_write(user_id, detected_items, dict(result[0]), None)
+            # Lost the race against a concurrent first message
+            result = self.db.execute_prepared('lead_update', params)
+            if not result:
+                return {}
+        
+        lead = dict(result[0])
+        old_status = lead.pop('old_status', None)
+        return self._after_write(user_id, detected_items, lead, old_status)
+    
+    def _lead_params(self, user_id: str, message: str, detected_items: Dict[str, Any]) -> Dict[str, Any]:
+        """Parameters of UPDATE_LEAD_QUERY / INSERT_LEAD_QUERY for one message"""
+        return {
+            'user_id': user_id,
+            'symptoms': detected_items.get('symptoms', []),
+            'surgeries': detected_items.get('surgeries', []),
+            'doctors': detected_items.get('doctors', []),
+            'booking_intent': bool(detected_items.get('booking_intent', False)),
+            'signals': self._score_signals(detected_items),
+            'entry': json.dumps({
+                'timestamp': datetime.now().isoformat(),
+                'message': message,
+                'sender': 'user',
+                'items': detected_items
+            }),
+        }
+    
+    def _after_write(self, user_id: str, detected_items: Dict[str, Any],
+                     lead: Dict[str, Any], old_status: Optional[str]) -> Dict[str, Any]:
+        """Record interests and events of a written message"""
+        self._record_interests(user_id, detected_items)
+        
+        # Log conversion events (rolled up into analytics by marketing.rollup)
+        lifecycle = self._lifecycle_events(user_id, lead, old_status)
+        self._log_conversion_events(user_id, detected_items, lifecycle)
+        return lead
+    
+    def _lifecycle_events(self, user_id: str, lead: Dict[str, Any],
+                          old_status: Optional[str]) -> List[tuple]:
+        """new_lead / became_hot events of a written message (old_status None: new lead)"""
+        score, status = lead.get('lead_score'), lead.get('lead_status')
+        lifecycle = []
+        if old_status is None:
+            lifecycle.append(('new_lead', {'score': score}))
+        if status == 'hot' and old_status != 'hot':
+            lifecycle.append(('became_hot', {'score': score}))
+        
+        if old_status is None:
+            logger.info("📊 NEW LEAD: %s | Score: %s | Status: %s", user_id, score, status)
         else:
-            return self._create_new_lead(user_id, message, detected_items)
+            logger.info("📊 LEAD UPDATED: %s | Score: %s | Status: %s", user_id, score, status)
+        return lifecycle
     
-    def _create_new_lead(self, user_id: str, message: str, 
-                        detected_items: Dict[str, Any]) -> Dict[str, Any]:
-        """Create a new lead"""
-        
-        # Calculate initial score
-        initial_score = self._calculate_score(detected_items, is_new=True)
-        
-        # Determine initial status
-        status = self._determine_status(initial_score)
-        
-        # Prepare conversation history
-        conversation = [{
-            'timestamp': datetime.now().isoformat(),
-            'message': message,
-            'sender': 'user',
-            'items': detected_items
-        }]
-        
-        query = """
-            INSERT INTO marketing_leads 
-            (user_id, first_contact, last_interaction, total_messages, 
-             symptoms, surgeries_interested, doctors_inquired, lead_score, 
-             lead_status, booking_intent_detected, conversation_history)
-            VALUES (%s, NOW(), NOW(), %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING *;
+    def _score_signals(self, detected_items: Dict[str, Any]) -> List[str]:
         """
+        Scoring signals of a message (weights are looked up in SQL)
         
-        params = (
-            user_id,
-            1,
-            detected_items.get('symptoms', []),
-            detected_items.get('surgeries', []),
-            detected_items.get('doctors', []),
-            initial_score,
-            status,
-            detected_items.get('booking_intent', False),
-            json.dumps(conversation)
-        )
-        
-        result = self.db.execute_query(query, params)
-        
-        # Log conversion events
-        self._log_conversion_events(user_id, detected_items)
-        
-        # Update analytics
-        self._update_analytics('new_lead')
-        
-        print(f"📊 NEW LEAD: {user_id} | Score: {initial_score} | Status: {status}")
-        
-        return dict(result[0]) if result else {}
-    
-    def _update_existing_lead(self, user_id: str, message: str, 
-                             detected_items: Dict[str, Any], 
-                             existing_lead: Dict) -> Dict[str, Any]:
-        """Update existing lead"""
-        
-        # Merge detected items with existing data
-        symptoms = list(set(existing_lead.get('symptoms', []) + 
-                          detected_items.get('symptoms', [])))
-        surgeries = list(set(existing_lead.get('surgeries_interested', []) + 
-                           detected_items.get('surgeries', [])))
-        doctors = list(set(existing_lead.get('doctors_inquired', []) + 
-                         detected_items.get('doctors', [])))
-        
-        # Update conversation history
-        conversation = existing_lead.get('conversation_history', [])
-        if isinstance(conversation, str):
-            conversation = json.loads(conversation)
-        
-        conversation.append({
-            'timestamp': datetime.now().isoformat(),
-            'message': message,
-            'sender': 'user',
-            'items': detected_items
-        })
-        
-        # Calculate new score
-        total_messages = existing_lead.get('total_messages', 0) + 1
-        detected_items['return_visit'] = True
-        detected_items['multiple_messages'] = total_messages >= 5
-        
-        additional_score = self._calculate_score(detected_items, is_new=False)
-        new_score = min(100, existing_lead.get('lead_score', 0) + additional_score)
-        
-        # Determine new status
-        new_status = self._determine_status(new_score)
-        
-        # Update booking intent
-        booking_intent = (existing_lead.get('booking_intent_detected', False) or 
-                         detected_items.get('booking_intent', False))
-        
-        query = """
-            UPDATE marketing_leads
-            SET last_interaction = NOW(),
-                total_messages = %s,
-                symptoms = %s,
-                surgeries_interested = %s,
-                doctors_inquired = %s,
-                lead_score = %s,
-                lead_status = %s,
-                booking_intent_detected = %s,
-                conversation_history = %s
-            WHERE user_id = %s
-            RETURNING *;
+        A signal may appear twice; it is then counted twice, as symptoms
+        and urgent symptoms carry both a flag and a bonus.
         """
+        signals = [key for key in self.SCORE_WEIGHTS if detected_items.get(key, False)]
         
-        params = (
-            total_messages,
-            symptoms,
-            surgeries,
-            doctors,
-            new_score,
-            new_status,
-            booking_intent,
-            json.dumps(conversation),
-            user_id
-        )
-        
-        result = self.db.execute_query(query, params)
-        
-        # Log conversion events
-        self._log_conversion_events(user_id, detected_items)
-        
-        # Update analytics if status changed
-        if new_status != existing_lead.get('lead_status'):
-            self._update_analytics('status_change', new_status)
-        
-        print(f"📊 LEAD UPDATED: {user_id} | Score: {new_score} | Status: {new_status}")
-        
-        return dict(result[0]) if result else {}
-    
-    def _calculate_score(self, detected_items: Dict[str, Any], is_new: bool) -> int:
-        """Calculate lead score based on detected items"""
-        score = 0
-        
-        for key, weight in self.SCORE_WEIGHTS.items():
-            if detected_items.get(key, False):
-                score += weight
-        
-        # Additional scoring logic
         if len(detected_items.get('symptoms', [])) > 0:
-            score += self.SCORE_WEIGHTS['symptom_mentioned']
+            signals.append('symptom_mentioned')
         
         if len(detected_items.get('surgeries', [])) > 1:
-            score += 10  # Interested in multiple surgeries
+            signals.append('multiple_surgeries')  # Interested in multiple surgeries
         
         if detected_items.get('urgent_symptoms'):
-            score += self.SCORE_WEIGHTS['urgent_symptoms']
+            signals.append('urgent_symptoms')
         
-        return score
+        return signals
     
-    def _determine_status(self, score: int) -> str:
-        """Determine lead status based on score"""
-        if score >= 80:
-            return 'hot'
-        elif score >= 50:
-            return 'warm'
-        elif score >= 20:
-            return 'cold'
-        else:
-            return 'new'
+    def _interest_rows(self, user_id: str, detected_items: Dict[str, Any]) -> List[tuple]:
+        """Distinct (user_id, kind, value) rows of a message's interests"""
+        return sorted({
+            (user_id, kind, value)
+            for key, kind in INTEREST_KINDS.items()
+            for value in detected_items.get(key, [])
+            if value
+        })
+    
+    def _record_interests(self, user_id: str, detected_items: Dict[str, Any]):
+        """Upsert the symptoms, surgeries and doctors of a message into lead_interests"""
+        rows = self._interest_rows(user_id, detected_items)
+        if not rows:
+            return
+        
+        try:
+            self.db.execute_values(RECORD_INTERESTS_QUERY, rows)
+        except Exception as e:
+            logger.warning("⚠️ Error recording interests: %s", e)
+    
+    def _log_conversion_events(self, user_id: str, detected_items: Dict[str, Any],
+                               lifecycle: Optional[List[tuple]] = None):
+        """
+        Log conversion events for analytics
+
+        Counters in marketing_analytics are never updated here; the rollup
+        job folds these events into them, so writers only append rows.
+        Rows are handed to the batching event writer, so no commit happens
+        on the reply path.
+
+        Args:
+            user_id: Unique user identifier
+            detected_items: Detected items of the current message
+            lifecycle: Extra (event_type, event_data) pairs, e.g. new_lead / became_hot
+        """
+        events_to_log = self._conversion_events(detected_items, lifecycle)
+        if not events_to_log:
+            return
+        
+        try:
+            event_writer.write_many(
+                (user_id, event_type, event_data) for event_type, event_data in events_to_log
+            )
+        except Exception as e:
+            logger.warning("⚠️ Error logging events: %s", e)
     
-    def _log_conversion_events(self, user_id: str, detected_items: Dict[str, Any]):
-        """Log conversion events for analytics"""
-        events_to_log = []
+    def _conversion_events(self, detected_items: Dict[str, Any],
+                           lifecycle: Optional[List[tuple]] = None) -> List[tuple]:
+        """(event_type, event_data) pairs of a message"""
+        events_to_log = list(lifecycle or [])
         
         if detected_items.get('price_inquiry'):
             events_to_log.append(('price_inquiry', {'message': 'User asked about price'}))
@@ -227,47 +269,11 @@ class LeadTracker:
         if detected_items.get('urgent_symptoms'):
             events_to_log.append(('urgent_symptoms', {'symptoms': detected_items.get('symptoms', [])}))
         
-        for event_type, event_data in events_to_log:
-            query = """
-                INSERT INTO conversion_events (user_id, event_type, event_data, created_at)
-                VALUES (%s, %s, %s, NOW());
-            """
-            try:
-                self.db.execute_query(query, (user_id, event_type, json.dumps(event_data)), fetch=False)
-            except Exception as e:
-                print(f"⚠️ Error logging event: {e}")
-    
-    def _update_analytics(self, metric: str, value: str = None):
-        """Update daily analytics"""
-        try:
-            # Ensure today's analytics row exists
-            self.db.execute_query("""
-                INSERT INTO marketing_analytics (date, total_leads, hot_leads, booking_intents)
-                VALUES (CURRENT_DATE, 0, 0, 0)
-                ON CONFLICT (date) DO NOTHING;
-            """, fetch=False)
-            
-            # Update specific metric
-            if metric == 'new_lead':
-                self.db.execute_query("""
-                    UPDATE marketing_analytics
-                    SET total_leads = total_leads + 1
-                    WHERE date = CURRENT_DATE;
-                """, fetch=False)
-            
-            elif metric == 'status_change' and value == 'hot':
-                self.db.execute_query("""
-                    UPDATE marketing_analytics
-                    SET hot_leads = hot_leads + 1
-                    WHERE date = CURRENT_DATE;
-                """, fetch=False)
-        except Exception as e:
-            print(f"⚠️ Error updating analytics: {e}")
+        return events_to_log
     
     def get_lead(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get lead by user_id"""
-        query = "SELECT * FROM marketing_leads WHERE user_id = %s;"
-        result = self.db.execute_query(query, (user_id,))
+        result = self.db.execute_prepared('lead_get', (user_id,))
         return dict(result[0]) if result else None
     
     def get_hot_leads(self, limit: int = 50) -> List[Dict[str, Any]]:
@@ -306,49 +312,28 @@ class LeadTracker:
         """
         self.db.execute_query(query, (user_id,), fetch=False)
         
-        # Update analytics
-        self.db.execute_query("""
-            INSERT INTO marketing_analytics (date, booking_intents)
-            VALUES (CURRENT_DATE, 1)
-            ON CONFLICT (date) 
-            DO UPDATE SET booking_intents = marketing_analytics.booking_intents + 1;
-        """, fetch=False)
+        # Counted into booking_intents by the analytics rollup
+        event_writer.write(user_id, 'converted')
         
-        print(f"🎉 CONVERSION: {user_id} marked as converted!")
+        logger.info("🎉 CONVERSION: %s marked as converted!", user_id)
     
     def save_bot_response(self, user_id: str, bot_message: str) -> bool:
         """Save bot response to conversation history"""
         try:
-            existing_lead = self.get_lead(user_id)
-            if not existing_lead:
-                print(f"⚠️ Cannot save bot response: Lead {user_id} not found")
-                return False
-            
-            # Get existing conversation
-            conversation = existing_lead.get('conversation_history', [])
-            if isinstance(conversation, str):
-                conversation = json.loads(conversation)
-            
-            # Append bot response
-            conversation.append({
+            entry = {
                 'timestamp': datetime.now().isoformat(),
                 'message': bot_message,
                 'sender': 'bot'
-            })
-            
-            # Update in database
-            query = """
-                UPDATE marketing_leads
-                SET conversation_history = %s
-                WHERE user_id = %s;
-            """
-            self.db.execute_query(query, (json.dumps(conversation), user_id), fetch=False)
+            }
+            if not self.db.execute_prepared('lead_append_bot_response', (json.dumps(entry), user_id)):
+                logger.warning("⚠️ Cannot save bot response: Lead %s not found", user_id)
+                return False
             
-            print(f"💾 Bot response saved for {user_id}")
+            logger.debug("💾 Bot response saved for %s", user_id)
             return True
             
         except Exception as e:
-            print(f"⚠️ Error saving bot response: {e}")
+            logger.warning("⚠️ Error saving bot response: %s", e)
             return False
     
     def get_lead_stats(self) -> Dict[str, Any]:
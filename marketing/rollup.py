@@ -0,0 +1,187 @@
+"""
+Analytics Rollup - Folds conversion_events into hourly and daily counters
+
+Writers only append lifecycle events (new_lead, became_hot, converted,
+follow_up_sent, follow_up_response) to conversion_events. This job picks up
+events past a watermark and adds them to marketing_analytics_hourly and
+marketing_analytics (daily) in one transaction, so the counter rows are only
+ever written by a single process instead of every request.
+
+The watermark is a writer transaction id (conversion_events.xact_id), not an
+event id: ids are handed out before their transaction commits, so a
+late-committing transaction can hold ids below ones already visible. Each
+run folds the events of transactions older than the snapshot xmin, all of
+which have committed or aborted, so no event is skipped or counted twice.
+"""
+
+import logging
+import os
+from typing import Dict, List
+
+from .database import db
+
+logger = logging.getLogger(__name__)
+
+# Rollup Configuration
+ROLLUP_BATCH_SIZE = int(os.getenv('ROLLUP_BATCH_SIZE', '50000'))  # events per transaction (whole writer transactions)
+
+ROLLUP_NAME = 'marketing_analytics'
+
+# Counter column -> event type folded into it
+ROLLUP_COUNTERS = {
+    'total_leads': 'new_lead',
+    'hot_leads': 'became_hot',
+    'booking_intents': 'converted',
+    'follow_ups_sent': 'follow_up_sent',
+    'follow_up_responses': 'follow_up_response',
+}
+
+# Events of the writer transactions in [lower, upper)
+XACT_RANGE = "xact_id >= %s::xid8 AND xact_id < %s::xid8"
+# Upgrade from the event id watermark: events past it written by finished
+# transactions (rows written before xact_id existed have none)
+PAST_ID_WATERMARK = "id > %s AND (xact_id IS NULL OR xact_id < %s::xid8)"
+
+
+def _fold_query(table: str, key: str, bucket: str, where: str) -> str:
+    """INSERT ... ON CONFLICT adding the counts of the matching events to a rollup table"""
+    columns = ", ".join(ROLLUP_COUNTERS)
+    counts = ",\n                ".join(
+        f"COUNT(*) FILTER (WHERE event_type = '{event_type}')"
+        for event_type in ROLLUP_COUNTERS.values()
+    )
+    updates = ",\n                ".join(
+        f"{column} = {table}.{column} + EXCLUDED.{column}" for column in ROLLUP_COUNTERS
+    )
+    event_types = ", ".join(f"'{event_type}'" for event_type in ROLLUP_COUNTERS.values())
+    return f"""
+            INSERT INTO {table} ({key}, {columns})
+            SELECT {bucket},
+                {counts}
+            FROM conversion_events
+            WHERE {where}
+                AND event_type IN ({event_types})
+            GROUP BY 1
+            ON CONFLICT ({key}) DO UPDATE SET
+                {updates};
+    """
+
+
+def _fold_queries(where: str) -> List[str]:
+    """Hourly and daily fold of the events matching a WHERE clause"""
+    return [
+        _fold_query('marketing_analytics_hourly', 'hour', "date_trunc('hour', created_at)", where),
+        _fold_query('marketing_analytics', 'date', "created_at::DATE", where),
+    ]
+
+
+FOLD_QUERIES = _fold_queries(XACT_RANGE)
+UPGRADE_FOLD_QUERIES = _fold_queries(PAST_ID_WATERMARK)
+
+
+class AnalyticsRollup:
+    """Incrementally aggregates conversion events by writer transaction watermark"""
+
+    def __init__(self, batch_size: int = ROLLUP_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+
+    def run_once(self) -> Dict[str, object]:
+        """
+        Fold one batch of newly finished transactions' events
+
+        Returns:
+            Dict with watermark (first transaction id not yet folded), events
+            folded and whether more finished transactions are pending
+        """
+        with self.db.get_cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO rollup_state (name, last_event_id)
+                VALUES (%s, 0)
+                ON CONFLICT (name) DO NOTHING;
+            """, (ROLLUP_NAME,))
+            # Row lock: concurrent runs queue up instead of double counting
+            cursor.execute("""
+                SELECT last_event_id, next_xact_id::TEXT AS next_xact_id
+                FROM rollup_state WHERE name = %s FOR UPDATE;
+            """, (ROLLUP_NAME,))
+            state = cursor.fetchone()
+
+            # Every transaction below the snapshot xmin has committed or aborted
+            cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::TEXT AS horizon;")
+            horizon = cursor.fetchone()['horizon']
+
+            lower = state['next_xact_id']
+            if lower is None:
+                events = self._fold_past_id_watermark(cursor, state['last_event_id'], horizon)
+                upper = horizon
+            else:
+                upper = self._batch_upper(cursor, lower, horizon)
+                if upper == lower:
+                    return {'watermark': lower, 'events': 0, 'more': False}
+                cursor.execute("""
+                    SELECT COUNT(*) AS events, MAX(id) AS last_id FROM conversion_events
+                    WHERE """ + XACT_RANGE + ";", (lower, upper))
+                row = cursor.fetchone()
+                events = row['events']
+                for query in FOLD_QUERIES:
+                    cursor.execute(query, (lower, upper))
+                cursor.execute("""
+                    UPDATE rollup_state SET last_event_id = GREATEST(last_event_id, %s)
+                    WHERE name = %s;
+                """, (row['last_id'] or 0, ROLLUP_NAME))
+
+            cursor.execute("""
+                UPDATE rollup_state SET next_xact_id = %s::xid8, updated_at = NOW()
+                WHERE name = %s;
+            """, (upper, ROLLUP_NAME))
+
+        logger.debug("📈 Rolled up %s events of transactions %s..%s", events, lower, upper)
+        return {'watermark': upper, 'events': events, 'more': upper != horizon}
+
+    def _batch_upper(self, cursor, lower: str, horizon: str) -> str:
+        """
+        Exclusive upper transaction id of the next batch
+
+        Batches end on a transaction boundary so a transaction's events are
+        folded together; one transaction larger than a batch is folded whole.
+        """
+        cursor.execute("""
+            SELECT xact_id::TEXT AS upper FROM conversion_events
+            WHERE """ + XACT_RANGE + """
+            ORDER BY xact_id
+            OFFSET %s LIMIT 1;
+        """, (lower, horizon, self.batch_size))
+        row = cursor.fetchone()
+        if row is None or row['upper'] == lower:
+            return horizon
+        return row['upper']
+
+    def _fold_past_id_watermark(self, cursor, last_event_id: int, horizon: str) -> int:
+        """One-time switch from the event id watermark to transaction ids"""
+        cursor.execute("""
+            SELECT COUNT(*) AS events FROM conversion_events
+            WHERE """ + PAST_ID_WATERMARK + ";", (last_event_id, horizon))
+        events = cursor.fetchone()['events']
+        for query in UPGRADE_FOLD_QUERIES:
+            cursor.execute(query, (last_event_id, horizon))
+        logger.info("📈 Analytics rollup now tracks writer transactions (folded %s events past id %s)",
+                    events, last_event_id)
+        return events
+
+    def run(self) -> Dict[str, object]:
+        """
+        Fold all pending events (batch by batch)
+
+        Returns:
+            Dict with final watermark and total events folded
+        """
+        total = 0
+        while True:
+            result = self.run_once()
+            total += result['events']
+            if not result['more']:
+                break
+        if total:
+            logger.info("📈 Analytics rollup: folded %s events up to transaction %s", total, result['watermark'])
+        return {'watermark': result['watermark'], 'events': total}
@@ -0,0 +1,2 @@
+# Briz-L Observability
+# Logging, tracing and health instrumentation shared by all services
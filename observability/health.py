@@ -0,0 +1,132 @@
+"""
+Readiness probe with cached, timed dependency checks
+
+Each check is a callable that raises (or returns False) when the dependency
+is unusable. Checks run in parallel with a per-check timeout and the result
+is cached for a few seconds, so frequent orchestrator polls never pile up
+behind a slow dependency.
+"""
+
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Readiness Configuration
+READY_CACHE_TTL = float(os.getenv('READY_CACHE_TTL', '5'))  # seconds
+READY_CHECK_TIMEOUT = float(os.getenv('READY_CHECK_TIMEOUT', '2'))  # seconds per dependency
+
+DEPENDENCY_UP = metrics.gauge(
+    'dependency_up', 'Whether the last readiness check of a dependency passed', ('dependency',))
+DEPENDENCY_CHECK_SECONDS = metrics.gauge(
+    'dependency_check_seconds', 'Latency of the last readiness check of a dependency', ('dependency',))
+
+
+def http_check(url: str, ok_statuses: Optional[Iterable[int]] = None,
+               timeout: float = READY_CHECK_TIMEOUT) -> Callable[[], bool]:
+    """
+    Build a check that GETs a URL
+
+    Args:
+        url: URL to request
+        ok_statuses: Accepted HTTP statuses; None accepts any response
+            (i.e. only checks that the host is reachable)
+        timeout: Socket timeout in seconds
+    """
+    accepted = set(ok_statuses) if ok_statuses is not None else None
+
+    def check() -> bool:
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        if accepted is not None and status not in accepted:
+            raise RuntimeError(f"HTTP {status}")
+        return True
+
+    return check
+
+
+class ReadinessProbe:
+    """Runs dependency checks and caches the combined result"""
+
+    def __init__(self, cache_ttl: float = READY_CACHE_TTL, timeout: float = READY_CHECK_TIMEOUT):
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self._checks: Dict[str, Dict[str, Any]] = {}
+        self._result: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ready-check')
+
+    def add_check(self, name: str, check: Callable[[], Any], critical: bool = True):
+        """
+        Register a dependency check
+
+        Args:
+            name: Dependency name shown in the response and metrics
+            check: Callable that raises or returns False when unhealthy
+            critical: Whether a failure makes the service not ready
+        """
+        self._checks[name] = {'check': check, 'critical': critical}
+
+    def _run_one(self, name: str, check: Callable[[], Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            ok = check() is not False
+            error = None if ok else 'check returned False'
+        except Exception as e:
+            ok, error = False, f"{type(e).__name__}: {e}"
+        return {'ok': ok, 'latency_ms': round((time.perf_counter() - start) * 1000, 1), 'error': error}
+
+    def check(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Current readiness, refreshed at most once per cache_ttl
+
+        Returns:
+            {"ready": bool, "checked_at": epoch seconds, "checks": {name: {ok, latency_ms, error, critical}}}
+        """
+        now = time.monotonic()
+        if not force and self._result is not None and now - self._checked_at < self.cache_ttl:
+            return self._result
+
+        # Only one caller refreshes; concurrent callers get the previous result
+        if not self._lock.acquire(blocking=self._result is None):
+            return self._result
+        try:
+            futures = {
+                name: self._executor.submit(self._run_one, name, spec['check'])
+                for name, spec in self._checks.items()
+            }
+            deadline = time.monotonic() + self.timeout
+            checks = {}
+            for name, future in futures.items():
+                try:
+                    result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                except FutureTimeout:
+                    result = {'ok': False, 'latency_ms': self.timeout * 1000, 'error': 'timeout'}
+                result['critical'] = self._checks[name]['critical']
+                checks[name] = result
+                DEPENDENCY_UP.set(1 if result['ok'] else 0, dependency=name)
+                DEPENDENCY_CHECK_SECONDS.set(result['latency_ms'] / 1000, dependency=name)
+                if not result['ok']:
+                    logger.warning("⚠️ Readiness check %s failed: %s", name, result['error'])
+
+            self._result = {
+                'ready': all(r['ok'] for r in checks.values() if r['critical']),
+                'checked_at': time.time(),
+                'checks': checks,
+            }
+            self._checked_at = time.monotonic()
+            return self._result
+        finally:
+            self._lock.release()
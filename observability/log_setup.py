@@ -0,0 +1,186 @@
+"""
+Non-blocking structured logging for the webhook, poller and action server
+
+Records are handed to a bounded in-memory queue by the calling thread and
+formatted/written by a single background listener thread, so a slow stdout
+never stalls message handling.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from . import tracing
+
+# Logging Configuration
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()  # 'json' or 'text'
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+# Comma separated "<logger prefix>=<rate>" pairs, e.g. "werkzeug=0.1,marketing=0.5"
+LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional['NonBlockingQueueHandler'] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line"""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'service': self.service,
+            'msg': record.getMessage(),
+        }
+
+        # Structured fields passed with extra={...}
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a share of DEBUG/INFO records per logger
+
+    Rates are matched on the longest logger-name prefix. Warnings and
+    errors are never dropped.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._cache: Dict[str, float] = {}
+
+    def _rate_for(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            best = -1
+            for prefix, prefix_rate in self.rates.items():
+                if (name == prefix or name.startswith(prefix + '.')) and len(prefix) > best:
+                    rate, best = prefix_rate, len(prefix)
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the caller
+
+    Message formatting is deferred to the listener thread, and records are
+    dropped (and counted) when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Listener runs in-process, so the record can be passed as-is and
+        # its message built lazily in the background thread.
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse a LOG_SAMPLE_RATES string into a {logger prefix: rate} dict"""
+    rates = {}
+    for item in spec.split(','):
+        if '=' not in item:
+            continue
+        name, _, value = item.partition('=')
+        try:
+            rates[name.strip()] = max(0.0, min(1.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+def setup_logging(service: str, level: Optional[str] = None) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a background queue listener
+
+    Replaces any handlers previously installed on the root logger (e.g. by
+    logging.basicConfig or the Rasa SDK). Safe to call more than once.
+
+    Args:
+        service: Service name added to every JSON record
+        level: Root log level (defaults to LOG_LEVEL)
+
+    Returns:
+        The running QueueListener
+    """
+    global _listener, _queue_handler
+
+    root = logging.getLogger()
+    root.setLevel(level or LOG_LEVEL)
+
+    if _listener is not None:
+        return _listener
+
+    tracing.set_service(service)
+
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == 'json':
+        output.setFormatter(JsonFormatter(service))
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _queue_handler.addFilter(tracing.TraceIdFilter())
+    rates = parse_sample_rates(LOG_SAMPLE_RATES)
+    if rates:
+        _queue_handler.addFilter(SamplingFilter(rates))
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    return _listener
+
+
+def get_queue_stats() -> Dict[str, int]:
+    """Current depth of the log queue and number of dropped records"""
+    if _queue_handler is None:
+        return {'depth': 0, 'dropped': 0}
+    return {'depth': _queue_handler.queue.qsize(), 'dropped': _queue_handler.dropped}
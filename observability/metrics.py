@@ -0,0 +1,281 @@
+"""
+Minimal Prometheus-style metrics (counters, gauges, histograms)
+
+Metrics live in a process-wide registry and are rendered in the Prometheus
+text exposition format, either from an existing web route (the Flask
+webhook's /metrics) or from a small background HTTP server for processes
+that have no web framework of their own (the Rasa action server).
+"""
+
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0)
+
+_registry: Dict[str, '_Metric'] = {}
+_registry_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple = ()) -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{_escape(str(v))}"' for n, v in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}' for key, v in items]
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down
+
+    A callback may be given instead of calling set(); it is evaluated at
+    scrape time and returns either a number (unlabelled gauge) or a dict of
+    label-value tuples to numbers.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback: Optional[Callable] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        if self.callback is not None:
+            try:
+                result = self.callback()
+            except Exception as e:
+                logger.warning("⚠️ Gauge %s callback failed: %s", self.name, e)
+                return []
+            items = result.items() if isinstance(result, dict) else [((), result)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}' for key, v in items]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (typically latencies in seconds)"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, (('le', _format_value(bound)),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key, (('le', '+Inf'),))
+            lines.append(f'{self.name}_bucket{labels} {state[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}')
+        return lines
+
+
+def _register(metric_class, name, *args, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = metric_class(name, *args, **kwargs)
+        return metric
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Get or create a registered counter"""
+    return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = (),
+          callback: Optional[Callable] = None) -> Gauge:
+    """Get or create a registered gauge"""
+    return _register(Gauge, name, documentation, labelnames, callback=callback)
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Get or create a registered histogram"""
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def render() -> str:
+    """Render every registered metric in Prometheus text format"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def register_process_gauges():
+    """Queue depths and DB connection usage shared by every service"""
+    from . import log_setup, tracing
+
+    gauge('log_queue_depth', 'Log records waiting for the background writer',
+          callback=lambda: log_setup.get_queue_stats()['depth'])
+    gauge('log_records_dropped', 'Log records dropped because the queue was full',
+          callback=lambda: log_setup.get_queue_stats()['dropped'])
+    gauge('span_export_queue_depth', 'Trace spans waiting to be exported',
+          callback=lambda: tracing.exporter.queue_depth())
+
+    def db_connections():
+        try:
+            from marketing.database import db
+        except Exception:
+            return {}
+        return {
+            (pool, state): value
+            for pool, states in db.stats().items()
+            for state, value in states.items()
+        }
+
+    gauge('db_connections', 'Marketing database connections by pool and state', ('pool', 'state'),
+          callback=db_connections)
+
+    def event_writer_queue():
+        try:
+            from marketing.event_writer import event_writer
+        except Exception:
+            return 0
+        return event_writer.queue_depth()
+
+    gauge('event_writer_queue_depth', 'Conversion events waiting to be written',
+          callback=event_writer_queue)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are frequent; keep them out of the service log
+        pass
+
+
+def start_metrics_server(port: int, addr: str = '0.0.0.0') -> Optional[ThreadingHTTPServer]:
+    """
+    Serve /metrics from a daemon thread
+
+    Returns:
+        The server, or None if the port could not be bound (e.g. a second
+        worker process on the same host)
+    """
+    try:
+        server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning("⚠️ Metrics server not started on port %s: %s", port, e)
+        return None
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    logger.info("📈 Metrics available on :%s/metrics", port)
+    return server
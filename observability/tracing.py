@@ -0,0 +1,316 @@
+"""
+Lightweight request tracing across webhook → Rasa → action server → LLM → Graph send
+
+A trace id is created where a message enters the system (webhook or
+Telegram poller), passed to Rasa in the message metadata and picked up
+again by the action server. Every stage records a span; spans are exported
+off the request path as JSON lines (file, collector URL or the JSON log).
+
+Usage:
+    with start_trace(platform='whatsapp') as trace:
+        metadata['trace_id'] = trace.trace_id
+        with span('rasa_forward') as attrs:
+            ...
+            attrs['status_code'] = response.status_code
+
+Summarize an exported file into per-stage percentiles:
+    python -m observability.tracing traces.jsonl
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import math
+import os
+import queue
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+span_logger = logging.getLogger('briz.trace')
+
+# Tracing Configuration
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+TRACE_LOG_PATH = os.getenv('TRACE_LOG_PATH', '')  # JSON-lines file
+TRACE_COLLECTOR_URL = os.getenv('TRACE_COLLECTOR_URL', '')  # receives POSTed JSON arrays
+TRACE_SERVICE = os.getenv('TRACE_SERVICE', os.path.basename(sys.argv[0]) or 'python')
+TRACE_BATCH_SIZE = 100
+TRACE_FLUSH_INTERVAL = 1.0  # seconds
+
+_current_trace = contextvars.ContextVar('briz_trace', default=None)
+_STOP = object()
+
+
+class Trace:
+    """Identity and shared attributes of one traced message"""
+
+    __slots__ = ('trace_id', 'platform', 'attrs')
+
+    def __init__(self, trace_id: str, platform: str, attrs: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.platform = platform
+        self.attrs = attrs
+
+
+class SpanExporter:
+    """Ships finished spans from a background thread in small batches"""
+
+    def __init__(self, path: str = '', collector_url: str = ''):
+        self.path = path
+        self.collector_url = collector_url
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def export(self, record: Dict[str, Any]):
+        """Queue a span record without blocking the caller"""
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def queue_depth(self) -> int:
+        """Number of spans waiting to be written"""
+        return self._queue.qsize()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+                self._thread.start()
+                atexit.register(self.shutdown)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            stop = item is _STOP
+            batch = [] if stop else [item]
+            deadline = time.monotonic() + TRACE_FLUSH_INTERVAL
+            while not stop and len(batch) < TRACE_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def shutdown(self, timeout: float = 5.0):
+        """Write out everything still queued and stop the exporter thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    for record in batch:
+                        f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+            if self.collector_url:
+                body = json.dumps(batch, ensure_ascii=False, default=str).encode('utf-8')
+                req = urllib.request.Request(
+                    self.collector_url, data=body,
+                    headers={'Content-Type': 'application/json'}, method='POST'
+                )
+                urllib.request.urlopen(req, timeout=2).close()
+
+            if not self.path and not self.collector_url:
+                for record in batch:
+                    span_logger.info('span %s', record['span'], extra={'span_record': record})
+        except Exception as e:
+            logger.warning("⚠️ Span export failed (%d spans): %s", len(batch), e)
+
+
+exporter = SpanExporter(TRACE_LOG_PATH, TRACE_COLLECTOR_URL)
+
+
+def set_service(service: str):
+    """Name of the running service, recorded on every span"""
+    global TRACE_SERVICE
+    TRACE_SERVICE = service
+
+
+def new_trace_id() -> str:
+    """Generate a new random trace id"""
+    return uuid.uuid4().hex
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace active in this thread/task, if any"""
+    return _current_trace.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """Trace id active in this thread/task, if any"""
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def _emit(name: str, start_wall: float, duration: float, trace: Optional[Trace],
+          error: Optional[str], attrs: Dict[str, Any]):
+    if not TRACING_ENABLED or trace is None:
+        return
+    record = {
+        'trace_id': trace.trace_id,
+        'span': name,
+        'service': TRACE_SERVICE,
+        'platform': trace.platform,
+        'start': start_wall,
+        'duration_ms': round(duration * 1000, 3),
+        'error': error,
+    }
+    record.update(trace.attrs)
+    record.update(attrs)
+    exporter.export(record)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """
+    Time a stage of the current trace
+
+    Yields the span's attribute dict so callers can attach results
+    (status codes, token counts, ...). Outside a trace this is a no-op.
+    """
+    trace = _current_trace.get()
+    start_wall = time.time()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _emit(name, start_wall, time.perf_counter() - start, trace, error, attrs)
+
+
+@contextmanager
+def start_trace(trace_id: Optional[str] = None, platform: str = 'unknown',
+                root_span: str = 'request', **attrs) -> Iterator[Trace]:
+    """
+    Start (or continue) a trace for one inbound message
+
+    Args:
+        trace_id: Existing id propagated from upstream, or None for a new one
+        platform: Messaging platform, attached to every span
+        root_span: Name of the span covering the whole block
+
+    Yields:
+        The active Trace
+    """
+    trace = Trace(trace_id or new_trace_id(), platform, attrs)
+    token = _current_trace.set(trace)
+    try:
+        with span(root_span):
+            yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds the active trace id to log records so logs and spans can be joined"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = _current_trace.get()
+        if trace is not None:
+            record.trace_id = trace.trace_id
+        return True
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize_spans(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Compute latency percentiles per stage and platform
+
+    Args:
+        records: Span records as exported
+
+    Returns:
+        {"<span>/<platform>": {count, errors, p50, p95, p99, max}} in ms
+    """
+    groups = defaultdict(list)
+    errors = defaultdict(int)
+    for record in records:
+        key = f"{record.get('span')}/{record.get('platform', 'unknown')}"
+        groups[key].append(float(record.get('duration_ms', 0)))
+        if record.get('error'):
+            errors[key] += 1
+
+    summary = {}
+    for key, durations in sorted(groups.items()):
+        durations.sort()
+        summary[key] = {
+            'count': len(durations),
+            'errors': errors[key],
+            'p50': _percentile(durations, 50),
+            'p95': _percentile(durations, 95),
+            'p99': _percentile(durations, 99),
+            'max': durations[-1],
+        }
+    return summary
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    """Read span records from a JSON-lines file (span files or JSON service logs)"""
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            # Spans written through the JSON log are nested under span_record
+            entry = entry.get('span_record', entry)
+            if 'span' in entry and 'duration_ms' in entry:
+                records.append(entry)
+    return records
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m observability.tracing <spans.jsonl> [...]")
+        sys.exit(1)
+
+    spans = []
+    for span_file in sys.argv[1:]:
+        spans.extend(load_spans(span_file))
+
+    print(f"{'stage/platform':<40} {'count':>7} {'err':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for stage, stats in summarize_spans(spans).items():
+        print(f"{stage:<40} {stats['count']:>7} {stats['errors']:>5} "
+              f"{stats['p50']:>9.1f} {stats['p95']:>9.1f} {stats['p99']:>9.1f} {stats['max']:>9.1f}")
@@ -10,14 +10,21 @@ warnings.filterwarnings("ignore", category=PendingDeprecationWarning)
 import os
 import logging
 import requests
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import hashlib
 import hmac
 from dotenv import load_dotenv
 import json
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from observability.log_setup import setup_logging
+from observability.tracing import start_trace, span, current_trace_id
+from observability import metrics
+from observability.health import ReadinessProbe, http_check
+from circuit_breaker import CircuitBreaker
+from intelligence.fallback import build_fallback_reply
+
+# Configure logging (queued, JSON, sampled - see observability/log_setup.py)
+setup_logging("social_media_webhook")
 logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
@@ -46,6 +53,13 @@ WA_PHONE_NUMBER_ID = os.getenv("WA_PHONE_NUMBER_ID")
 
 RASA_URL = os.getenv("RASA_URL", "http://rasa:3000/webhooks/rest/webhook")
 SKIP_VERIFY_SIGNATURE = os.getenv("SKIP_VERIFY_SIGNATURE", "false").lower() == "true"
+RASA_STATUS_URL = os.getenv("RASA_STATUS_URL", RASA_URL.split("/webhooks/")[0] + "/status")
+READY_CHECK_GRAPH = os.getenv("READY_CHECK_GRAPH", "false").lower() == "true"
+# A forward waits for the action server's LLM call (OPENAI_TIMEOUT_SECONDS, 25s by default),
+# so the timeout and the slow-call threshold sit above it: a slow LLM is not a slow Rasa
+RASA_TIMEOUT_SECONDS = float(os.getenv("RASA_TIMEOUT_SECONDS", "35"))
+RASA_SLOW_CALL_SECONDS = float(os.getenv("RASA_SLOW_CALL_SECONDS", "30"))
+GRAPH_API_URL = os.getenv("GRAPH_API_URL", "https://graph.facebook.com/v18.0").rstrip("/")
 
 # Validate configuration
 if not FB_VERIFY_TOKEN:
@@ -57,6 +71,36 @@ if not WA_VERIFY_TOKEN:
 if not WA_ACCESS_TOKEN:
     logger.warning("WA_ACCESS_TOKEN not set!")
 
+# Metrics (scraped from /metrics)
+INBOUND_EVENTS = metrics.counter(
+    'webhook_inbound_events_total', 'Inbound webhook events', ('platform', 'type'))
+SIGNATURE_FAILURES = metrics.counter(
+    'webhook_signature_failures_total', 'Webhook requests rejected for a bad signature', ('endpoint',))
+RASA_FORWARD_SECONDS = metrics.histogram(
+    'rasa_forward_seconds', 'Latency of forwarding a message to Rasa', ('platform',))
+RASA_FORWARD_ERRORS = metrics.counter(
+    'rasa_forward_errors_total', 'Failed Rasa forwards', ('platform',))
+GRAPH_SEND_SECONDS = metrics.histogram(
+    'graph_send_seconds', 'Latency of Graph API send calls', ('platform', 'kind'))
+GRAPH_SEND_RESPONSES = metrics.counter(
+    'graph_send_responses_total', 'Graph API send results by HTTP status or error', ('platform', 'kind', 'status'))
+metrics.register_process_gauges()
+
+# Stop waiting on Rasa when it is failing or slow; serve fallback replies instead
+rasa_breaker = CircuitBreaker("rasa", slow_call_seconds=RASA_SLOW_CALL_SECONDS)
+
+# Readiness probe (served on /ready)
+readiness = ReadinessProbe()
+readiness.add_check("rasa", http_check(RASA_STATUS_URL, ok_statuses=[200]))
+try:
+    from marketing.database import db as marketing_db
+    readiness.add_check("postgres", marketing_db.ping)
+except ImportError:
+    logger.warning("Marketing database not available, skipping postgres readiness check")
+if READY_CHECK_GRAPH:
+    # Any HTTP response means the Graph API is reachable; not critical for readiness
+    readiness.add_check("graph_api", http_check(f"{GRAPH_API_URL}/"), critical=False)
+
 
 # ============================================================================
 # COMMON FUNCTIONS
@@ -110,10 +154,24 @@ def verify_webhook_signature(payload, signature, secret):
     return is_valid or SKIP_VERIFY_SIGNATURE
 
 
+def graph_post(url, kind, platform, **kwargs):
+    """POST to the Graph API, recording latency and the response status"""
+    with span("graph_send", kind=kind) as attrs, GRAPH_SEND_SECONDS.time(platform=platform, kind=kind):
+        try:
+            response = requests.post(url, **kwargs)
+        except requests.RequestException as e:
+            GRAPH_SEND_RESPONSES.inc(platform=platform, kind=kind, status=type(e).__name__)
+            raise
+        attrs["status_code"] = response.status_code
+    GRAPH_SEND_RESPONSES.inc(platform=platform, kind=kind, status=str(response.status_code))
+    return response
+
+
 def forward_to_rasa(sender_id, message_text, platform="unknown", is_button_click=False):
     """Forward message to Rasa and return responses with platform metadata"""
     try:
-        logger.info(f"Forwarding to Rasa from {sender_id} ({platform}): {message_text}")
+        logger.info("Forwarding to Rasa from %s (%s)", sender_id, platform)
+        logger.debug("Rasa message text: %s", message_text)
         
         # Create platform-specific sender ID
         platform_sender_id = f"{platform}_{sender_id}"
@@ -123,6 +181,7 @@ def forward_to_rasa(sender_id, message_text, platform="unknown", is_button_click
             "platform": platform,
             "source": f"{platform}_messaging" if platform != "web" else "website_chat",
             "is_button_click": is_button_click,
+            "trace_id": current_trace_id(),
         }
         
         # Add platform-specific characteristics
@@ -161,18 +220,21 @@ def forward_to_rasa(sender_id, message_text, platform="unknown", is_button_click
             "metadata": metadata
         }
         
-        logger.info(f"📱 Platform metadata: {metadata}")
+        logger.debug("📱 Platform metadata: %s", metadata)
         
-        response = requests.post(RASA_URL, json=payload, timeout=10)
-        response.raise_for_status()
+        with span("rasa_forward") as attrs, rasa_breaker.call(), RASA_FORWARD_SECONDS.time(platform=platform):
+            response = requests.post(RASA_URL, json=payload, timeout=RASA_TIMEOUT_SECONDS)
+            attrs["status_code"] = response.status_code
+            response.raise_for_status()
         
         rasa_responses = response.json()
-        logger.info(f"Received {len(rasa_responses)} responses from Rasa")
+        logger.info("Received %d responses from Rasa", len(rasa_responses))
         return rasa_responses
         
     except Exception as e:
-        logger.error(f"Error forwarding to Rasa: {e}")
-        return []
+        RASA_FORWARD_ERRORS.inc(platform=platform)
+        logger.error("Error forwarding to Rasa, sending fallback reply: %s", e)
+        return [{"text": build_fallback_reply(message_text)}]
 
 
 # ============================================================================
@@ -193,10 +255,10 @@ def send_facebook_message(recipient_id, message_text, platform="facebook"):
                 return False
             node = FB_PAGE_ID
         else:
-            logger.error(f"Unknown platform: {platform}")
+            logger.error("Unknown platform: %s", platform)
             return False
             
-        url = f"https://graph.facebook.com/v18.0/{node}/messages"
+        url = f"{GRAPH_API_URL}/{node}/messages"
         
         payload = {
             "messaging_type": "RESPONSE",
@@ -206,18 +268,18 @@ def send_facebook_message(recipient_id, message_text, platform="facebook"):
         
         params = {"access_token": FB_PAGE_ACCESS_TOKEN}
         
-        response = requests.post(url, json=payload, params=params)
+        response = graph_post(url, "text", platform, json=payload, params=params)
         
         if not response.ok:
-            logger.error(f"Graph send failed {response.status_code}: {response.text}")
+            logger.error("Graph send failed %s: %s", response.status_code, response.text)
             
         response.raise_for_status()
         
-        logger.info(f"Message sent successfully to {recipient_id} ({platform})")
+        logger.info("Message sent successfully to %s (%s)", recipient_id, platform)
         return True
         
     except Exception as e:
-        logger.error(f"Error sending {platform} message: {e}")
+        logger.error("Error sending %s message: %s", platform, e)
         return False
 
 
@@ -234,10 +296,10 @@ def send_facebook_buttons(recipient_id, text, buttons, platform="facebook"):
                 return False
             node = FB_PAGE_ID
         else:
-            logger.error(f"Unknown platform: {platform}")
+            logger.error("Unknown platform: %s", platform)
             return False
             
-        url = f"https://graph.facebook.com/v18.0/{node}/messages"
+        url = f"{GRAPH_API_URL}/{node}/messages"
         
         # Convert Rasa buttons to Facebook button format
         fb_buttons = []
@@ -272,18 +334,18 @@ def send_facebook_buttons(recipient_id, text, buttons, platform="facebook"):
         }
         
         params = {"access_token": FB_PAGE_ACCESS_TOKEN}
-        response = requests.post(url, json=message_payload, params=params)
+        response = graph_post(url, "buttons", platform, json=message_payload, params=params)
         
         if not response.ok:
-            logger.error(f"Graph buttons send failed {response.status_code}: {response.text}")
+            logger.error("Graph buttons send failed %s: %s", response.status_code, response.text)
             
         response.raise_for_status()
         
-        logger.info(f"Button message sent to {recipient_id} ({platform})")
+        logger.info("Button message sent to %s (%s)", recipient_id, platform)
         return True
         
     except Exception as e:
-        logger.error(f"Error sending buttons to {platform}: {e}")
+        logger.error("Error sending buttons to %s: %s", platform, e)
         return False
 
 
@@ -304,7 +366,7 @@ def handle_facebook_responses(recipient_id, rasa_responses, platform="facebook")
                 else:
                     send_facebook_message(recipient_id, rasa_msg["text"], platform)
         elif "image" in rasa_msg:
-            logger.info(f"Image response not yet implemented: {rasa_msg['image']}")
+            logger.info("Image response not yet implemented: %s", rasa_msg['image'])
 
 
 # ============================================================================
@@ -320,9 +382,9 @@ def send_whatsapp_message(recipient_phone, message_text):
         
         # Normalize phone number
         normalized_phone = normalize_phone(recipient_phone)
-        logger.info(f"Sending WhatsApp to {normalized_phone} (original: {recipient_phone})")
+        logger.debug("Sending WhatsApp to %s (original: %s)", normalized_phone, recipient_phone)
 
-        url = f"https://graph.facebook.com/v18.0/{WA_PHONE_NUMBER_ID}/messages"
+        url = f"{GRAPH_API_URL}/{WA_PHONE_NUMBER_ID}/messages"
         
         headers = {
             "Authorization": f"Bearer {WA_ACCESS_TOKEN}",
@@ -340,18 +402,18 @@ def send_whatsapp_message(recipient_phone, message_text):
             }
         }
         
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = graph_post(url, "text", "whatsapp", json=payload, headers=headers, timeout=10)
         
         if response.status_code != 200:
-            logger.error(f"WhatsApp API Error (Status {response.status_code}): {response.text}")
+            logger.error("WhatsApp API Error (Status %s): %s", response.status_code, response.text)
             
         response.raise_for_status()
         
-        logger.info(f"WhatsApp message sent successfully to {normalized_phone}")
+        logger.info("WhatsApp message sent successfully to %s", normalized_phone)
         return True
         
     except Exception as e:
-        logger.error(f"Error sending WhatsApp message: {e}")
+        logger.error("Error sending WhatsApp message: %s", e)
         return False
 
 
@@ -364,9 +426,9 @@ def send_whatsapp_template(recipient_phone, template_name, language_code="en", p
         
         # Normalize phone number
         normalized_phone = normalize_phone(recipient_phone)
-        logger.info(f"Sending WhatsApp Template '{template_name}' to {normalized_phone}")
+        logger.info("Sending WhatsApp Template '%s' to %s", template_name, normalized_phone)
 
-        url = f"https://graph.facebook.com/v18.0/{WA_PHONE_NUMBER_ID}/messages"
+        url = f"{GRAPH_API_URL}/{WA_PHONE_NUMBER_ID}/messages"
         
         headers = {
             "Authorization": f"Bearer {WA_ACCESS_TOKEN}",
@@ -392,25 +454,25 @@ def send_whatsapp_template(recipient_phone, template_name, language_code="en", p
             }
         }
         
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = graph_post(url, "template", "whatsapp", json=payload, headers=headers, timeout=10)
         
         if response.status_code != 200:
-            logger.error(f"WhatsApp Template API Error (Status {response.status_code}): {response.text}")
+            logger.error("WhatsApp Template API Error (Status %s): %s", response.status_code, response.text)
 
         response.raise_for_status()
         
-        logger.info(f"WhatsApp template sent to {normalized_phone}")
+        logger.info("WhatsApp template sent to %s", normalized_phone)
         return True
         
     except Exception as e:
-        logger.error(f"Error sending WhatsApp template: {e}")
+        logger.error("Error sending WhatsApp template: %s", e)
         return False
 
 
 def mark_whatsapp_read(message_id):
     """Mark a WhatsApp message as read"""
     try:
-        url = f"https://graph.facebook.com/v18.0/{WA_PHONE_NUMBER_ID}/messages"
+        url = f"{GRAPH_API_URL}/{WA_PHONE_NUMBER_ID}/messages"
         
         headers = {
             "Authorization": f"Bearer {WA_ACCESS_TOKEN}",
@@ -423,12 +485,12 @@ def mark_whatsapp_read(message_id):
             "message_id": message_id
         }
         
-        response = requests.post(url, json=payload, headers=headers, timeout=5)
+        response = graph_post(url, "read", "whatsapp", json=payload, headers=headers, timeout=5)
         response.raise_for_status()
         return True
         
     except Exception as e:
-        logger.error(f"Error marking message as read: {e}")
+        logger.error("Error marking message as read: %s", e)
         return False
 
 
@@ -438,7 +500,7 @@ def handle_whatsapp_responses(recipient_phone, rasa_responses):
         if "text" in rasa_msg:
             send_whatsapp_message(recipient_phone, rasa_msg["text"])
         elif "image" in rasa_msg:
-            logger.info(f"Image response not yet implemented: {rasa_msg['image']}")
+            logger.info("Image response not yet implemented: %s", rasa_msg['image'])
 
 
 # ============================================================================
@@ -477,6 +539,7 @@ def facebook_webhook():
             
             # Verify signature BEFORE parsing JSON
             if FB_APP_SECRET and not verify_webhook_signature(raw_data, signature, FB_APP_SECRET):
+                SIGNATURE_FAILURES.inc(endpoint="facebook")
                 logger.warning("Invalid Facebook webhook signature!")
                 return 'Invalid signature', 403
                 
@@ -505,7 +568,9 @@ def facebook_webhook():
                     # Determine platform
                     platform = "instagram" if obj == "instagram" else "facebook"
                     
-                    logger.info(f"{platform} event: sender={sender_id} recipient={event_recipient_id} (entry_id={recipient_id})")
+                    logger.debug("%s event: sender=%s recipient=%s (entry_id=%s)", platform, sender_id, event_recipient_id, recipient_id)
+                    event_type = next((k for k in ('message', 'postback', 'read', 'delivery') if k in messaging_event), 'other')
+                    INBOUND_EVENTS.inc(platform=platform, type=event_type)
                     
                     # Handle message
                     if 'message' in messaging_event:
@@ -513,19 +578,21 @@ def facebook_webhook():
                         if 'text' in message:
                             text = (message.get('text') or "").strip()
                             if not text:
-                                logger.info(f"Ignoring empty message from {sender_id}")
+                                logger.info("Ignoring empty message from %s", sender_id)
                                 continue
                                 
-                            rasa_responses = forward_to_rasa(sender_id, text, platform)
-                            handle_facebook_responses(sender_id, rasa_responses, platform)
+                            with start_trace(platform=platform):
+                                rasa_responses = forward_to_rasa(sender_id, text, platform)
+                                handle_facebook_responses(sender_id, rasa_responses, platform)
                         elif 'attachments' in message:
                             send_facebook_message(sender_id, "I can only process text messages for now.", platform)
                     
                     # Handle postback (button clicks)
                     elif 'postback' in messaging_event:
                         payload = messaging_event['postback']['payload']
-                        rasa_responses = forward_to_rasa(sender_id, payload, platform)
-                        handle_facebook_responses(sender_id, rasa_responses, platform)
+                        with start_trace(platform=platform):
+                            rasa_responses = forward_to_rasa(sender_id, payload, platform)
+                            handle_facebook_responses(sender_id, rasa_responses, platform)
                         
             return 'OK', 200
             
@@ -559,6 +626,7 @@ def whatsapp_webhook():
             
             # Verify signature (optional) BEFORE parsing JSON
             if FB_APP_SECRET and not verify_webhook_signature(raw_data, signature, FB_APP_SECRET):
+                SIGNATURE_FAILURES.inc(endpoint="whatsapp")
                 logger.warning("Invalid WhatsApp webhook signature!")
                 return 'Invalid signature', 403
                 
@@ -577,11 +645,15 @@ def whatsapp_webhook():
                 for change in entry.get('changes', []):
                     value = change.get('value', {})
                     
+                    for status in value.get('statuses', []):
+                        INBOUND_EVENTS.inc(platform="whatsapp", type=f"status_{status.get('status', 'unknown')}")
+                    
                     if 'messages' in value:
                         for message in value['messages']:
                             message_id = message.get('id')
                             from_phone = message.get('from')
                             message_type = message.get('type')
+                            INBOUND_EVENTS.inc(platform="whatsapp", type=message_type or "unknown")
                             
                             # Mark as read
                             if message_id:
@@ -591,8 +663,9 @@ def whatsapp_webhook():
                             if message_type == 'text':
                                 text = message.get('text', {}).get('body', '')
                                 if text:
-                                    rasa_responses = forward_to_rasa(from_phone, text, "whatsapp")
-                                    handle_whatsapp_responses(from_phone, rasa_responses)
+                                    with start_trace(platform="whatsapp"):
+                                        rasa_responses = forward_to_rasa(from_phone, text, "whatsapp")
+                                        handle_whatsapp_responses(from_phone, rasa_responses)
                             
                             # Handle button/interactive replies
                             elif message_type in ['button', 'interactive']:
@@ -607,8 +680,9 @@ def whatsapp_webhook():
                                         reply_text = interactive['list_reply'].get('title', '')
                                 
                                 if reply_text:
-                                    rasa_responses = forward_to_rasa(from_phone, reply_text, "whatsapp")
-                                    handle_whatsapp_responses(from_phone, rasa_responses)
+                                    with start_trace(platform="whatsapp"):
+                                        rasa_responses = forward_to_rasa(from_phone, reply_text, "whatsapp")
+                                        handle_whatsapp_responses(from_phone, rasa_responses)
                             
                             else:
                                 send_whatsapp_message(from_phone, "I can only process text messages at the moment.")
@@ -643,7 +717,7 @@ def send_whatsapp_api():
             return jsonify({"error": "Failed to send message"}), 500
             
     except Exception as e:
-        logger.error(f"Error in send_whatsapp_api: {e}")
+        logger.error("Error in send_whatsapp_api: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -668,7 +742,7 @@ def send_whatsapp_template_api():
             return jsonify({"error": "Failed to send template"}), 500
             
     except Exception as e:
-        logger.error(f"Error in send_whatsapp_template_api: {e}")
+        logger.error("Error in send_whatsapp_template_api: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -686,6 +760,20 @@ def health_check():
     }), 200
 
 
+@app.route('/ready', methods=['GET'])
+@app.route('/webhooks/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint - probes Rasa, Postgres and (optionally) the Graph API"""
+    result = readiness.check(force=request.args.get('force') == '1')
+    return jsonify({"service": "social_media_webhook", **result}), 200 if result['ready'] else 503
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 # ============================================================================
 # MAIN
 # ============================================================================
@@ -50,8 +50,8 @@ WEBHOOK_PID=$!
 # Wait a moment for webhook server to start
 sleep 3
 
-# Start Daily Report Scheduler in background
-echo "📅 Starting Daily Report Scheduler (9:00 AM reports for Seljan)..."
+# Start Report & Marketing Job Scheduler in background
+echo "📅 Starting Job Scheduler (reports for Seljan, follow-ups, analytics)..."
 python daily_report_scheduler.py &
 SCHEDULER_PID=$!
 
@@ -67,7 +67,7 @@ echo "✅ All services started!"
 echo "   - Action Server: PID $ACTION_PID (port 5055)"
 echo "   - Rasa Server: PID $RASA_PID (port 3000)"
 echo "   - Social Media Webhook: PID $WEBHOOK_PID (port 5000)"
-echo "   - Daily Report Scheduler: PID $SCHEDULER_PID"
+echo "   - Job Scheduler: PID $SCHEDULER_PID"
 echo "   - Telegram Poller: PID $TELEGRAM_PID"
 echo ""
 echo "📊 Monitoring services..."
@@ -9,14 +9,23 @@ import logging
 import time
 from collections import defaultdict
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from observability.log_setup import setup_logging
+from observability.tracing import start_trace, span, current_trace_id
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from intelligence.fallback import build_fallback_reply
+
+# Configure logging (queued, JSON, sampled - see observability/log_setup.py)
+setup_logging("telegram_poller")
 logger = logging.getLogger(__name__)
 
 # Configuration from environment variables
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")  # Match the .env variable name
 # Note: Use 'localhost' since all services run in one container
 RASA_URL = os.getenv("RASA_URL", "http://localhost:3000/webhooks/rest/webhook")
+# A forward waits for the action server's LLM call (OPENAI_TIMEOUT_SECONDS, 25s by default),
+# so the timeout and the slow-call threshold sit above it: a slow LLM is not a slow Rasa
+RASA_TIMEOUT_SECONDS = float(os.getenv("RASA_TIMEOUT_SECONDS", "35"))
+RASA_SLOW_CALL_SECONDS = float(os.getenv("RASA_SLOW_CALL_SECONDS", "30"))
 
 if not TELEGRAM_TOKEN:
     # Use the token provided in the chat as a fallback
@@ -25,6 +34,9 @@ if not TELEGRAM_TOKEN:
 
 bot = telebot.TeleBot(TELEGRAM_TOKEN)
 
+# Stop waiting on Rasa when it is failing or slow; serve fallback replies instead
+rasa_breaker = CircuitBreaker("rasa", slow_call_seconds=RASA_SLOW_CALL_SECONDS)
+
 # Track processed updates and messages to prevent duplicates
 processed_updates = set()
 last_messages = defaultdict(lambda: {"text": None, "time": 0})
@@ -50,7 +62,7 @@ def is_duplicate_message(user_id, message_text, current_time):
     
     if (last["text"] == message_text and 
         current_time - last["time"] < DUPLICATE_WINDOW):
-        logger.warning(f"Duplicate message detected from {user_id}: {message_text}")
+        logger.warning("Duplicate message detected from %s: %s", user_id, message_text)
         return True
     
     # Update last message tracking
@@ -62,7 +74,8 @@ def forward_to_rasa(user_id, message_text, is_button_click=False):
         # Send metadata to help Rasa understand the context
         metadata = {
             "is_button_click": is_button_click,
-            "source": "telegram"
+            "source": "telegram",
+            "trace_id": current_trace_id()
         }
         
         payload = {
@@ -70,15 +83,19 @@ def forward_to_rasa(user_id, message_text, is_button_click=False):
             "message": message_text,
             "metadata": metadata
         }
-        logger.debug(f"--- Sending to Rasa ---")
-        logger.debug(f"Payload: {payload}")
+        logger.debug("Sending to Rasa: %s", payload)
         
-        response = requests.post(RASA_URL, json=payload, timeout=10)
-        response.raise_for_status()
+        try:
+            with span("rasa_forward") as attrs, rasa_breaker.call():
+                response = requests.post(RASA_URL, json=payload, timeout=RASA_TIMEOUT_SECONDS)
+                attrs["status_code"] = response.status_code
+                response.raise_for_status()
+            rasa_responses = response.json()
+        except (CircuitOpenError, requests.RequestException, ValueError) as e:
+            logger.error("Error forwarding to Rasa, sending fallback reply: %s", e)
+            rasa_responses = [{"text": build_fallback_reply(message_text)}]
         
-        rasa_responses = response.json()
-        logger.debug(f"--- Received from Rasa ---")
-        logger.debug(f"Responses: {rasa_responses}")
+        logger.debug("Received from Rasa: %s", rasa_responses)
 
         for rasa_msg in rasa_responses:
             if "text" in rasa_msg:
@@ -95,12 +112,15 @@ def forward_to_rasa(user_id, message_text, is_button_click=False):
                             # Telegram callback_data has a 64 byte limit
                             callback_data = payload[:64]
                             markup.add(telebot.types.InlineKeyboardButton(text=button["title"], callback_data=callback_data))
-                    bot.send_message(user_id, rasa_msg["text"], reply_markup=markup)
+                    with span("telegram_send", kind="buttons"):
+                        bot.send_message(user_id, rasa_msg["text"], reply_markup=markup)
                 else:
-                    bot.send_message(user_id, rasa_msg["text"])
+                    with span("telegram_send", kind="text"):
+                        bot.send_message(user_id, rasa_msg["text"])
             
             elif "image" in rasa_msg:
-                bot.send_photo(user_id, rasa_msg["image"])
+                with span("telegram_send", kind="image"):
+                    bot.send_photo(user_id, rasa_msg["image"])
             
             elif "buttons" in rasa_msg:
                 # Case where buttons are sent without a separate 'text' field (rare but possible)
@@ -114,10 +134,11 @@ def forward_to_rasa(user_id, message_text, is_button_click=False):
                     else:
                         callback_data = payload[:64]
                         markup.add(telebot.types.InlineKeyboardButton(text=button["title"], callback_data=callback_data))
-                bot.send_message(user_id, "Choose an option:", reply_markup=markup)
+                with span("telegram_send", kind="buttons"):
+                    bot.send_message(user_id, "Choose an option:", reply_markup=markup)
 
     except Exception as e:
-        logger.error(f"Error forwarding to Rasa: {e}")
+        logger.error("Error forwarding to Rasa: %s", e)
         bot.send_message(user_id, "⚠️ Error: Could not connect to the bot engine.")
 
 @bot.message_handler(func=lambda message: True)
@@ -125,17 +146,18 @@ def handle_all_messages(message):
     # Check for duplicate messages
     current_time = time.time()
     if is_duplicate_message(message.from_user.id, message.text, current_time):
-        logger.info(f"Skipping duplicate message from {message.from_user.id}")
+        logger.info("Skipping duplicate message from %s", message.from_user.id)
         return
     
-    logger.info(f"Incoming message from {message.from_user.id}: {message.text}")
-    forward_to_rasa(message.from_user.id, message.text, is_button_click=False)
+    logger.info("Incoming message from %s: %s", message.from_user.id, message.text)
+    with start_trace(platform="telegram"):
+        forward_to_rasa(message.from_user.id, message.text, is_button_click=False)
 
 @bot.callback_query_handler(func=lambda call: True)
 def handle_callback_query(call):
     # Check for duplicate callbacks using update_id if available
     if hasattr(call, 'id') and call.id in processed_updates:
-        logger.info(f"Skipping duplicate callback: {call.id}")
+        logger.info("Skipping duplicate callback: %s", call.id)
         bot.answer_callback_query(call.id)
         return
     
@@ -145,9 +167,10 @@ def handle_callback_query(call):
         if len(processed_updates) > 1000:
             processed_updates.pop()
     
-    logger.info(f"Incoming callback from {call.from_user.id}: {call.data}")
+    logger.info("Incoming callback from %s: %s", call.from_user.id, call.data)
     # Forward the callback data (payload) to Rasa as a button click
-    forward_to_rasa(call.from_user.id, call.data, is_button_click=True)
+    with start_trace(platform="telegram"):
+        forward_to_rasa(call.from_user.id, call.data, is_button_click=True)
     # Answer the callback to remove the loading state in Telegram
     bot.answer_callback_query(call.id)
 
@@ -49,7 +49,7 @@ def test_symptom_triage():
     
     test_cases = [
         ("uzağı görmürəm", "routine", ["Excimer laser"]),
-        ("dumanlı görürəm", "urgent", ["Katarakta (mirvari suyu)"]),
+        ("dumanlı görürəm", "urgent", ["Katarakta"]),
         ("göz çox ağrıyır, qəfil görmə azaldı", "emergency", []),
     ]
     
@@ -127,7 +127,7 @@ def test_adaptive_prompt():
     triage_result = {
         'urgency': 'urgent',
         'matched_conditions': ['Katarakta'],
-        'suggested_surgeries': ['Katarakta (mirvari suyu)']
+        'suggested_surgeries': ['Katarakta']
     }
     
     prompt = generate_adaptive_prompt(profile, triage_result)
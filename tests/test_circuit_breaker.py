@@ -0,0 +1,83 @@
+import pytest
+import sys
+import os
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from intelligence.fallback import build_fallback_reply, contact_card, FAQCache
+
+
+class TestCircuitBreaker:
+
+    @pytest.fixture
+    def breaker(self):
+        """Breaker that trips after 4 calls with 50% failures and probes after 50ms."""
+        return CircuitBreaker("test", slow_call_seconds=0.2, window_size=10,
+                              min_calls=4, open_seconds=0.05)
+
+    def fail(self, breaker):
+        with pytest.raises(RuntimeError):
+            with breaker.call():
+                raise RuntimeError("boom")
+
+    def test_opens_on_error_rate(self, breaker):
+        """Circuit opens once the failure rate crosses the threshold."""
+        for _ in range(2):
+            with breaker.call():
+                pass
+        self.fail(breaker)
+        assert breaker.state == CLOSED
+        self.fail(breaker)
+        assert breaker.state == OPEN
+
+        with pytest.raises(CircuitOpenError):
+            with breaker.call():
+                pytest.fail("call must not run while the circuit is open")
+
+    def test_opens_on_latency(self, breaker):
+        """Slow but successful calls also open the circuit."""
+        for _ in range(4):
+            breaker.record(duration=0.5, success=True)
+        assert breaker.state == OPEN
+
+    def test_half_open_probe_closes_circuit(self, breaker):
+        """A successful probe after the cool-down closes the circuit."""
+        for _ in range(4):
+            breaker.record(duration=0.01, success=False)
+        time.sleep(0.06)
+        assert breaker.state == HALF_OPEN
+
+        assert breaker.allow() is True
+        assert breaker.allow() is False  # only one probe at a time
+        breaker.record(duration=0.01, success=True)
+        assert breaker.state == CLOSED
+
+    def test_failed_probe_reopens_circuit(self, breaker):
+        """A failed probe sends the circuit back to open."""
+        for _ in range(4):
+            breaker.record(duration=0.01, success=False)
+        time.sleep(0.06)
+        self.fail(breaker)
+        assert breaker.state == OPEN
+
+
+class TestFallbackReply:
+
+    def test_symptoms_get_triage_answer(self):
+        """Symptom descriptions are answered from triage plus the contact card."""
+        reply = build_fallback_reply("gözüm qızarıb və ağrıyır")
+        assert contact_card() in reply
+        assert reply != contact_card()
+
+    def test_cached_answer_is_reused(self):
+        """Remembered answers are returned for the same question."""
+        cache = FAQCache()
+        cache.remember("Əməliyyatlar", "Əməliyyatlarımız: ...")
+        assert cache.lookup("  əməliyyatlar ") == "Əməliyyatlarımız: ..."
+
+    def test_unknown_message_gets_contact_card(self):
+        """Anything else falls back to the clinic contact card."""
+        assert build_fallback_reply("salam").endswith(contact_card())
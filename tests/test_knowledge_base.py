@@ -0,0 +1,98 @@
+import json
+import pytest
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import intelligence.knowledge_base as knowledge_base
+from intelligence.knowledge_base import get_surgery_info, match_symptom_to_conditions
+from intelligence.knowledge_store import KnowledgeStore
+
+
+def symptoms(matches):
+    return [m["symptom"] for m in matches or [] if "symptom" in m]
+
+
+def surgeries(matches):
+    return [m["surgery_key"] for m in matches or [] if "surgery_key" in m]
+
+
+class TestMatchSymptomToConditions:
+
+    def test_exact_symptom_phrase(self):
+        """The symptom phrase itself matches its entry first."""
+        matches = match_symptom_to_conditions("dumanlı görürəm")
+        assert symptoms(matches)[0] == "dumanlı görürəm"
+        assert "Katarakta" in matches[0]["conditions"]
+
+    def test_inflected_forms(self):
+        """Azerbaijani suffixes still reach the phrase they inflect."""
+        assert symptoms(match_symptom_to_conditions("Gözlərim dumanlı görür")) == ["dumanlı görürəm"]
+        assert symptoms(match_symptom_to_conditions("Gözüm qırmızıdır")) == ["qırmızı göz"]
+        assert symptoms(match_symptom_to_conditions("Gözümün ağında ət var")) == ["göz ağında ət"]
+
+    def test_ascii_and_cyrillic_spellings(self):
+        """Text typed without Azerbaijani letters still matches."""
+        assert symptoms(match_symptom_to_conditions("gozlerim dumanli gorur")) == ["dumanlı görürəm"]
+        assert surgeries(match_symptom_to_conditions("Катаракта")) == ["katarakta"]
+
+    def test_generic_words_do_not_match(self):
+        """'göz' or a form of görmək alone is not a symptom."""
+        assert match_symptom_to_conditions("gözüm") is None
+        assert match_symptom_to_conditions("Həkimlə görüş istəyirəm") is None
+        assert match_symptom_to_conditions("Qiymət nə qədərdir?") is None
+
+    def test_multi_word_phrase_needs_its_distinctive_words(self):
+        """'qara su' needs both words, 'sonra' alone is not 'katarakta sonra'."""
+        assert surgeries(match_symptom_to_conditions("qara nöqtələr görürəm")) == []
+        assert surgeries(match_symptom_to_conditions("Əməliyyatdan sonra")) == []
+        assert surgeries(match_symptom_to_conditions("Qara su nədir?")) == ["qlaukoma"]
+
+    def test_surgery_keywords(self):
+        """Surgery keywords match case-insensitively."""
+        assert surgeries(match_symptom_to_conditions("Excimer laser")) == ["excimer_laser"]
+        assert surgeries(match_symptom_to_conditions("ICL haqqında")) == ["phacic"]
+
+    def test_symptoms_before_surgeries_and_stable_ranking(self):
+        """Symptoms rank ahead of surgeries and repeated calls agree."""
+        message = "Gözüm ağrıyır, qızarıb, qırmızıdır"
+        matches = match_symptom_to_conditions(message)
+        kinds = ["symptom" in m for m in matches]
+        assert kinds == sorted(kinds, reverse=True)
+        assert set(symptoms(matches)) == {"göz ağrısı", "qırmızı göz"}
+        assert matches == match_symptom_to_conditions(message)
+
+    def test_payloads_are_plain_copies(self):
+        """Matches are plain dicts: serializable, and changing one does not leak into the next call."""
+        match = match_symptom_to_conditions("dumanlı görürəm")[0]
+        assert json.loads(json.dumps(match)) == match
+        match["urgency"] = "emergency"
+        match["conditions"].append("x")
+        fresh = match_symptom_to_conditions("dumanlı görürəm")[0]
+        assert fresh["urgency"] == "urgent" and "x" not in fresh["conditions"]
+
+    def test_eye_flesh_phrases(self):
+        """'ət' with a form of 'göz' is pterygium; 'ət' alone is not."""
+        assert symptoms(match_symptom_to_conditions("Ət var gözümdə")) == ["göz ağında ət"]
+        assert symptoms(match_symptom_to_conditions("gözümdə ət artıb")) == ["göz ağında ət"]
+        assert match_symptom_to_conditions("ət yeyirəm") is None
+
+class TestSurgeryNamesFromCSV:
+
+    def test_csv_rename_reaches_matches(self, tmp_path, monkeypatch):
+        """Names and aliases come from surgeries.csv, linked by surgery_id."""
+        csv_path = tmp_path / "surgeries.csv"
+        csv_path.write_text(
+            "surgery_id,name,aliases,description,details,category\n"
+            '10,Qlaukoma əməliyyatı,"göz təzyiqi, trabekulektomiya",Qara su,Əməliyyat,Glaucoma\n',
+            encoding="utf-8")
+        store = KnowledgeStore(str(tmp_path / "doctors.csv"), str(csv_path), yaml_paths=[], reload_seconds=0)
+        monkeypatch.setattr(knowledge_base, "knowledge_store", store)
+
+        assert surgeries(match_symptom_to_conditions("trabekulektomiya")) == ["qlaukoma"]
+        assert match_symptom_to_conditions("qara su")[0]["matched_surgery"] == "Qlaukoma əməliyyatı"
+        assert get_surgery_info("qlaukoma")["name"] == "Qlaukoma əməliyyatı"
+        # Surgeries without a CSV row keep their built-in name
+        assert get_surgery_info("avastin")["name"] == "Avastin"
@@ -0,0 +1,102 @@
+import pytest
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intelligence.knowledge_store import KnowledgeStore, CLINIC_YAML, DOCTORS_CSV, SURGERIES_CSV
+
+DOCTORS = (
+    "doctor_id,name,title,specialty,phone,whatsapp_link,note,aliases\n"
+    "1,Dr. Emil Qafarlı,Həkim,Oftalmoloq,051 844 76 21,https://wa.me/994518447621,,\n"
+)
+SURGERIES = (
+    "surgery_id,name,aliases,description,details,category\n"
+    '1,Katarakta,"mirvari suyu, phaco",Göz lensinin dəyişdirilməsi,Köhnə lens, yenisi ilə əvəz olunur,Cataract\n'
+)
+
+
+class TestKnowledgeStore:
+
+    @pytest.fixture
+    def files(self, tmp_path):
+        doctors = tmp_path / "doctors.csv"
+        surgeries = tmp_path / "surgeries.csv"
+        doctors.write_text(DOCTORS, encoding="utf-8")
+        surgeries.write_text(SURGERIES, encoding="utf-8")
+        return doctors, surgeries
+
+    @pytest.fixture
+    def store(self, files):
+        """Store over temporary CSVs with the watcher thread disabled."""
+        return KnowledgeStore(str(files[0]), str(files[1]), yaml_paths=[], reload_seconds=0)
+
+    def test_indexes_and_matchers(self, store):
+        """Rows are indexed by id and names/aliases resolve to official names."""
+        snapshot = store.snapshot
+        assert snapshot.surgeries_by_id["1"]["details"] == "Köhnə lens, yenisi ilə əvəz olunur"
+        assert snapshot.find_surgeries("Mirvari suyu əməliyyatı") == ["Katarakta"]
+        assert snapshot.find_doctors("emil hekim qebulu") == ["Dr. Emil Qafarlı"]
+
+    def test_snapshot_is_read_only(self, store):
+        """Rows cannot be modified in place."""
+        with pytest.raises(TypeError):
+            store.snapshot.doctors[0]["name"] = "x"
+
+    def test_prompt_sections(self, store):
+        """Prompt placeholders are filled from the CSVs."""
+        prompt = store.snapshot.render("{doctors}\n{surgeries}")
+        assert "1. Dr. Emil Qafarlı - Həkim, Oftalmoloq (051 844 76 21" in prompt
+        assert "1. Katarakta (mirvari suyu) - Göz lensinin dəyişdirilməsi" in prompt
+
+    def test_clinic_contacts(self, files, tmp_path):
+        """Contact card and {clinic} section come from the YAML and follow its edits."""
+        clinic = tmp_path / "clinic.yaml"
+        clinic.write_text("clinic:\n  address: Bakı\n  phones: ['012 000 00 01', '012 000 00 02']\n"
+                          "  whatsapp: https://wa.me/1\n", encoding="utf-8")
+        store = KnowledgeStore(str(files[0]), str(files[1]), yaml_paths=[str(clinic)], reload_seconds=0)
+        snapshot = store.snapshot
+        assert snapshot.contact_card == ("📍 Ünvan: Bakı\n📞 Telefon: 012 000 00 01, 012 000 00 02\n"
+                                         "💬 WhatsApp: https://wa.me/1")
+        assert snapshot.phone == "012 000 00 01"
+        assert snapshot.render("{clinic}") == "Ünvan: Bakı\nTelefon: 012 000 00 01, 012 000 00 02\nWhatsApp: https://wa.me/1"
+        clinic.write_text("clinic:\n  phones: ['012 000 00 09']\n", encoding="utf-8")
+        assert store.reload(force=True) is True
+        assert store.snapshot.contact_card == "📞 Telefon: 012 000 00 09"
+
+    def test_reload_swaps_on_change(self, store, files):
+        """A changed file produces a new version; an unchanged one does not."""
+        old = store.snapshot
+        assert store.reload() is False
+        files[1].write_text(SURGERIES + "2,Avastin,,Göz dibinə iynə,Makula,Retinal\n", encoding="utf-8")
+        os.utime(files[1], ns=(1, old.mtimes[str(files[1])] + 1))
+        assert store.reload() is True
+        assert store.snapshot.version == old.version + 1
+        assert store.snapshot.find_surgeries("avastin") == ["Avastin"]
+        assert old.find_surgeries("avastin") == []
+
+    def test_memory_estimate(self, store, files):
+        """Snapshot size is estimated from its own objects and grows with the tables."""
+        old = store.snapshot
+        assert old.memory_bytes > 0
+        files[1].write_text(SURGERIES + "2,Avastin,,Göz dibinə iynə,Makula,Retinal\n", encoding="utf-8")
+        assert store.reload(force=True) is True
+        assert store.snapshot.memory_bytes > old.memory_bytes
+
+    def test_empty_table_keeps_old_snapshot(self, store, files):
+        """A truncated CSV does not replace the facts being served."""
+        old = store.snapshot
+        files[0].write_text("doctor_id,name\n", encoding="utf-8")
+        assert store.reload(force=True) is False
+        assert store.snapshot is old
+
+    def test_repository_csvs(self):
+        """The shipped CSVs load with every surgery described."""
+        snapshot = KnowledgeStore(DOCTORS_CSV, SURGERIES_CSV, yaml_paths=[], reload_seconds=0).snapshot
+        assert len(snapshot.doctors) == 4 and len(snapshot.surgeries) == 10
+        assert snapshot.find_surgeries("qara su") == ["Qlaukoma"]
+        assert snapshot.find_surgeries("mirvari") == ["Katarakta"]
+        assert snapshot.find_doctors("Sabina xanım") == ["Dr. Səbinə Əbiyeva"]
+        clinic = KnowledgeStore(DOCTORS_CSV, SURGERIES_CSV, yaml_paths=[CLINIC_YAML], reload_seconds=0).snapshot.clinic
+        assert clinic["phones"] and clinic["whatsapp"] and clinic["address"]
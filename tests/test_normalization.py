@@ -0,0 +1,143 @@
+import importlib.util
+import pytest
+import sys
+import os
+
+# Add project root to path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from intelligence import llm_router
+from intelligence.knowledge_store import knowledge_store
+from intelligence.normalization import KeywordSet, fold, normalize, stem
+from intelligence.symptom_triage import SymptomTriage
+from intelligence.user_profiler import UserProfiler
+
+
+class TestFolding:
+
+    @pytest.mark.parametrize("text", ["Görmürəm", "GÖRMÜRƏM", "gormurem", "ҝөрмүрәм"])
+    def test_spellings_fold_together(self, text):
+        """Azerbaijani casing, ASCII typing and Cyrillic reach one form."""
+        assert fold(text) == "gormurem"
+
+    def test_dotted_capital_i(self):
+        """İ lowercases to a plain i, not i + combining dot."""
+        assert fold("İSTƏYİRƏM") == "isteyirem"
+
+    def test_normalize_drops_punctuation(self):
+        """Messages become folded tokens joined by single spaces."""
+        assert normalize("  Qiyməti   nə qədərdir?!") == "qiymeti ne qederdir"
+
+    def test_stem_keeps_short_words(self):
+        """Suffixes are stripped but never below four letters."""
+        assert stem("qederdir") == "qeder"
+        assert stem("dumanlidir") == stem("dumanli") == "duman"
+        assert stem("goz") == "goz"
+
+
+class TestKeywordSet:
+
+    @pytest.fixture
+    def keywords(self):
+        return KeywordSet(['nə qədər', 'qiymət', 'ağrı', 'çəplik', 'hi'])
+
+    def test_inflected_and_ascii_forms(self, keywords):
+        """Canonical keywords match suffixed and ASCII-typed forms."""
+        assert keywords.find("Qiyməti nə qədərdir?") == ['nə qədər', 'qiymət']
+        assert keywords.find("gozum agriyir") == ['ağrı']
+        assert keywords.find("CEPLIK emeliyyati") == ['çəplik']
+
+    def test_phrases_need_consecutive_words(self, keywords):
+        """Multi-word keywords only match in order."""
+        assert not keywords.search("qədər nə")
+
+    def test_short_keywords_match_whole_words(self, keywords):
+        """Two-letter keywords do not match inside longer words."""
+        assert keywords.search("hi there")
+        assert not keywords.search("xahiş edirəm")
+
+
+class TestNegation:
+    """Negated verbs (görmürəm) must not match affirmative forms (görmək)"""
+
+    def test_negative_present_keeps_its_marker(self):
+        """Stripping stops at -mür/-mir, so the root is not exposed."""
+        assert stem(fold("görmürəm")) == stem(fold("görmür")) == "gormur"
+        assert stem(fold("bilmirəm")) == "bilmir"
+
+    @pytest.mark.parametrize("negative, positive", [
+        ("Görmürəm", "Həkimi görmək istəyirəm"),
+        ("Gözüm görmür", "Dünən həkimi görmüşəm"),
+        ("gormurem", "Sizi görməyə gələcəm"),
+    ])
+    def test_emergency_pairs(self, negative, positive):
+        """Only the negated form is an emergency indicator."""
+        triage = SymptomTriage()
+        assert triage.check_emergency_indicators(negative)
+        assert not triage.check_emergency_indicators(positive)
+
+    @pytest.mark.parametrize("negative, positive", [
+        ("Uzağı görmürəm", "Həkimi görmək istəyirəm"),
+        ("Yaxını görmürəm", "Dünən həkimi görmüşəm"),
+        ("GÖRMÜRƏM", "Sizi görməyə gələcəm"),
+    ])
+    def test_intent_pairs(self, negative, positive):
+        """Seeing a doctor is not a symptom inquiry; not seeing is."""
+        profiler = UserProfiler()
+        assert profiler._detect_intent(negative) == 'symptom_inquiry'
+        assert profiler._detect_intent(positive) != 'symptom_inquiry'
+
+    def test_seeing_a_doctor_is_booking(self):
+        """'görmək' with 'həkim' is a booking request, as before normalization."""
+        assert UserProfiler()._detect_intent("Həkimi görmək istəyirəm") == 'booking'
+
+
+def _conversion_optimizer():
+    """marketing/conversion_optimizer.py on its own (the package imports the database layer)"""
+    spec = importlib.util.spec_from_file_location(
+        "conversion_optimizer", os.path.join(ROOT, "marketing", "conversion_optimizer.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.ConversionOptimizer()
+
+
+class TestDroppedVariants:
+    """Spelling variants removed from the keyword lists are still detected"""
+
+    @pytest.mark.parametrize("keywords, variant, canonical", [
+        (llm_router.THANKS_KEYWORDS, "tesekkur", "təşəkkür"),
+        (llm_router.THANKS_KEYWORDS, "sag ol", "sağ ol"),
+        (llm_router.THANKS_KEYWORDS, "sagol", "sağol"),
+        (llm_router.THANKS_KEYWORDS, "çox sağ olun", "sağ olun"),
+        (llm_router.THANKS_KEYWORDS, "спасибо", "spasibo"),
+        (llm_router.ADDRESS_KEYWORDS, "unvan", "ünvan"),
+        (llm_router.PHONE_KEYWORDS, "nomre", "nömrə"),
+        (llm_router.PHONE_KEYWORDS, "elaqe", "əlaqə"),
+        (llm_router.DOCTOR_LIST_KEYWORDS, "hekimler", "həkimlər"),
+        (llm_router.SURGERY_LIST_KEYWORDS, "emeliyyatlar", "əməliyyatlar"),
+        (llm_router.SURGERY_LIST_KEYWORDS, "xidmetler", "xidmətlər"),
+        (llm_router.SURGERY_INFO_KEYWORDS, "nedir", "nədir"),
+        (llm_router.SURGERY_INFO_KEYWORDS, "haqqinda", "haqqında"),
+    ])
+    def test_router_keywords(self, keywords, variant, canonical):
+        """Each dropped router variant reaches its canonical keyword."""
+        assert keywords.find(variant) == [canonical]
+
+    def test_cyrillic_greeting(self):
+        """'привет' is still a whole-message greeting."""
+        assert normalize("привет") in llm_router.GREETINGS
+
+    @pytest.mark.parametrize("message, signal", [
+        ("Qiyməti nə qədərdir?", "price_inquiry"),
+        ("Müayinəyə yazılmaq istəyirəm", "booking_intent"),
+    ])
+    def test_buying_signals(self, message, signal):
+        """Inflected forms that used to be listed separately are buying signals."""
+        assert signal in _conversion_optimizer().analyze_message(message)["buying_signals"]
+
+    @pytest.mark.parametrize("message", ["cesplik emeliyyati", "Çəplik əməliyyatı", "strabizm"])
+    def test_strabismus_spellings(self, message):
+        """'cesplik' (not a fold of 'çəplik') is a Çəplik alias."""
+        assert knowledge_store.snapshot.find_surgeries(message) == ["Çəplik"]
+        assert _conversion_optimizer().analyze_message(message)["detected_items"]["surgeries"] == ["Çəplik"]